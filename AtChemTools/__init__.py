@@ -0,0 +1,71 @@
+"""Tools for building, running and analysing AtChem2 box models.
+
+Submodules are imported when they are first used, and the functions listed in
+_API can be used directly from the package (e.g. AtChemTools.write_build_run),
+so that importing AtChemTools is fast and heavy dependencies (e.g. matplotlib
+and pysolar) are only imported when they are needed."""
+#imports
+import importlib
+
+_SUBMODULES = ["aggregation", "archive", "build_and_run", "calibration",
+               "comparison", "constraint_processing", "downsample",
+               "families", "jNO2_functions", "mechanism_reduction",
+               "monitor_output", "plotting_functions", "rate_coefficients",
+               "read_output", "reading_concentrations", "rendering",
+               "result_store", "ropa", "run_queue", "sensitivity",
+               "species_from_mechanism", "utilities"]
+
+#top-level names and the submodules they are defined in
+_API = {"diurnal_profile" : "aggregation",
+        "daily_stats" : "aggregation",
+        "DiurnalAccumulator" : "aggregation",
+        "archive_output" : "archive",
+        "write_config" : "build_and_run",
+        "write_model_params" : "build_and_run",
+        "build_model" : "build_and_run",
+        "run_model" : "build_and_run",
+        "start_model" : "build_and_run",
+        "write_build_run" : "build_and_run",
+        "write_build_run_batch" : "build_and_run",
+        "spin_up" : "build_and_run",
+        "calibrate" : "calibration",
+        "compare" : "comparison",
+        "prepare_constraints" : "constraint_processing",
+        "downsample_series" : "downsample",
+        "DEFAULT_FAMILIES" : "families",
+        "compile_families" : "families",
+        "family_totals" : "families",
+        "family_rate_totals" : "families",
+        "reduce_mechanism" : "mechanism_reduction",
+        "tail_output" : "monitor_output",
+        "model_progress" : "monitor_output",
+        "plot_species" : "plotting_functions",
+        "compile_rate_coefficients" : "rate_coefficients",
+        "reaction_rates" : "rate_coefficients",
+        "species_concentrations_df" : "read_output",
+        "rate_df" : "read_output",
+        "conc_to_units" : "reading_concentrations",
+        "render_pages" : "rendering",
+        "add_run" : "result_store",
+        "query_store" : "result_store",
+        "ropa_report" : "ropa",
+        "rate_sensitivities" : "sensitivity",
+        "return_all_species" : "species_from_mechanism",
+        "convert_time_to_seconds" : "utilities"}
+
+__all__ = _SUBMODULES + list(_API)
+
+def __getattr__(name):
+    """Imports submodules and top-level names when they are first accessed"""
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _API:
+        value = getattr(importlib.import_module(f".{_API[name]}", __name__), name)
+        #cache the name so that it is only looked up once
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,269 @@
+"""Functions to summarise multi-day model output by hour of day and by day
+(e.g. diurnal profiles, daily means and day-by-day maxima).
+
+Model times are seconds since midnight of the first model day, so the time of
+day of an output is its time modulo 86400 (as for
+utilities.datetime_to_secs_since_midnight) and its day is the number of whole
+days since the start. Every column is binned at once into arrays of days x
+time of day bins, and the sums, sums of squares, minima and maxima of each bin
+can be accumulated one chunk at a time, so outputs too large to load can be
+summarised while streaming them from file."""
+#imports
+import warnings
+import numpy as np
+import pandas as pd
+from .read_output import read_header, resolve_output_path
+
+SECONDS_PER_DAY = 86400
+STATISTICS = ["count", "sum", "mean", "std", "min", "max"]
+
+def time_bins(times, bin_size : int = 3600):
+    """Returns arrays of the day (counted from 0 for the first model day) and
+    the time of day bin of model times in seconds"""
+    if SECONDS_PER_DAY % bin_size:
+        raise Exception(f"The bin size must divide a day (86400 s) exactly, not {bin_size}")
+    times = np.asarray(times, dtype=float)
+    days = np.floor(times/SECONDS_PER_DAY).astype(int)
+    bins = ((times - days*SECONDS_PER_DAY)//bin_size).astype(int)
+
+    return days, bins
+
+class DiurnalAccumulator:
+    """Accumulates the count, sum, sum of squares, minimum and maximum of each
+    column in each day x time of day bin, from dataframes (or chunks of a
+    dataframe) with an index of model times in seconds. NaN values are
+    ignored."""
+    def __init__(self, columns = None, bin_size : int = 3600):
+        time_bins([0], bin_size)
+        self.bin_size = bin_size
+        self.n_bins = SECONDS_PER_DAY//bin_size
+        self.columns = None
+        self.first_day = None
+        self.n_days = 0
+        #sums are of the differences from a shift for each column, which keeps
+        #the variance accurate for large values (e.g. concentrations)
+        self.shift = None
+        if columns is not None:
+            self._add_columns(pd.DataFrame(columns = columns, dtype = float))
+
+    def _grow(self, first_day, last_day):
+        """Extends the arrays of accumulated values to include the given
+        days"""
+        shape = (self.n_bins, len(self.columns))
+        if self.first_day is None:
+            self.first_day = first_day
+            self.counts = np.zeros((0,) + shape, dtype=np.int64)
+            self.sums = np.zeros((0,) + shape)
+            self.sumsqs = np.zeros((0,) + shape)
+            self.mins = np.zeros((0,) + shape)
+            self.maxs = np.zeros((0,) + shape)
+
+        before = max(self.first_day - first_day, 0)
+        after = max(last_day - (self.first_day + self.n_days - 1), 0)
+        if before or after:
+            pad = ((before, after), (0, 0), (0, 0))
+            self.counts = np.pad(self.counts, pad)
+            self.sums = np.pad(self.sums, pad)
+            self.sumsqs = np.pad(self.sumsqs, pad)
+            self.mins = np.pad(self.mins, pad, constant_values=np.inf)
+            self.maxs = np.pad(self.maxs, pad, constant_values=-np.inf)
+            self.first_day -= before
+            self.n_days += before + after
+
+    def _add_columns(self, df):
+        """Adds any columns of a dataframe which haven't been seen before to
+        the accumulated values, with a shift of their mean in the dataframe"""
+        new = df.columns if self.columns is None else df.columns.difference(self.columns, sort=False)
+        if len(new) == 0:
+            return
+
+        with np.errstate(invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            shift = np.nanmean(df[new].to_numpy(dtype=float), axis=0)
+        shift = np.where(np.isnan(shift), 0.0, shift)
+
+        if self.columns is None:
+            self.columns, self.shift = new, shift
+            return
+        self.columns = self.columns.append(new)
+        self.shift = np.concatenate([self.shift, shift])
+        if self.first_day is not None:
+            pad = ((0, 0), (0, 0), (0, len(new)))
+            self.counts = np.pad(self.counts, pad)
+            self.sums = np.pad(self.sums, pad)
+            self.sumsqs = np.pad(self.sumsqs, pad)
+            self.mins = np.pad(self.mins, pad, constant_values=np.inf)
+            self.maxs = np.pad(self.maxs, pad, constant_values=-np.inf)
+
+    def add(self, df : pd.DataFrame):
+        """Adds the values of a dataframe, with an index (or first index level)
+        of model times in seconds, to the accumulated values. Columns which
+        haven't been seen before are added (with no values on earlier
+        days)."""
+        self._add_columns(df)
+        if len(df) == 0:
+            return
+
+        times = df.index.get_level_values(0).to_numpy(dtype=float)
+        values = df.reindex(columns = self.columns).to_numpy(dtype=float)
+
+        days, bins = time_bins(times, self.bin_size)
+        self._grow(days.min(), days.max())
+
+        #flat bin of each row, then accumulate every column at once
+        flat = (days - self.first_day)*self.n_bins + bins
+        mask = np.isfinite(values)
+        diffs = np.where(mask, values - self.shift, 0.0)
+        cols = np.broadcast_to(np.arange(len(self.columns)), values.shape)
+        rows = np.broadcast_to(flat[:,None], values.shape)
+        shape = (self.n_days*self.n_bins, len(self.columns))
+
+        counts = self.counts.reshape(shape)
+        np.add.at(counts, (rows, cols), mask)
+        np.add.at(self.sums.reshape(shape), (rows, cols), diffs)
+        np.add.at(self.sumsqs.reshape(shape), (rows, cols), diffs**2)
+        np.minimum.at(self.mins.reshape(shape), (rows[mask], cols[mask]), values[mask])
+        np.maximum.at(self.maxs.reshape(shape), (rows[mask], cols[mask]), values[mask])
+
+    @property
+    def days(self):
+        """The days (counted from 0 for the first model day) with accumulated
+        values"""
+        if self.first_day is None:
+            return np.array([], dtype=int)
+        return np.arange(self.first_day, self.first_day + self.n_days)
+
+    @property
+    def bin_times(self):
+        """The start of each time of day bin, in seconds since midnight"""
+        return np.arange(self.n_bins)*self.bin_size
+
+    def _statistic(self, statistic, counts, sums, sumsqs, mins, maxs):
+        """Calculates a statistic from accumulated values"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums/counts
+            if statistic == "count":
+                return counts
+            elif statistic == "sum":
+                return sums + counts*self.shift
+            elif statistic == "mean":
+                return mean + self.shift
+            elif statistic == "std":
+                #sample standard deviation
+                var = (sumsqs - counts*mean**2)/(counts - 1)
+                return np.sqrt(np.maximum(var, 0.0))
+            elif statistic == "min":
+                return np.where(counts > 0, mins, np.nan)
+            elif statistic == "max":
+                return np.where(counts > 0, maxs, np.nan)
+        raise Exception(f"Statistic must be one of {STATISTICS}, not {statistic}")
+
+    def binned(self, statistic : str = "mean"):
+        """Returns an array (days x time of day bins x columns) of a statistic
+        of each bin"""
+        if self.first_day is None:
+            return np.empty((0, self.n_bins, 0 if self.columns is None else len(self.columns)))
+        return self._statistic(statistic, self.counts, self.sums, self.sumsqs,
+                               self.mins, self.maxs)
+
+    def diurnal_profile(self, statistic : str = "mean"):
+        """Returns a dataframe of a statistic of each time of day bin over all
+        days, indexed by the start of the bin in seconds since midnight"""
+        if self.first_day is None:
+            return pd.DataFrame(columns = self.columns, dtype = float)
+        out = self._statistic(statistic, self.counts.sum(axis=0),
+                              self.sums.sum(axis=0), self.sumsqs.sum(axis=0),
+                              self.mins.min(axis=0), self.maxs.max(axis=0))
+        return pd.DataFrame(out, index = pd.Index(self.bin_times, name = "time_of_day"),
+                            columns = self.columns)
+
+    def daily_stats(self, statistics = ["mean", "max"]):
+        """Returns a dataframe of statistics of each day, indexed by day
+        (counted from 0 for the first model day), with a column for each
+        column and statistic"""
+        if type(statistics) == str:
+            statistics = [statistics]
+        if self.first_day is None:
+            return pd.DataFrame(dtype = float)
+        out = {}
+        for statistic in statistics:
+            out[statistic] = pd.DataFrame(
+                self._statistic(statistic, self.counts.sum(axis=1),
+                                self.sums.sum(axis=1), self.sumsqs.sum(axis=1),
+                                self.mins.min(axis=1), self.maxs.max(axis=1)),
+                index = pd.Index(self.days, name = "day"), columns = self.columns)
+
+        return pd.concat(out, axis=1).swaplevel(axis=1)[list(self.columns)]
+
+def binned_array(df : pd.DataFrame, statistic : str = "mean",
+                 bin_size : int = 3600):
+    """Returns an array (days x time of day bins x columns) of a statistic of
+    each column in each bin, and the days of the array"""
+    acc = DiurnalAccumulator(bin_size = bin_size)
+    acc.add(df)
+    return acc.binned(statistic), acc.days
+
+def diurnal_profile(df : pd.DataFrame, statistic : str = "mean",
+                    bin_size : int = 3600):
+    """Returns a dataframe of a statistic (e.g. the mean) of each column in
+    each time of day bin over all days, indexed by the start of the bin in
+    seconds since midnight"""
+    acc = DiurnalAccumulator(bin_size = bin_size)
+    acc.add(df)
+    return acc.diurnal_profile(statistic)
+
+def daily_stats(df : pd.DataFrame, statistics = ["mean", "max"]):
+    """Returns a dataframe of statistics (e.g. the mean and maximum) of each
+    column on each model day"""
+    acc = DiurnalAccumulator()
+    acc.add(df)
+    return acc.daily_stats(statistics)
+
+def accumulate_file(file_path : str, bin_size : int = 3600, species = "ALL",
+                    chunksize : int = 100000):
+    """Streams an AtChem2 output file through a DiurnalAccumulator, reading
+    `chunksize` lines at a time, and returns the accumulator.
+
+    For speciesConcentrations, environmentVariables and photolysisRates files
+    each column is accumulated (or only those in `species`). For lossRates and
+    productionRates files, the total rate of each species (summed over
+    reactions) is accumulated. Compressed (archived) files are decompressed
+    as they are read."""
+    file_path = resolve_output_path(file_path)
+    header = read_header(file_path)
+    if type(species) == str:
+        species = None if species.casefold() == "ALL".casefold() else [species]
+
+    if "speciesName" not in header:
+        columns = header[1:] if species is None else [x for x in header[1:] if x in species]
+        acc = DiurnalAccumulator(columns, bin_size)
+        reader = pd.read_csv(file_path, index_col=0, sep='\s+',
+                             usecols=[header[0]] + columns, chunksize=chunksize)
+        for chunk in reader:
+            acc.add(chunk)
+        return acc
+
+    acc = DiurnalAccumulator(bin_size = bin_size)
+    reader = pd.read_csv(file_path, sep='\s+', usecols=["time", "speciesName", "rate"],
+                         keep_default_na=False, chunksize=chunksize)
+    carry = None
+    for chunk in reader:
+        if species is not None:
+            chunk = chunk.loc[chunk["speciesName"].isin(species)]
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        if len(chunk) == 0:
+            continue
+        #rows of the last time may continue into the next chunk
+        last = chunk["time"].iloc[-1]
+        carry = chunk.loc[chunk["time"] == last]
+        chunk = chunk.loc[chunk["time"] != last]
+        #a chunk can be only rows of a single time, which are all carried
+        if len(chunk) == 0:
+            continue
+        acc.add(chunk.pivot_table(index="time", columns="speciesName",
+                                  values="rate", aggfunc="sum"))
+    if carry is not None:
+        acc.add(carry.pivot_table(index="time", columns="speciesName",
+                                  values="rate", aggfunc="sum"))
+    return acc
@@ -0,0 +1,130 @@
+"""Functions to archive kept model directories (see the keep_rundirs argument of
+build_and_run.write_build_run) by compressing each of their output files. 
+AtChem2 output is plain text, so compresses well (particularly the rate 
+outputs, which repeat the reaction of each rate on every line). The 
+configuration and constraint files are left as they are, so archived model
+directories can still be inspected or re-run.
+
+Each file is compressed separately (with gzip or xz) alongside its original
+name, so archived outputs can still be read directly with the functions in
+read_output, which decompress them as they are read. A manifest of the
+archived files (with their original sizes and checksums) is written to the
+model directory."""
+#imports
+import os
+import json
+import gzip
+import lzma
+import hashlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .read_output import COMPRESSED_EXTENSIONS
+
+MANIFEST_NAME = "manifest.json"
+
+#file extension and function to open a compressed file for each method
+_METHODS = {"gzip" : (".gz", lambda path, level: gzip.open(path, "wb", compresslevel=level)),
+            "xz" : (".xz", lambda path, level: lzma.open(path, "wb", preset=level))}
+_DEFAULT_LEVELS = {"gzip" : 6, "xz" : 6}
+
+def _compress_file(file_path : str, method : str, level : int,
+                   block_size : int = 1 << 20):
+    """Compresses a file in blocks, replaces it with the compressed file and
+    returns the original size and checksum"""
+    ext, opener = _METHODS[method]
+    tmp_path = f"{file_path}{ext}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as file, opener(tmp_path, level) as out_file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+            size += len(block)
+            out_file.write(block)
+    os.replace(tmp_path, file_path + ext)
+    os.remove(file_path)
+
+    return size, digest.hexdigest()
+
+def archive_output(model_path : str, method : str = "gzip", level : int = None,
+                   max_workers : int = 4):
+    """Compresses every file in the output directory of a model directory, 
+    writing a manifest of the archived files (with paths relative to the model
+    directory) to manifest.json in the model directory. Files outside of 
+    output/ (so that the model can still be re-run), symbolic links and files
+    which are already compressed are left as they are.
+
+    `method` is "gzip" (faster) or "xz" (smaller), and `level` the
+    compression level (by default 6 for both). Files are compressed in
+    parallel in a pool of `max_workers` threads. Returns the manifest."""
+    if method not in _METHODS:
+        raise Exception(f"Archive method must be one of {list(_METHODS)}, not {method}")
+    if os.path.exists(f"{model_path}/{MANIFEST_NAME}"):
+        raise Exception(f"{model_path} has already been archived")
+    if level is None:
+        level = _DEFAULT_LEVELS[method]
+    ext = _METHODS[method][0]
+
+    files, links = [], []
+    for dirpath, _, filenames in os.walk(f"{model_path}/output"):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(path, model_path)
+            if os.path.islink(path):
+                links.append({"path" : rel_path, "target" : os.readlink(path)})
+            elif os.path.splitext(name)[1] not in COMPRESSED_EXTENSIONS:
+                files.append(rel_path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda x: _compress_file(f"{model_path}/{x}", method, level),
+                                    files))
+
+    entries = []
+    for rel_path, (size, checksum) in zip(files, results):
+        entries.append({"path" : rel_path, "archived" : rel_path + ext,
+                        "size" : size,
+                        "archived_size" : os.path.getsize(f"{model_path}/{rel_path}{ext}"),
+                        "sha256" : checksum})
+
+    manifest = {"method" : method, "level" : level,
+                "created" : datetime.now().isoformat(timespec="seconds"),
+                "size" : sum([x["size"] for x in entries]),
+                "archived_size" : sum([x["archived_size"] for x in entries]),
+                "files" : entries, "links" : links}
+
+    #write the manifest last, so that it is only present once the archive is
+    #complete
+    tmp_path = f"{model_path}/{MANIFEST_NAME}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(tmp_path, f"{model_path}/{MANIFEST_NAME}")
+
+    return manifest
+
+def read_manifest(model_path : str):
+    """Returns the manifest of an archived model directory"""
+    with open(f"{model_path}/{MANIFEST_NAME}") as file:
+        return json.load(file)
+
+def extract_archive(model_path : str, verify : bool = True,
+                    block_size : int = 1 << 20):
+    """Decompresses the files of an archived model directory back to their
+    original names and removes the manifest. If `verify` is true, the
+    checksum of each decompressed file is checked against the manifest."""
+    manifest = read_manifest(model_path)
+    opener = COMPRESSED_EXTENSIONS[_METHODS[manifest["method"]][0]]
+
+    for entry in manifest["files"]:
+        path = f"{model_path}/{entry['path']}"
+        digest = hashlib.sha256()
+        with opener(f"{model_path}/{entry['archived']}", "rb") as file, \
+             open(f"{path}.tmp", "wb") as out_file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+                out_file.write(block)
+        if verify and (digest.hexdigest() != entry["sha256"]):
+            os.remove(f"{path}.tmp")
+            raise Exception(f"Checksum of {entry['path']} does not match the manifest of {model_path}")
+        os.replace(f"{path}.tmp", path)
+        os.remove(f"{model_path}/{entry['archived']}")
+
+    os.remove(f"{model_path}/{MANIFEST_NAME}")
@@ -1,9 +1,19 @@
 #imports
 import os
+import subprocess
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from .species_from_mechanism import return_all_species
 from .utilities import is_number
+from .read_output import (read_run_outputs, restart_concentrations, species_concentrations_df,
+                          jacobian_rows)
+from .archive import archive_output
+from .families import DEFAULT_FAMILIES, compile_families, family_members, scale_family
 import warnings
 from datetime import datetime
 
@@ -13,45 +23,124 @@ def wipe_file(file_path : str):
     """Clears the contents of the specified file"""
     open(file_path, 'w').close()
 
+def _write_if_changed(filepath : str, content : str):
+    """Writes a string to a file, unless the file already exists with 
+    identical content (compared by hash). Returns True if the file was 
+    written."""
+    data = content.encode()
+    if os.path.islink(filepath):
+        #never write through a link into a constraint store
+        os.remove(filepath)
+    elif os.path.isfile(filepath) and (os.path.getsize(filepath) == len(data)):
+        with open(filepath, "rb") as file:
+            if hashlib.sha256(file.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    
+    with open(filepath, "wb") as file:
+        file.write(data)
+    
+    return True
+
+def _link_from_store(filepath : str, content : str, store : str):
+    """Writes a string once to a content-addressed store (as 
+    <store>/<hash[:2]>/<hash>) and links `filepath` to the stored file, so that 
+    identical files are shared between model directories. Returns True if a 
+    new file was added to the store."""
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    store_path = os.path.abspath(os.path.join(store, digest[:2], digest))
+    
+    added = False
+    if not os.path.isfile(store_path):
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+        #write to a uniquely named temporary file in the store first so that
+        #other processes (possibly on other hosts) never see a partially 
+        #written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(store_path), 
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, store_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        added = True
+    
+    if os.path.islink(filepath) and (os.readlink(filepath) == store_path):
+        return added
+    if os.path.lexists(filepath):
+        os.remove(filepath)
+    os.symlink(store_path, filepath)
+    
+    return added
+
+def _format_lines(index : np.ndarray, values : np.ndarray, scientific : bool = False):
+    """Formats arrays of indices and values into the lines of an AtChem2 
+    configuration file in bulk, identically to writing f"{index} {value}" (or 
+    f"{index} {value:.5e}" if `scientific` is true) for each line."""
+    #numpy formats lower precision floats with fewer digits than python
+    if np.issubdtype(index.dtype, np.floating):
+        index = index.astype(np.float64)
+    if np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    if scientific and np.issubdtype(values.dtype, np.number):
+        val_strs = np.char.mod("%.5e", values)
+    elif scientific:
+        val_strs = np.array([f"{x:.5e}" for x in values], dtype=str)
+    else:
+        val_strs = values.astype(str)
+    
+    lines = np.char.add(np.char.add(index.astype(str), " "), val_strs)
+    
+    return "\n".join(lines.tolist()) + "\n" if len(lines) else ""
+
 def list_to_config_file(in_list : list, filepath : str):
     """Converts a list to an AtChem2 configuration file with each list item 
     written on a new line."""
 
     lines = [f"{x}\n" for x in in_list]
-    with open(filepath,"w") as file:
-        file.writelines(lines)
+    _write_if_changed(filepath, "".join(lines))
 
 def series_to_config_file(in_series : pd.Series, filepath : str, 
-                          round_nums : bool = True):
+                          round_nums : bool = True, store : str = ""):
     """Converts a pandas series to an AtChem2 configuration file with indices and
     values written on each line.
     
-    If `round_nums` is true, then the series values will be formatted as `.5e` 
-    to prevent long numbers exceeding the FORTRAN line length limit in AtChem2."""
-    if round_nums:
-        lines = [f"{x} {y}\n" for x,y in in_series.items()]
+    Values are written as they are if `round_nums` is true, and formatted as 
+    `.5e` otherwise (to prevent long numbers exceeding the FORTRAN line length 
+    limit in AtChem2). The file is not rewritten if its content would be 
+    unchanged. If `store` is given, the file is written to that 
+    content-addressed store and linked to `filepath` instead."""
+    content = _format_lines(in_series.index.to_numpy(), in_series.to_numpy(), 
+                            not round_nums)
+    if store:
+        _link_from_store(filepath, content, store)
     else:
-        lines = [f"{x} {y:.5e}\n" for x,y in in_series.items()]
-        
-    with open(filepath,"w") as file:
-        file.writelines(lines)
+        _write_if_changed(filepath, content)
         
 def dataframe_to_config_files(in_df : pd.DataFrame, dirpath : str, 
-                              round_nums : bool = True):
+                              round_nums : bool = True, store : str = ""):
     """Converts each column of a pandas dataframe to an AtChem2 configuration 
     file with indices and values written on each line. The name of each 
-    configuration file produced will match the name of the column.
+    configuration file produced will match the name of the column. NaN values
+    are not written.
     
-    If `round_nums` is true, then the column values will be formatted as `.5e` 
-    to prevent long numbers exceeding the FORTRAN line length limit in AtChem2."""
-    for col in in_df.columns:
-        if round_nums:
-            lines = [f"{x} {y}\n" for x,y in in_df[col].dropna().items()]
+    Values are written as they are if `round_nums` is true, and formatted as 
+    `.5e` otherwise (to prevent long numbers exceeding the FORTRAN line length 
+    limit in AtChem2). Files are not rewritten if their content would be 
+    unchanged. If `store` is given, the files are written to that 
+    content-addressed store and linked into `dirpath` instead."""
+    index = in_df.index.to_numpy()
+    valid = in_df.notna().to_numpy()
+    for i,col in enumerate(in_df.columns):
+        values = in_df[col].to_numpy()
+        content = _format_lines(index[valid[:,i]], values[valid[:,i]], 
+                                not round_nums)
+        if store:
+            _link_from_store(dirpath+os.sep+col, content, store)
         else:
-            lines = [f"{x} {y:.5e}\n" for x,y in in_df[col].dropna().items()]
-            
-        with open(dirpath+os.sep+col,"w") as file:
-            file.writelines(lines)
+            _write_if_changed(dirpath+os.sep+col, content)
         
 def write_config(model_path : str, initial_concs : pd.Series = pd.Series(), 
                  spec_constrain : pd.DataFrame = pd.DataFrame(), 
@@ -67,9 +156,15 @@ def write_config(model_path : str, initial_concs : pd.Series = pd.Series(),
                                                            "RH", "H2O", "DEC", 
                                                            "BLHEIGHT", "DILUTE", 
                                                            "JFAC", "ROOF", "ASA"]),
-                 spec_output : list = [], rate_output : list = []):
+                 spec_output : list = [], rate_output : list = [],
+                 constraint_store : str = ""):
     """Prepares model files in a specified AtChem2 directory for building and 
-    running, filling them out with the provided input data"""
+    running, filling them out with the provided input data.
+    
+    If `constraint_store` is given, each unique constraint file is written 
+    once to that directory (named by the hash of its content) and the 
+    constraints directories of the model link to it, which avoids rewriting
+    identical constraints for every member of an ensemble."""
     
     #initialConcentrations.config
     series_to_config_file(initial_concs.dropna(), 
@@ -79,13 +174,15 @@ def write_config(model_path : str, initial_concs : pd.Series = pd.Series(),
     list_to_config_file(list(spec_constrain.columns), 
                         f"{model_path}/configuration/speciesConstrained.config")
     #species constraints
-    dataframe_to_config_files(spec_constrain,f"{model_path}/constraints/species/")
+    dataframe_to_config_files(spec_constrain,f"{model_path}/constraints/species/",
+                              store=constraint_store)
         
     #photolysisConstrained.config
     list_to_config_file(list(photo_constrain.columns), 
                         f"{model_path}/configuration/photolysisConstrained.config")
     #photolysis constraints
-    dataframe_to_config_files(photo_constrain,f"{model_path}/constraints/photolysis/")
+    dataframe_to_config_files(photo_constrain,f"{model_path}/constraints/photolysis/",
+                              store=constraint_store)
 
     #speciesConstant.config
     series_to_config_file(spec_constant.dropna(), 
@@ -141,8 +238,8 @@ def write_config(model_path : str, initial_concs : pd.Series = pd.Series(),
     for i,k in enumerate([x for x in env_copy.index if x not in default_env.index]):
         env_var_lines += f"\n{11+i} {k} {env_copy[k]}"
     
-    with open(f"{model_path}/configuration/environmentVariables.config","w") as file:
-        file.write(env_var_lines)
+    _write_if_changed(f"{model_path}/configuration/environmentVariables.config",
+                      env_var_lines)
 
     #environment constraints
     for col in env_constrain.columns:
@@ -151,7 +248,8 @@ def write_config(model_path : str, initial_concs : pd.Series = pd.Series(),
                 env_path = f"{model_path}/constraints/environment/{col}"
             else:
                 env_path = f"{model_path}/constraints/photolysis/{col}"
-            series_to_config_file(env_constrain[col].dropna(), env_path)
+            series_to_config_file(env_constrain[col].dropna(), env_path, 
+                                  store=constraint_store)
         else:
             raise Exception(f"Constraint provided for {col}, but value is set as {env_copy[col]} not 'CONSTRAINED'")   
         
@@ -161,28 +259,66 @@ def write_config(model_path : str, initial_concs : pd.Series = pd.Series(),
     list_to_config_file(rate_output,
                         f"{model_path}/configuration/outputRates.config")    
     
+def _output_steps(model_tstep : int, rates_output_step : int = None,
+                  reaction_rates_output_step : int = None, 
+                  jacobian_output_step : int = 0):
+    """Returns the rates, reaction rates and jacobian output steps, defaulting
+    the rates output steps to the model step size, and raises an exception if
+    any of them are not a multiple of the model step size"""
+    if rates_output_step is None:
+        rates_output_step = model_tstep
+    if reaction_rates_output_step is None:
+        reaction_rates_output_step = model_tstep
+    
+    for name, value in [("rates_output_step", rates_output_step), 
+                        ("reaction_rates_output_step", reaction_rates_output_step)]:
+        if value <= 0:
+            raise Exception(f"{name} ({value}) must be greater than 0")
+    if jacobian_output_step < 0:
+        raise Exception(f"jacobian_output_step ({jacobian_output_step}) must be 0 (no output) or greater")
+    
+    for name, value in [("rates_output_step", rates_output_step), 
+                        ("reaction_rates_output_step", reaction_rates_output_step),
+                        ("jacobian_output_step", jacobian_output_step)]:
+        if value % model_tstep != 0:
+            raise Exception(f"{name} ({value}) must be a multiple of the model step size ({model_tstep})")
+    
+    return rates_output_step, reaction_rates_output_step, jacobian_output_step
+
 def write_model_params(model_path : str, nsteps : int, model_tstep : int, 
                        tstart : int, day : int, month : int, year : int, 
-                       lat : float, lon : float):
+                       lat : float, lon : float, rates_output_step : int = None,
+                       reaction_rates_output_step : int = None, 
+                       jacobian_output_step : int = 0):
     """Write the provided input data to the model parameters file of the 
-    specified AtChem2 directory."""
+    specified AtChem2 directory.
+    
+    Concentrations are output every `model_tstep` seconds. Loss and production
+    rates are output every `rates_output_step` seconds, reaction rates every
+    `reaction_rates_output_step` seconds (both default to `model_tstep`), and 
+    the jacobian every `jacobian_output_step` seconds (0 for no output). Each
+    of these must be a multiple of `model_tstep`."""
+    (rates_output_step, reaction_rates_output_step, 
+     jacobian_output_step) = _output_steps(model_tstep, rates_output_step, 
+                                           reaction_rates_output_step,
+                                           jacobian_output_step)
     
     model_params_lines=f"""{nsteps}			number of steps
     {model_tstep}			step size (seconds)
     2			species interpolation method (pw constant = 1, pw linear = 2)
     2			conditions interpolation method (pw constant = 1, pw linear = 2)
-    {model_tstep}			rates output step size (seconds)
+    {rates_output_step}			rates output step size (seconds)
     {tstart}			model start time (seconds)
-    0			jacobian output step size (seconds)
+    {jacobian_output_step}			jacobian output step size (seconds)
     {lat}			latitude (degrees)
     {lon}			longitude (degrees)
     {day:02d}			day
     {month:02d}			month
     {year:04d}			year
-    {model_tstep}			reaction rates output step size (seconds)"""
+    {reaction_rates_output_step}			reaction rates output step size (seconds)"""
 
-    with open(model_path+"/configuration/model.parameters","w") as file:
-        file.write(model_params_lines)
+    _write_if_changed(model_path+"/configuration/model.parameters", 
+                      model_params_lines)
     
 
 def build_model(atchem2_path : str, mechanism_path : str, model_path : str = ""):
@@ -202,6 +338,92 @@ def run_model(atchem2_path : str, model_path : str = ""):
         os.system(f"{atchem2_path}/atchem2")
     os.chdir(script_dir)
 
+def start_model(atchem2_path : str, model_path : str = ""):
+    """Starts the specified (pre-built) AtChem2 model in the background and 
+    returns the running process, so that the model output can be followed 
+    (e.g. using monitor_output.model_progress) or the model stopped early"""
+    args = [f"{atchem2_path}/atchem2"]
+    if model_path:
+        args.append(f"--model={model_path}")
+    return subprocess.Popen(args, cwd=atchem2_path)
+
+def _on_grid(times, t_start : int, output_step : int):
+    """Tests whether times are on the output grid of the whole simulation 
+    (every `output_step` seconds from `t_start`)"""
+    return ((np.asarray(times) - t_start) % output_step) == 0
+
+def _on_output_grid(rates : pd.DataFrame, t_start : int, output_step : int):
+    """Returns the rows of a rate output at times on the output grid of the 
+    whole simulation (every `output_step` seconds from `t_start`)"""
+    return rates.loc[_on_grid(rates["time"], t_start, output_step)]
+
+def _segment_step(seg_start : int, t_start : int, output_step : int, 
+                  step_size : int):
+    """Returns the output step used by a segment of a simulation starting at
+    `seg_start`. Outputs are at intervals from the start of each segment, so 
+    if the segment doesn't start on the output grid of the whole simulation,
+    it outputs every step (and only the times on the grid are kept)"""
+    if (not output_step) or ((seg_start - t_start) % output_step == 0):
+        return output_step
+    return step_size
+
+def _copy_jacobian(src_path : str, dst_path : str, keep = None):
+    """Appends the jacobian output of a run to a file. If `keep` is given, 
+    only the rows at times for which keep(time) is true are appended (with 
+    each row on a single line, see read_output.jacobian_rows)"""
+    if keep is None:
+        with open(src_path) as file, open(dst_path, "a") as out_file:
+            shutil.copyfileobj(file, out_file)
+        return
+    
+    with open(src_path) as file, open(dst_path, "a") as out_file:
+        for row in jacobian_rows(file):
+            if keep(float(row[0])):
+                out_file.write(" ".join(row) + "\n")
+
+def _ingest_run(model_path : str, species, keep_rundirs : bool, 
+                jacobian_path : str = "", archive : str = "", 
+                keep_time = None, jacobian_output_step : int = 0,
+                reaction_rates_output_step : int = None, t_start : int = 0):
+    """Reads the output files of a model run (see read_output.read_run_outputs)
+    and then removes the model directory, unless requested to keep it (in 
+    which case its output is compressed if an `archive` method is given, see 
+    archive.archive_output). If `jacobian_path` is given, the jacobian output 
+    (and the order of the species in it) is appended to that directory 
+    first.
+    
+    For the segments of a simulation, `keep_time` is a function which tests 
+    whether an output time belongs to this segment. Only the jacobian rows 
+    and reaction rates files at these times on the output grids of the whole 
+    simulation (from `t_start`) are kept."""
+    outputs = read_run_outputs(model_path, species = species)
+    
+    if jacobian_path:
+        species_path = f"{model_path}/configuration/mechanism.species"
+        keep = None
+        if keep_time is not None:
+            keep = lambda t: keep_time(t) and _on_grid(t, t_start, jacobian_output_step)
+        _copy_jacobian(f"{model_path}/output/jacobian.output", 
+                       f"{jacobian_path}/jacobian.output", keep)
+        if os.path.isfile(species_path):
+            shutil.copy(species_path, jacobian_path)
+    
+    #remove reaction rates output outside of this segment or off the output
+    #grid of the whole simulation from kept model directories
+    rxn_rates_path = f"{model_path}/output/reactionRates"
+    if keep_rundirs and (keep_time is not None) and os.path.isdir(rxn_rates_path):
+        for name in os.listdir(rxn_rates_path):
+            t = float(name)
+            if not (keep_time(t) and _on_grid(t, t_start, reaction_rates_output_step)):
+                os.remove(f"{rxn_rates_path}/{name}")
+    
+    if not keep_rundirs:
+        os.system(f"rm -r {model_path}")
+    elif archive:
+        archive_output(model_path, method = archive)
+    
+    return outputs
+
 def find_unique_dirname(atchem2_path : str):
     """Creates a unique model sub-directory name based on the current datetime. 
     This should avoid over-writing existing model sub-directories when running 
@@ -221,20 +443,19 @@ def _write_build_run_injections(injection_df : pd.DataFrame, atchem2_path : str,
                                 photo_constant : pd.Series, photo_constrain : pd.DataFrame, 
                                 env_vals : pd.Series, spec_output : list, 
                                 rate_output : list, lat : float, lon : float,
-                                keep_rundirs : bool):
+                                keep_rundirs : bool, families : dict = DEFAULT_FAMILIES,
+                                constraint_store : str = "", rates_output_step : int = None,
+                                reaction_rates_output_step : int = None,
+                                jacobian_output_step : int = 0, jacobian_path : str = "",
+                                archive : str = ""):
     """Called by the 'write_build_run' function to configure, build and run
     a specified AtChem2 model including instantaneous increases in 
     concentrations of certain species. """
     
-    #dataframe to store model outputs
-    stitched_output = pd.DataFrame(dtype=float)
-    #dataframes to store rate outputs
-    stitched_loss_rates = pd.DataFrame(dtype=float)
-    stitched_prod_rates = pd.DataFrame(dtype=float)
-    #dataframe to store environment variables
-    stitched_env = pd.DataFrame(dtype=float)
-    #dataframe to store photolysis rates
-    stitched_photo = pd.DataFrame(dtype=float)
+    #the output of each run is read in the background while the next run is
+    #built and run, and the outputs are stitched together once all have been
+    #read (leaving the executor block waits for them, even on an error)
+    segments = []
     
    
     #make a list of ordered injection times to iterate through
@@ -247,109 +468,110 @@ def _write_build_run_injections(injection_df : pd.DataFrame, atchem2_path : str,
     ordered_times.insert(0, t_start)
     
     all_specs = return_all_species(mech_path)
+    #resolve the families that can be injected (e.g. NOx) once
+    fams = compile_families(all_specs, families, mech_path)
     
-    for i,inj_time in enumerate(ordered_times):
-        #copy atchem2 model directory 
-        new_model_dir = find_unique_dirname(atchem2_path)
-        new_model_path = f"{atchem2_path}/{new_model_dir}"
-        os.system(f"cp -r {atchem2_path}/model {new_model_path}")
-        #copy the mechanism to the AtChem directory
-        new_mech_path = f"{new_model_path}/{mech_path.split('/')[-1]}"
-        os.system(f"cp {mech_path} {new_mech_path}")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for i,inj_time in enumerate(ordered_times):
+            #copy atchem2 model directory 
+            new_model_dir = find_unique_dirname(atchem2_path)
+            new_model_path = f"{atchem2_path}/{new_model_dir}"
+            os.system(f"cp -r {atchem2_path}/model {new_model_path}")
+            #copy the mechanism to the AtChem directory
+            new_mech_path = f"{new_model_path}/{mech_path.split('/')[-1]}"
+            os.system(f"cp {mech_path} {new_mech_path}")
         
-        #write config files using data passed
-        write_config(new_model_path, initial_concs=initial_concs, 
-                     spec_constrain=spec_constrain, spec_constant=spec_constant,
-                     env_constrain=env_constrain, env_vals=env_vals, 
-                     photo_constant = photo_constant, photo_constrain = photo_constrain,
-                     spec_output=all_specs,
-                     rate_output=all_specs) #return all species for now (all needed to set the new start concs)
+            #write config files using data passed
+            write_config(new_model_path, initial_concs=initial_concs, 
+                         spec_constrain=spec_constrain, spec_constant=spec_constant,
+                         env_constrain=env_constrain, env_vals=env_vals, 
+                         photo_constant = photo_constant, photo_constrain = photo_constrain,
+                         spec_output=all_specs,
+                         rate_output=all_specs, #return all species for now (all needed to set the new start concs)
+                         constraint_store=constraint_store)
 
         
-        if (i != (len(ordered_times)-1)): #if this isn't the last iteration then 
-        #calculate the next injection time, otherwise the next injection time
-        #is just the model end time
-            next_injtime = ordered_times[i+1]
-        else:
-            next_injtime = t_end
-            
-        if i != 0: #if it isn't the first run, then adjust concentrations based on required injections
-        #rewrite initial concentrations file to match the model output from
-        #the previous model run
-            new_start_concs = stitched_output.loc[min(stitched_output.index, key=lambda x:abs(x-inj_time))] #species concentrations at the closest time to the previous injection time
+            if (i != (len(ordered_times)-1)): #if this isn't the last iteration then 
+            #calculate the next injection time, otherwise the next injection time
+            #is just the model end time
+                next_injtime = ordered_times[i+1]
+            else:
+                next_injtime = t_end
             
-            #change the start concentrations for species injected this time
-            specs = injection_df.loc[inj_time].dropna().index.to_list()
-            for s in specs:
-                if s != "NOx":
-                    new_start_concs.loc[s] = injection_df.loc[inj_time, s]
-                else:
-                    #for the NOx constraint, calculate the NO/NO2 ratio 
-                    #and change NOx such that the ratio is preserved.
-                    old_no = new_start_concs.loc["NO"]
-                    old_no2 = new_start_concs.loc["NO2"]
-                    
-                    old_total_nox = old_no + old_no2
-                    nox_deficit = injection_df.loc[inj_time, s] - old_total_nox                             
-                    
-                    new_no = (old_no + (nox_deficit*(old_no/old_total_nox)))
-                    new_no2 = (old_no2 + (nox_deficit*(old_no2/old_total_nox)))
-                    
-                    new_start_concs.loc["NO"] = new_no
-                    new_start_concs.loc["NO2"] = new_no2
+            if i != 0: #if it isn't the first run, then adjust concentrations based on required injections
+            #rewrite initial concentrations file to match the model output from
+            #the previous model run
+                new_start_concs = restart_concs.copy()
             
-            init_lines = [f"{k} {v}\n" for k,v in new_start_concs.to_dict().items()]
+                #change the start concentrations for species injected this time
+                specs = injection_df.loc[inj_time].dropna().index.to_list()
+                for s in specs:
+                    if (s in fams.names) and (s not in all_specs):
+                        #for family injections (e.g. NOx), scale the family members
+                        #such that the ratio between them is preserved.
+                        new_start_concs = scale_family(new_start_concs, 
+                                                       family_members(fams, s),
+                                                       injection_df.loc[inj_time, s])
+                    else:
+                        new_start_concs.loc[s] = injection_df.loc[inj_time, s]
             
-            with open(new_model_path+"/configuration/initialConcentrations.config",
-                      "w") as file:
-                file.writelines(init_lines)
+                series_to_config_file(new_start_concs, 
+                                      new_model_path+"/configuration/initialConcentrations.config",
+                                      round_nums = False)
         
     
-        #rewrite model parameters file to only run for the length of the 
-        #injection of interest
-        model_length=(next_injtime+step_size) - inj_time
-        nsteps=int(model_length/step_size)
+            #rewrite model parameters file to only run for the length of the 
+            #injection of interest
+            model_length=(next_injtime+step_size) - inj_time
+            nsteps=int(model_length/step_size)
                
-        write_model_params(new_model_path, nsteps, step_size, inj_time, day, 
-                           month, year, lat=lat, lon=lon)
+            #outputs are at intervals from the start of each run, so if this run
+            #doesn't start on an output grid of the whole simulation, output every
+            #step (and keep only the times on the grid)
+            write_model_params(new_model_path, nsteps, step_size, inj_time, day, 
+                               month, year, lat=lat, lon=lon,
+                               rates_output_step = _segment_step(inj_time, t_start, rates_output_step, step_size),
+                               reaction_rates_output_step = _segment_step(inj_time, t_start, reaction_rates_output_step, step_size),
+                               jacobian_output_step = _segment_step(inj_time, t_start, jacobian_output_step, step_size))
         
-        #build and run the model
-        build_model(atchem2_path, new_mech_path, new_model_dir)
-        run_model(atchem2_path, new_model_dir)
+            #build and run the model
+            build_model(atchem2_path, new_mech_path, new_model_dir)
+            run_model(atchem2_path, new_model_dir)
+        
+            #read the concentrations of all species at the next injection time 
+            #(from the end of the output file) to start the next run
+            restart_concs = restart_concentrations(f"{new_model_path}/output/speciesConcentrations.output",
+                                                   time = next_injtime)
+        
+            #read the model output (only the output species) and remove the model
+            #directory in the background
+            segments.append((executor.submit(_ingest_run, os.path.abspath(new_model_path),
+                                             spec_output, keep_rundirs, jacobian_path,
+                                             archive, 
+                                             lambda t, first=inj_time, last=next_injtime: first <= t <= last,
+                                             jacobian_output_step, reaction_rates_output_step,
+                                             t_start), 
+                             next_injtime))
+    
+    outputs = []
+    for future, next_injtime in segments:
+        output, loss_output, prod_output, env_output, photo_output = future.result()
         
-        #read the model output and append it to the stitched df
-        output = pd.read_csv(f"{new_model_path}/output/speciesConcentrations.output", 
-                             index_col=0, sep='\s+')
-        loss_output = pd.read_csv(f"{new_model_path}/output/lossRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
-        prod_output = pd.read_csv(f"{new_model_path}/output/productionRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
-        env_output = pd.read_csv(f"{new_model_path}/output/environmentVariables.output", 
-                                 index_col=0, sep='\s+')
-        photo_output = pd.read_csv(f"{new_model_path}/output/photolysisRates.output", 
-                                 index_col=0, sep='\s+')
-
         #trim off the values that are accounted for by subsequent iterations
         output = output.iloc[:-1,:]
-        loss_output = loss_output.loc[loss_output["time"]!=(next_injtime+step_size),:]
-        prod_output = prod_output.loc[prod_output["time"]!=(next_injtime+step_size),:]
+        loss_output = _on_output_grid(loss_output.loc[loss_output["time"]<=next_injtime,:],
+                                      t_start, rates_output_step)
+        prod_output = _on_output_grid(prod_output.loc[prod_output["time"]<=next_injtime,:],
+                                      t_start, rates_output_step)
         env_output = env_output.iloc[:-1,:]
         photo_output = photo_output.iloc[:-1,:]
-                
-        stitched_output = pd.concat([stitched_output, output])
-        stitched_loss_rates = pd.concat([stitched_loss_rates, loss_output])
-        stitched_prod_rates = pd.concat([stitched_prod_rates, prod_output])
-        stitched_env = pd.concat([stitched_env, env_output])
-        stitched_photo = pd.concat([stitched_photo, photo_output])
+        
+        outputs.append((output, loss_output, prod_output, env_output, photo_output))
     
-        #remove model directory (unless requested to keep)
-        if not keep_rundirs:
-            os.system(f"rm -r {new_model_path}")
+    (stitched_output, stitched_loss_rates, stitched_prod_rates, stitched_env, 
+     stitched_photo) = [pd.concat(x) for x in zip(*outputs)]
         
     #select only the output speices
-    stitched_output = stitched_output[spec_output]
     stitched_loss_rates = stitched_loss_rates[stitched_loss_rates["speciesName"].isin(rate_output)]
     stitched_prod_rates = stitched_prod_rates[stitched_prod_rates["speciesName"].isin(rate_output)]
 
@@ -365,7 +587,11 @@ def _write_build_run_nox_constraint(nox_series : pd.Series, atchem2_path : str,
                                     photo_constant : pd.Series, photo_constrain : pd.DataFrame, 
                                     env_vals : pd.Series, spec_output : list, 
                                     rate_output : list, lat : float, lon : float,
-                                    keep_rundirs : bool):
+                                    keep_rundirs : bool, families : dict = DEFAULT_FAMILIES,
+                                    constraint_store : str = "", rates_output_step : int = None,
+                                    reaction_rates_output_step : int = None,
+                                    jacobian_output_step : int = 0, jacobian_path : str = "",
+                                    archive : str = ""):
     """Called by the 'write_build_run' function to configures, build and run
     a specified AtChem2 model including a constraint on total NOx, while NO 
     and NO2 are allowed to vary freely.
@@ -375,21 +601,22 @@ CHECK ANY MODEL OUTPUT THOROUGHLY TO ENSURE THE RESULTS ARE AS EXPECTED.
 THE NOX CONSTRAINT FEATURE IS ALSO VERY SLOW AS IT REQUIRES THE REPEATED
 BUILDING OF MANY INDIVIDUAL MODELS.""")
     
-    #dataframe to store model outputs
-    stitched_output = pd.DataFrame(dtype=float)
-    #dataframes to store rate outputs
-    stitched_loss_rates = pd.DataFrame(dtype=float)
-    stitched_prod_rates = pd.DataFrame(dtype=float)
-    #dataframe to store environment variables
-    stitched_env = pd.DataFrame(dtype=float)
-    #dataframe to store photolysis rates
-    stitched_photo = pd.DataFrame(dtype=float)
+    #the output of each run is read in the background while the next run is
+    #built and run, and the outputs are stitched together once all have been
+    #read (leaving the executor block waits for them, even on an error)
+    segments = []
    
     #calculate the number of timesteps the model must run for
     model_length = t_end - t_start
     nsteps=int(model_length/step_size)
     
     all_specs = return_all_species(mech_path)
+    #use the default definition of NOx if it isn't given in families
+    nox_members = family_members(compile_families(all_specs, 
+                                                  {"NOx" : families.get("NOx", DEFAULT_FAMILIES["NOx"])},
+                                                  mech_path), "NOx")
+    if len(nox_members) == 0:
+        raise Exception(f"None of the members of the NOx family are species of the mechanism {mech_path}")
     
     #interpolate the nox series to ensure there are values for every model time
     nox_series_interp = nox_series.loc[t_start:t_end]
@@ -398,104 +625,100 @@ BUILDING OF MANY INDIVIDUAL MODELS.""")
                                                             step_size))
     nox_series_interp = nox_series_interp.interpolate()
     
-    for istep in range(nsteps):
-        step_time = t_start + (istep*step_size)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for istep in range(nsteps):
+            step_time = t_start + (istep*step_size)
         
-        #copy atchem2 model directory 
-        new_model_dir = find_unique_dirname(atchem2_path)
-        new_model_path = f"{atchem2_path}/{new_model_dir}"
-        os.system(f"cp -r {atchem2_path}/model {new_model_path}")
+            #copy atchem2 model directory 
+            new_model_dir = find_unique_dirname(atchem2_path)
+            new_model_path = f"{atchem2_path}/{new_model_dir}"
+            os.system(f"cp -r {atchem2_path}/model {new_model_path}")
 
-        #copy the mechanism to the AtChem directory
-        new_mech_path = f"{new_model_path}/{mech_path.split('/')[-1]}"
-        os.system(f"cp {mech_path} {new_mech_path}")
+            #copy the mechanism to the AtChem directory
+            new_mech_path = f"{new_model_path}/{mech_path.split('/')[-1]}"
+            os.system(f"cp {mech_path} {new_mech_path}")
         
-        #write config files using data passed
-        write_config(new_model_path, initial_concs=initial_concs, 
-                     spec_constrain=spec_constrain, spec_constant=spec_constant,
-                     env_constrain=env_constrain, env_vals=env_vals, 
-                     photo_constant = photo_constant, photo_constrain = photo_constrain,
-                     spec_output=all_specs,
-                     rate_output=all_specs) #return all species for now (all needed to set the new start concs)
+            #write config files using data passed
+            write_config(new_model_path, initial_concs=initial_concs, 
+                         spec_constrain=spec_constrain, spec_constant=spec_constant,
+                         env_constrain=env_constrain, env_vals=env_vals, 
+                         photo_constant = photo_constant, photo_constrain = photo_constrain,
+                         spec_output=all_specs,
+                         rate_output=all_specs, #return all species for now (all needed to set the new start concs)
+                         constraint_store=constraint_store)
 
         
-        if istep != 0: #if it isn't the first run, then adjust concentrations based on required injections
-        #rewrite initial concentrations file to match the model output from
-        #the previous model run
-            new_start_concs = stitched_output.iloc[-1] #species concentrations at the last time step
-            
-            #for the NOx constraint, calculate the NO/NO2 ratio 
-            #and change NOx such that the ratio is preserved.
-            old_no = new_start_concs.loc["NO"]
-            old_no2 = new_start_concs.loc["NO2"]
-            
-            old_total_nox = old_no + old_no2
-            nox_deficit = nox_series_interp[step_time] - old_total_nox                             
-            
-            new_no = (old_no + (nox_deficit*(old_no/old_total_nox)))
-            new_no2 = (old_no2 + (nox_deficit*(old_no2/old_total_nox)))
-            
-            new_start_concs.loc["NO"] = new_no
-            new_start_concs.loc["NO2"] = new_no2
+            if istep != 0: #if it isn't the first run, then adjust concentrations based on required injections
+            #rewrite initial concentrations file to match the model output from
+            #the previous model run
+                new_start_concs = restart_concs.copy()
             
-            init_lines = [f"{k} {v}\n" for k,v in new_start_concs.to_dict().items()]
+                #for the NOx constraint, scale the NOx family members such that 
+                #the ratio between them is preserved.
+                new_start_concs = scale_family(new_start_concs, nox_members, 
+                                               nox_series_interp[step_time])
             
-            with open(new_model_path+"/configuration/initialConcentrations.config",
-                      "w") as file:
-                file.writelines(init_lines)
-        else: #just check that we have some NOx in the model if this is the first step
-            if not any([x in initial_concs.keys() for x in ["NO","NO2"]]):
-                #if there is not initial NO or NO2 specified, then split the
-                #given NOx value 50:50 between NO and NO2
-                half_val = nox_series_interp[step_time]/2
+                series_to_config_file(new_start_concs, 
+                                      new_model_path+"/configuration/initialConcentrations.config",
+                                      round_nums = False)
+            else: #just check that we have some NOx in the model if this is the first step
+                if not any([x in initial_concs.keys() for x in nox_members.index]):
+                    #if there is not initial NO or NO2 specified, then split the
+                    #given NOx value evenly between NO and NO2
+                    split_vals = scale_family(pd.Series(dtype=float), nox_members, 
+                                              nox_series_interp[step_time])
                 
-                with open(new_model_path+"/configuration/initialConcentrations.config",
-                          "a") as file:
-                    file.write(f"NO2 {half_val}\nNO {half_val}")
+                    with open(new_model_path+"/configuration/initialConcentrations.config",
+                              "a") as file:
+                        file.write("\n".join([f"{k} {v}" for k,v in split_vals.items()]))
             
     
-        #rewrite model parameters file to only run for the length of the 
-        #injection of interest
+            #rewrite model parameters file to only run for the length of the 
+            #injection of interest
                
-        write_model_params(new_model_path, 1, step_size, step_time, day, 
-                           month, year, lat=lat, lon=lon)
+            #outputs are at intervals from the start of each run, so if this run
+            #doesn't start on an output grid of the whole simulation, output every
+            #step (and keep only the times on the grid)
+            write_model_params(new_model_path, 1, step_size, step_time, day, 
+                               month, year, lat=lat, lon=lon,
+                               rates_output_step = _segment_step(step_time, t_start, rates_output_step, step_size),
+                               reaction_rates_output_step = _segment_step(step_time, t_start, reaction_rates_output_step, step_size),
+                               jacobian_output_step = _segment_step(step_time, t_start, jacobian_output_step, step_size))
         
-        #build and run the model
-        build_model(atchem2_path, new_mech_path, new_model_dir)
-        run_model(atchem2_path, new_model_dir)
+            #build and run the model
+            build_model(atchem2_path, new_mech_path, new_model_dir)
+            run_model(atchem2_path, new_model_dir)
+        
+            #read the concentrations of all species at the last time step (from 
+            #the end of the output file) to start the next run
+            restart_concs = restart_concentrations(f"{new_model_path}/output/speciesConcentrations.output")
         
-        #read the model output and append it to the stitched df
-        output = pd.read_csv(f"{new_model_path}/output/speciesConcentrations.output", 
-                             index_col=0, sep='\s+')
-        loss_output = pd.read_csv(f"{new_model_path}/output/lossRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
-        prod_output = pd.read_csv(f"{new_model_path}/output/productionRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
-        env_output = pd.read_csv(f"{new_model_path}/output/environmentVariables.output", 
-                                 index_col=0, sep='\s+')
-        photo_output = pd.read_csv(f"{new_model_path}/output/photolysisRates.output", 
-                                 index_col=0, sep='\s+')
+            #read the model output (only the output species) and remove the model
+            #directory in the background
+            segments.append(executor.submit(_ingest_run, os.path.abspath(new_model_path),
+                                            spec_output, keep_rundirs, jacobian_path,
+                                            archive, lambda t: True,
+                                            jacobian_output_step, reaction_rates_output_step,
+                                            t_start))
+    
+    outputs = []
+    for istep, future in enumerate(segments):
+        output, loss_output, prod_output, env_output, photo_output = future.result()
 
         #trim off the first value (if this isn't the first step)
         if istep != 0:
             output = output.iloc[1:,:]
             env_output = env_output.iloc[1:,:]
             photo_output = photo_output.iloc[1:-1,:]
-
-        stitched_output = pd.concat([stitched_output, output])
-        stitched_loss_rates = pd.concat([stitched_loss_rates, loss_output])
-        stitched_prod_rates = pd.concat([stitched_prod_rates, prod_output])
-        stitched_env = pd.concat([stitched_env, env_output])
-        stitched_photo = pd.concat([stitched_photo, photo_output])
-
-        #remove model directory (unless requested to keep)
-        if not keep_rundirs:
-            os.system(f"rm -r {new_model_path}")
+        loss_output = _on_output_grid(loss_output, t_start, rates_output_step)
+        prod_output = _on_output_grid(prod_output, t_start, rates_output_step)
+        
+        outputs.append((output, loss_output, prod_output, env_output, photo_output))
+    
+    (stitched_output, stitched_loss_rates, stitched_prod_rates, stitched_env, 
+     stitched_photo) = [pd.concat(x) for x in zip(*outputs)]
         
     #select only the output speices
-    stitched_output = stitched_output[spec_output]
     stitched_loss_rates = stitched_loss_rates[stitched_loss_rates["speciesName"].isin(rate_output)]
     stitched_prod_rates = stitched_prod_rates[stitched_prod_rates["speciesName"].isin(rate_output)]
     
@@ -519,16 +742,34 @@ def write_build_run(atchem2_path : str, mech_path : str, day : int, month : int,
                                                               "BLHEIGHT", "DILUTE", 
                                                               "JFAC", "ROOF", "ASA"]),
                     spec_output : list = [], rate_output : list = [], keep_rundirs : bool = False,
-                    injection_df : pd.DataFrame = pd.DataFrame, nox_series : pd.Series = pd.Series):
+                    injection_df : pd.DataFrame = pd.DataFrame, nox_series : pd.Series = pd.Series,
+                    families : dict = DEFAULT_FAMILIES, constraint_store : str = "",
+                    rates_output_step : int = None, 
+                    reaction_rates_output_step : int = None,
+                    jacobian_output_step : int = 0, jacobian_path : str = "",
+                    archive : str = ""):
     """Configures, builds and runs a specified AtChem2 model. 
     
+    Concentrations are output every `step_size` seconds. Loss and production 
+    rates are output every `rates_output_step` seconds and reaction rates 
+    every `reaction_rates_output_step` seconds (both default to `step_size`),
+    and the jacobian every `jacobian_output_step` seconds (0 for no output). 
+    Each must be a multiple of `step_size`; outputting rates less often than
+    concentrations greatly reduces the size of the rate output. If 
+    `jacobian_path` is given, the jacobian output (jacobian.output) and the 
+    order of the species in it (mechanism.species) are saved to that 
+    directory, and can be read with read_output.jacobian_matrices. 
+    
     If `injection_df` is specified, then a series of models 
     will be run to simulate a chamber experiments with the (instantaneous) 
     introduction of species into the chamber mid-experiment. 
     injection_df should be a pandas dataframe with columns for each species 
     which undergoes injections and a time index in model time. Each species 
     should then have concentration values defined at the required injection 
-    times, with all other time values being NaNs.
+    times, with all other time values being NaNs. Columns can also be the 
+    names of families defined in `families` (e.g. "NOx"), in which case the 
+    family members are scaled to match the injected total while preserving 
+    the ratios between them.
 
 
     If nox_series is specified, then a series of one step models 
@@ -540,8 +781,35 @@ def write_build_run(atchem2_path : str, mech_path : str, day : int, month : int,
     timesteps.
     WARNING. THIS NOX CONSTRAINT FEATURE IS EXPERIMENTAL AND ALSO VERY SLOW. 
     CHECK ANY MODEL OUTPUT THOROUGHLY TO ENSURE THE RESULTS ARE AS EXPECTED.
+    
+    If `constraint_store` is given, constraint files are written once to that
+    content-addressed directory and linked into each model directory (see 
+    write_config). The store can be shared between all runs of an ensemble.
+    
+    If `archive` is "gzip" or "xz", the output of model directories kept with
+    `keep_rundirs` is compressed after it has been read (see 
+    archive.archive_output). The compressed outputs can still be read with 
+    the functions in read_output.
     """
     
+    if archive and (archive not in ["gzip", "xz"]):
+        raise Exception(f"archive must be 'gzip' or 'xz', not {archive}")
+    if archive and (not keep_rundirs):
+        warnings.warn("archive has no effect unless keep_rundirs is True.")
+    
+    (rates_output_step, reaction_rates_output_step, 
+     jacobian_output_step) = _output_steps(step_size, rates_output_step, 
+                                           reaction_rates_output_step,
+                                           jacobian_output_step)
+    
+    if jacobian_path:
+        if not jacobian_output_step:
+            raise Exception("jacobian_output_step must be set to save the jacobian output to jacobian_path")
+        #the jacobian output of every run is appended to the same file
+        jacobian_path = os.path.abspath(jacobian_path)
+        os.makedirs(jacobian_path, exist_ok=True)
+        wipe_file(f"{jacobian_path}/jacobian.output")
+    
     if (not injection_df.empty) and (not nox_series.empty):
         raise Exception("""Cannot run models using both species injections and 
                         NOx constraints. Select either injection_dict or 
@@ -566,7 +834,14 @@ def write_build_run(atchem2_path : str, mech_path : str, day : int, month : int,
                                            spec_output = spec_output,
                                            rate_output = rate_output,
                                            lat = lat,
-                                           lon = lon, keep_rundirs = keep_rundirs)
+                                           lon = lon, keep_rundirs = keep_rundirs,
+                                           families = families,
+                                           constraint_store = constraint_store,
+                                           rates_output_step = rates_output_step,
+                                           reaction_rates_output_step = reaction_rates_output_step,
+                                           jacobian_output_step = jacobian_output_step,
+                                           jacobian_path = jacobian_path,
+                                           archive = archive)
     elif not nox_series.empty:
         return _write_build_run_nox_constraint(nox_series = nox_series, 
                                                atchem2_path = atchem2_path, 
@@ -587,7 +862,14 @@ def write_build_run(atchem2_path : str, mech_path : str, day : int, month : int,
                                                spec_output = spec_output,
                                                rate_output = rate_output,
                                                lat = lat,
-                                               lon = lon, keep_rundirs = keep_rundirs)
+                                               lon = lon, keep_rundirs = keep_rundirs,
+                                           families = families,
+                                           constraint_store = constraint_store,
+                                           rates_output_step = rates_output_step,
+                                           reaction_rates_output_step = reaction_rates_output_step,
+                                           jacobian_output_step = jacobian_output_step,
+                                           jacobian_path = jacobian_path,
+                                           archive = archive)
     else:
     
         #copy atchem2 model directory 
@@ -605,39 +887,162 @@ def write_build_run(atchem2_path : str, mech_path : str, day : int, month : int,
                      env_constrain=env_constrain, env_vals=env_vals, 
                      photo_constant = photo_constant, photo_constrain = photo_constrain,
                      spec_output=spec_output,
-                     rate_output=rate_output)
+                     rate_output=rate_output, 
+                     constraint_store=constraint_store)
         
         #change model parameters
         model_length=t_end-t_start
         nsteps=int(model_length/step_size)
     
         write_model_params(new_model_path, nsteps, step_size, t_start, day, 
-                           month, year, lat=lat, lon=lon)
+                           month, year, lat=lat, lon=lon,
+                           rates_output_step = rates_output_step,
+                           reaction_rates_output_step = reaction_rates_output_step,
+                           jacobian_output_step = jacobian_output_step)
         
         #build and run the model
         build_model(atchem2_path, new_mech_path, new_model_dir)
         run_model(atchem2_path, new_model_dir)
         
-        #read the model output 
-        output = pd.read_csv(f"{new_model_path}/output/speciesConcentrations.output", 
-                             index_col=0, sep='\s+')
+        #read the model output files concurrently, then remove the model 
+        #directory (unless requested to keep)
+        (output, loss_output, prod_output, env_output, 
+         photo_output) = _ingest_run(new_model_path, "ALL", keep_rundirs,
+                                     jacobian_path, archive)
+        
+        return (output, loss_output, prod_output, env_output, photo_output)
+
+#the AtChem2 directory used by a write_build_run_batch worker process
+_worker_atchem2_path = ""
+
+def _claim_atchem2_path(paths_queue):
+    """Assigns an AtChem2 directory to a write_build_run_batch worker process"""
+    global _worker_atchem2_path
+    _worker_atchem2_path = paths_queue.get()
+
+def _run_batch_job(kwargs : dict):
+    """Runs write_build_run in the AtChem2 directory of this worker process"""
+    return write_build_run(atchem2_path = _worker_atchem2_path, **kwargs)
+
+def write_build_run_batch(atchem2_paths : list, jobs : list):
+    """Runs write_build_run for each dictionary of keyword arguments in `jobs`
+    (without `atchem2_path`) in parallel, returning a list of the outputs in 
+    the same order as `jobs`.
+    
+    As AtChem2 models are built in place, one job at a time is run in each of
+    the AtChem2 directories in `atchem2_paths` (each a separate copy of 
+    AtChem2), so the number of directories sets the number of jobs run at 
+    once. Each job runs in its own process, as building and running models 
+    changes the working directory."""
+    paths_queue = multiprocessing.Queue()
+    for path in atchem2_paths:
+        paths_queue.put(path)
+    
+    with ProcessPoolExecutor(max_workers = len(atchem2_paths), 
+                             initializer = _claim_atchem2_path,
+                             initargs = (paths_queue,)) as executor:
+        return list(executor.map(_run_batch_job, jobs))
+
+def spin_up(atchem2_path : str, mech_path : str, day : int, month : int, 
+            year : int, t_start : int, lat : float, lon : float, step_size : int, 
+            compare_species : list, rtol : float = 0.01, max_days : int = 10,
+            initial_concs : pd.Series = pd.Series(), 
+            spec_constrain : pd.DataFrame = pd.DataFrame(), 
+            spec_constant : pd.Series = pd.Series(), 
+            env_constrain : pd.DataFrame = pd.DataFrame(), 
+            photo_constant : pd.Series = pd.Series(), 
+            photo_constrain : pd.DataFrame = pd.DataFrame(), 
+            env_vals : pd.Series = pd.Series(["298.15", "1013.25", "NOTUSED",
+                                              "3.91e+17", "0.41", "NOTUSED", 
+                                              "NOTUSED", "NOTUSED", "OPEN", 
+                                              "NOTUSED"], 
+                                             index = ["TEMP", "PRESS", 
+                                                      "RH", "H2O", "DEC", 
+                                                      "BLHEIGHT", "DILUTE", 
+                                                      "JFAC", "ROOF", "ASA"]),
+            keep_rundirs : bool = False, day_length : int = 86400,
+            constraint_store : str = "", archive : str = ""):
+    """Runs a model repeatedly over the same day (from `t_start` for 
+    `day_length` seconds) until it reaches a periodic (diurnal) steady state, 
+    with the concentrations at the end of each day used as the initial 
+    concentrations of the next. The model is built once and re-run for each 
+    day.
+    
+    The model is considered converged once the largest change in the 
+    concentration of each of `compare_species` between one day and the 
+    previous, relative to the largest concentration of that species during 
+    the previous day, is less than `rtol`. At most `max_days` days are run.
+    
+    Returns the concentrations of all species at the end of the final day 
+    (for use as `initial_concs` in subsequent runs), the concentration output 
+    of the final day, and the number of days run. If `archive` is given, a 
+    kept model directory's output is compressed (see write_build_run)."""
+    
+    if max_days < 1:
+        raise Exception(f"max_days must be at least 1, not {max_days}")
+    
+    #copy atchem2 model directory 
+    new_model_dir = find_unique_dirname(atchem2_path)
+    new_model_path = f"{atchem2_path}/{new_model_dir}"
+    os.system(f"cp -r {atchem2_path}/model {new_model_path}")
+
+    #copy the mechanism to the AtChem directory
+    new_mech_path = f"{new_model_path}/{mech_path.split('/')[-1]}"
+    os.system(f"cp {mech_path} {new_mech_path}")
+    
+    all_specs = return_all_species(mech_path)
+    
+    #write config files using data passed (all species are needed to restart
+    #the model each day, but no rate output is needed)
+    write_config(new_model_path, initial_concs=initial_concs, 
+                 spec_constrain=spec_constrain, spec_constant=spec_constant,
+                 env_constrain=env_constrain, env_vals=env_vals, 
+                 photo_constant = photo_constant, photo_constrain = photo_constrain,
+                 spec_output=all_specs, rate_output=[], 
+                 constraint_store=constraint_store)
+    
+    nsteps=int(day_length/step_size)
+    write_model_params(new_model_path, nsteps, step_size, t_start, day, 
+                       month, year, lat=lat, lon=lon)
+    
+    #the model only needs to be built once, as the configuration files are 
+    #read when the model is run
+    build_model(atchem2_path, new_mech_path, new_model_dir)
+    
+    prev_output = None
+    converged = False
+    for iday in range(max_days):
+        run_model(atchem2_path, new_model_dir)
         
-        loss_output = pd.read_csv(f"{new_model_path}/output/lossRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
-        prod_output = pd.read_csv(f"{new_model_path}/output/productionRates.output", 
-                                  sep='\s+',
-                                  keep_default_na=False)
+        output = species_concentrations_df(f"{new_model_path}/output/speciesConcentrations.output")
         
-        env_output = pd.read_csv(f"{new_model_path}/output/environmentVariables.output", 
-                                 index_col=0, sep='\s+')
+        if prev_output is not None:
+            prev = prev_output[compare_species].to_numpy()
+            new = output[compare_species].to_numpy()
+            
+            #largest change relative to the largest concentration of each species
+            scale = np.abs(prev).max(axis=0)
+            scale[scale == 0] = np.finfo(float).tiny
+            rel_change = (np.abs(new - prev).max(axis=0)/scale).max()
+            
+            if rel_change < rtol:
+                converged = True
+                break
         
-        photo_output = pd.read_csv(f"{new_model_path}/output/photolysisRates.output", 
-                                 index_col=0, sep='\s+')
+        prev_output = output
         
-        #remove model directory (unless requested to keep)
-        if not keep_rundirs:
-            os.system(f"rm -r {new_model_path}")
+        #use the concentrations at the end of the day to start the next day
+        series_to_config_file(output.iloc[-1], 
+                              f"{new_model_path}/configuration/initialConcentrations.config",
+                              round_nums = False)
         
-        return (output, loss_output, prod_output, env_output, photo_output)
-
+    if not converged:
+        warnings.warn(f"Model did not converge to within a relative tolerance of {rtol} after {max_days} days.")
+    
+    #remove model directory (unless requested to keep)
+    if not keep_rundirs:
+        os.system(f"rm -r {new_model_path}")
+    elif archive:
+        archive_output(new_model_path, method = archive)
+    
+    return output.iloc[-1], output, iday+1
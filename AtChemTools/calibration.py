@@ -0,0 +1,157 @@
+"""Functions to calibrate scalar model inputs (e.g. DILUTE, a scaling of the
+JFAC constraint, or a constant species concentration) against measured time
+series.
+
+Parameters are named "<argument>:<key>", where argument is a write_build_run
+argument and key is an index of a series argument (whose value is set, e.g.
+"env_vals:DILUTE" or "spec_constant:CH4") or a column of a dataframe argument
+(which is multiplied by the parameter, e.g. "env_constrain:JFAC").
+
+Parameters are optimised with a derivative-free compass (pattern) search: in
+each iteration every parameter is stepped up and down, all of the candidate
+runs are made in parallel, and the step is halved when no candidate improves
+on the current best. Evaluated points are cached, so revisited points are not
+run again."""
+#imports
+import warnings
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .build_and_run import write_build_run_batch
+from .constraint_processing import to_model_grid
+
+Calibration = namedtuple("Calibration", ["params", "objective", "history"])
+
+def apply_params(run_kwargs : dict, params : dict):
+    """Returns a copy of a dictionary of write_build_run arguments with the
+    given parameter values applied (see the module docstring for parameter
+    names). Series arguments have the value at the key set, and dataframe
+    arguments have the column of the key multiplied by the value."""
+    kwargs = dict(run_kwargs)
+    for name, value in params.items():
+        arg, _, key = name.partition(":")
+        if not key:
+            raise Exception(f"Parameter names must be of the form '<argument>:<key>', not {name}")
+
+        current = kwargs.get(arg, pd.Series(dtype=object))
+        if isinstance(current, pd.DataFrame):
+            if key not in current.columns:
+                raise Exception(f"Column {key} not in {arg}, so can't be scaled by parameter {name}")
+            current = current.copy()
+            current[key] = current[key] * value
+        elif isinstance(current, pd.Series):
+            #series of strings (e.g. env_vals) can also hold numeric values
+            current = current.astype(object)
+            current[key] = value
+        else:
+            raise TypeError(f"Parameter {name} must refer to a pandas Series or DataFrame argument")
+        kwargs[arg] = current
+
+    return kwargs
+
+def calibration_objective(conc_df : pd.DataFrame, meas_df : pd.DataFrame,
+                          weights : dict = {}):
+    """Returns the (weighted) sum over species of the mean squared error
+    between model concentrations and measurements on the model time grid,
+    normalised by the mean square of the measurements of each species. Times
+    without measurements are ignored."""
+    model = conc_df.reindex(index = meas_df.index, columns = meas_df.columns)
+    model = model.to_numpy(dtype=float)
+    meas = meas_df.to_numpy(dtype=float)
+
+    #species without any measurements give an empty mean (and an infinite
+    #objective), which isn't worth a warning
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        nmse = np.nanmean((model - meas)**2, axis=0)/np.nanmean(meas**2, axis=0)
+    nmse = np.where(np.isnan(nmse), np.inf, nmse)
+
+    w = np.array([weights.get(s, 1.0) for s in meas_df.columns])
+
+    return float((w * nmse).sum())
+
+def calibrate(atchem2_paths : list, run_kwargs : dict, params : dict,
+              measurements : pd.DataFrame, initial : dict = {},
+              step : float = 0.25, tol : float = 0.01, max_iter : int = 50,
+              weights : dict = {}, grid_method : str = "mean"):
+    """Finds the parameter values which best match model concentrations to
+    measurements, using a compass search with the candidate runs of each
+    iteration made in parallel (one at a time in each AtChem2 directory in
+    `atchem2_paths`, see build_and_run.write_build_run_batch).
+
+    `params` is a dictionary of parameter names and (lower, upper) bounds,
+    `initial` an optional dictionary of starting values (by default the middle
+    of the bounds), and `run_kwargs` the keyword arguments passed to
+    write_build_run for every run (except `atchem2_path`). `measurements` has
+    an index of times (in seconds or as HH:MM:SS strings) and a column for
+    each measured species; measurements are moved onto the model time grid
+    (see constraint_processing.to_model_grid) and compared using
+    calibration_objective.
+
+    The initial step is `step` times the range of each parameter, and the
+    search stops once the step is less than `tol` times the range, or after
+    `max_iter` iterations. Returns a Calibration tuple of a dictionary of the
+    best parameter values, the best objective, and a dataframe of every
+    evaluation made."""
+    names = list(params)
+    lower = np.array([params[n][0] for n in names], dtype=float)
+    upper = np.array([params[n][1] for n in names], dtype=float)
+    scale = upper - lower
+    if (scale <= 0).any():
+        raise Exception("The upper bound of each parameter must be greater than the lower bound")
+
+    meas_grid = to_model_grid(measurements, run_kwargs["t_start"],
+                              run_kwargs["t_end"], run_kwargs["step_size"],
+                              method = grid_method)
+    meas_grid.index = meas_grid.index.astype(float)
+
+    base_kwargs = {**run_kwargs, "spec_output" : list(meas_grid.columns),
+                   "rate_output" : []}
+
+    cache = {}
+    history = []
+    def evaluate(points):
+        """Runs (in parallel) any points that haven't been evaluated yet and
+        returns the objective of each point"""
+        keys = [tuple(np.round(p, 12)) for p in points]
+        new_keys = list(dict.fromkeys([k for k in keys if k not in cache]))
+        jobs = [apply_params(base_kwargs, dict(zip(names, k))) for k in new_keys]
+        if jobs:
+            outputs = write_build_run_batch(atchem2_paths, jobs)
+            for k, out in zip(new_keys, outputs):
+                cache[k] = calibration_objective(out[0], meas_grid, weights)
+                history.append({**dict(zip(names, k)), "objective" : cache[k]})
+
+        return [cache[k] for k in keys]
+
+    x = np.array([initial.get(n, (params[n][0] + params[n][1])/2) for n in names],
+                 dtype=float)
+    x = np.clip(x, lower, upper)
+    best = evaluate([x])[0]
+
+    step_size = step * scale
+    for _ in range(max_iter):
+        if (step_size < tol*scale).all():
+            break
+
+        #step each parameter up and down from the current best point
+        candidates = []
+        for i in range(len(names)):
+            for sign in [1, -1]:
+                candidate = x.copy()
+                candidate[i] = np.clip(candidate[i] + sign*step_size[i],
+                                       lower[i], upper[i])
+                if candidate[i] != x[i]:
+                    candidates.append(candidate)
+
+        objectives = evaluate(candidates) if candidates else []
+        if objectives and (min(objectives) < best):
+            ibest = int(np.argmin(objectives))
+            x, best = candidates[ibest], objectives[ibest]
+        else:
+            step_size = step_size/2
+
+    history = pd.DataFrame(history)
+    history.index.name = "evaluation"
+
+    return Calibration(dict(zip(names, x.tolist())), best, history)
@@ -0,0 +1,206 @@
+"""Functions to compare model concentrations with (irregularly timed)
+measurements, for a single run or for every run of an ensemble.
+
+Measurements are matched to model output times with an as-of join (a binary
+search of the sorted model output times, done once for each distinct set of
+output times), model concentrations are converted to the units of the
+measurements with reading_concentrations.conc_to_units, and the statistics of
+every run and species are calculated at once as arrays. Runs are processed in
+chunks, so that the memory used doesn't grow with the size of the ensemble."""
+#imports
+import numpy as np
+import pandas as pd
+from .reading_concentrations import conc_to_units
+from .utilities import convert_time_to_seconds
+from .result_store import run_metadata, run_arrays
+
+STATISTICS = ["n", "model_mean", "obs_mean", "bias", "rmse", "nmb", "nme", "r"]
+
+def asof_indices(times, meas_times, direction : str = "nearest",
+                 tolerance : float = None):
+    """Returns the index of the model output time (in the sorted array
+    `times`) matched to each measurement time, and a boolean array of which
+    measurements have a match. `direction` is "nearest", "backward" (the last
+    output time at or before the measurement) or "forward" (the first output
+    time at or after the measurement), as in pandas.merge_asof. Matches more
+    than `tolerance` seconds from the measurement are not used; by default the
+    tolerance is half the median spacing of the output times."""
+    times = np.asarray(times, dtype=float)
+    meas_times = np.asarray(meas_times, dtype=float)
+    n_times = len(times)
+    if tolerance is None:
+        tolerance = np.median(np.diff(times))/2 if n_times > 1 else 0.0
+
+    before = np.searchsorted(times, meas_times, side="right") - 1
+    after = np.searchsorted(times, meas_times, side="left")
+    if direction.casefold() == "backward":
+        idx = before
+    elif direction.casefold() == "forward":
+        idx = after
+    elif direction.casefold() == "nearest":
+        b = np.clip(before, 0, n_times-1)
+        a = np.clip(after, 0, n_times-1)
+        use_after = ((before < 0) |
+                     ((after < n_times) &
+                      (np.abs(times[a] - meas_times) < np.abs(meas_times - times[b]))))
+        idx = np.where(use_after, after, before)
+    else:
+        raise Exception(f"Direction must be 'nearest', 'backward' or 'forward', not {direction}")
+
+    valid = (idx >= 0) & (idx < n_times)
+    idx = np.clip(idx, 0, max(n_times-1, 0))
+    if n_times:
+        valid &= np.abs(times[idx] - meas_times) <= tolerance
+
+    return idx, valid
+
+def comparison_stats(model, obs):
+    """Returns a dictionary of arrays of comparison statistics from an array of
+    model values (runs x times x species) and an array of measurements (times x
+    species) at the same times. Pairs where either value is NaN are ignored.
+
+    The statistics are the number of pairs (n), the means of the model and
+    measurements, the mean bias, the root mean square error, the normalised
+    mean bias and error (relative to the sum of the measurements) and the
+    Pearson correlation coefficient (r), each an array of runs x species."""
+    model = np.asarray(model, dtype=float)
+    obs = np.broadcast_to(np.asarray(obs, dtype=float), model.shape)
+    mask = np.isfinite(model) & np.isfinite(obs)
+    m = np.where(mask, model, 0.0)
+    o = np.where(mask, obs, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = mask.sum(axis=1)
+        model_mean = m.sum(axis=1)/n
+        obs_mean = o.sum(axis=1)/n
+        diff = m - o
+        sum_obs = o.sum(axis=1)
+
+        m_dev = np.where(mask, model - model_mean[:,None,:], 0.0)
+        o_dev = np.where(mask, obs - obs_mean[:,None,:], 0.0)
+        r = ((m_dev*o_dev).sum(axis=1) /
+             np.sqrt((m_dev**2).sum(axis=1)*(o_dev**2).sum(axis=1)))
+
+        return {"n" : n,
+                "model_mean" : model_mean,
+                "obs_mean" : obs_mean,
+                "bias" : diff.sum(axis=1)/n,
+                "rmse" : np.sqrt((diff**2).sum(axis=1)/n),
+                "nmb" : diff.sum(axis=1)/sum_obs,
+                "nme" : np.abs(diff).sum(axis=1)/sum_obs,
+                "r" : r}
+
+def _run_ids(model):
+    """Returns the run ids of a dataframe, a dictionary of dataframes or a
+    result store"""
+    if isinstance(model, pd.DataFrame):
+        return [0]
+    if isinstance(model, dict):
+        return list(model)
+    if isinstance(model, str):
+        return list(run_metadata(model).index)
+    raise TypeError("Model output must be a dataframe, a dictionary of dataframes or the path to a result store")
+
+def _model_runs(model, species, run_ids):
+    """Yields the run id, output times and a function returning the values of
+    `species` (NaN for missing species) at given time indices, for each run
+    in `run_ids` of a dataframe, a dictionary of dataframes or a result
+    store"""
+    if isinstance(model, pd.DataFrame):
+        model = {0 : model}
+
+    if isinstance(model, dict):
+        for run_id in run_ids:
+            df = model[run_id].reindex(columns = species)
+            values = df.to_numpy(dtype=float)
+            yield run_id, df.index.to_numpy(dtype=float), lambda idx, v=values: v[idx]
+    elif isinstance(model, str):
+        #only read the requested species at the matched times from each run
+        for run_id in run_ids:
+            run_id = str(run_id)
+            times, spec_rows, values = run_arrays(model, run_id)
+            rows = [spec_rows.get(x) for x in species]
+
+            def get_values(idx, values=values, rows=rows):
+                out = np.full((len(idx), len(rows)), np.nan)
+                for i,r in enumerate(rows):
+                    if r is not None:
+                        out[:,i] = values[r, idx]
+                return out
+            yield run_id, times, get_values
+
+def align_to_measurements(model, measurements : pd.DataFrame,
+                          units = "molecules/cm3", direction : str = "nearest",
+                          tolerance : float = None,
+                          concconversionfactor : float = 2.45E19,
+                          run_ids : list = []):
+    """Matches model concentrations to measurements. `model` is a dataframe
+    from read_output.species_concentrations_df, a dictionary of such
+    dataframes (by run id), or the path to a result store (see result_store).
+    `measurements` has an index of times (in seconds or as HH:MM:SS strings)
+    and a column for each species, and `units` are the units of the
+    measurements (a string, or a dictionary of units for each species). If
+    `run_ids` is given, only those runs are used.
+
+    Returns a list of the run ids, an array of the model values (runs x
+    measurement times x species, NaN where there is no matched output) and an
+    array of the measurements (times x species)."""
+    species = list(measurements.columns)
+    meas_times = convert_time_to_seconds(measurements.index).astype(float)
+    obs = measurements.to_numpy(dtype=float)
+
+    out_ids, arrays = [], []
+    matches = {}
+    if not run_ids:
+        run_ids = _run_ids(model)
+    for run_id, times, get_values in _model_runs(model, species, run_ids):
+        #match the measurement times once for each set of output times
+        key = times.tobytes()
+        if key not in matches:
+            matches[key] = asof_indices(times, meas_times, direction, tolerance)
+        idx, valid = matches[key]
+
+        values = get_values(idx)
+        values[~valid] = np.nan
+        out_ids.append(run_id)
+        arrays.append(values)
+
+    model_arr = np.stack(arrays) if arrays else np.empty((0,) + obs.shape)
+
+    #convert the model from molecules/cm3 to the units of each measurement
+    if isinstance(units, str):
+        units = {s : units for s in species}
+    for unit in set(units.values()):
+        cols = [i for i,s in enumerate(species) if units.get(s, "molecules/cm3") == unit]
+        model_arr[:,:,cols] = conc_to_units(model_arr[:,:,cols], unit,
+                                            concconversionfactor)
+
+    return out_ids, model_arr, obs
+
+def compare(model, measurements : pd.DataFrame, units = "molecules/cm3",
+            direction : str = "nearest", tolerance : float = None,
+            concconversionfactor : float = 2.45E19, chunk_size : int = 500):
+    """Returns a dataframe of comparison statistics (see comparison_stats)
+    between model concentrations and measurements, indexed by run id and
+    species. The arguments are as for align_to_measurements; runs are aligned
+    and compared `chunk_size` runs at a time."""
+    species = list(measurements.columns)
+    all_ids = _run_ids(model)
+    chunks = [all_ids[i:i+chunk_size] for i in range(0, len(all_ids), chunk_size)]
+
+    out = []
+    for ids in chunks:
+        run_ids, model_arr, obs = align_to_measurements(model, measurements,
+                                                        units, direction, tolerance,
+                                                        concconversionfactor,
+                                                        run_ids = ids)
+        stats = comparison_stats(model_arr, obs)
+        idx = pd.MultiIndex.from_product([run_ids, species],
+                                         names = ["run_id", "species"])
+        out.append(pd.DataFrame({k : stats[k].ravel() for k in STATISTICS},
+                                index = idx))
+
+    if not out:
+        return pd.DataFrame(columns = STATISTICS, dtype = float)
+
+    return pd.concat(out)
@@ -0,0 +1,132 @@
+"""Functions to prepare measurement data for use as AtChem2 constraints
+(spec_constrain, env_constrain and photo_constrain), by moving measurements
+onto the model time grid and removing points which AtChem2's (piecewise
+linear) interpolation reproduces within a tolerance. This produces smaller
+constraint files which are faster for the model to read and interpolate."""
+#imports
+import numpy as np
+import pandas as pd
+from .utilities import convert_time_to_seconds, round_to_tstep
+
+def to_model_grid(in_df : pd.DataFrame, t_start : int, t_end : int,
+                  step_size : int, method : str = "mean"):
+    """Moves measurements (with an index of times in seconds or HH:MM:SS
+    strings) onto the model time grid between `t_start` and `t_end`.
+
+    If `method` is "mean", measurements are averaged over the model timestep
+    they are closest to. If `method` is "interpolate", measurements are
+    linearly interpolated onto the model times (within the range of the
+    measurements of each column only)."""
+    times = convert_time_to_seconds(in_df.index)
+    data = in_df.set_axis(times.astype(float), axis=0)
+    grid = np.arange(t_start, t_end+step_size, step_size, dtype=float)
+
+    if method.casefold() == "mean":
+        rounded = round_to_tstep(data.index.to_numpy(), t_start, step_size)
+        out_df = data.groupby(rounded).mean()
+        out_df = out_df.loc[(out_df.index >= t_start) & (out_df.index <= t_end)]
+    elif method.casefold() == "interpolate":
+        data = data.groupby(level=0).mean()
+        all_times = data.index.union(grid)
+        out_df = data.reindex(all_times).interpolate(method="index",
+                                                     limit_area="inside")
+        out_df = out_df.reindex(grid)
+    else:
+        raise Exception(f"Method must be 'mean' or 'interpolate', not {method}")
+
+    out_df.index = out_df.index.astype(int)
+
+    return out_df
+
+#segments of thin_indices longer than this are checked one at a time
+_LONG_SEGMENT = 256
+
+def thin_indices(times, values, rtol : float = 0.01, atol : float = 0.0):
+    """Returns the (sorted) indices of the points of a series needed for
+    linear interpolation between them to reproduce every point to within
+    `atol` + `rtol`*|value|. The first and last points are always kept."""
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= 2:
+        return np.arange(n)
+
+    allowed = atol + rtol*np.abs(values)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n-1]] = True
+
+    def excess(inner, first, last):
+        """The error of linear interpolation between `first` and `last` at 
+        `inner` in excess of the tolerance"""
+        interp = values[first] + ((values[last] - values[first]) *
+                                  (times[inner] - times[first]) /
+                                  (times[last] - times[first]))
+        return np.abs(values[inner] - interp) - allowed[inner]
+
+    #split segments at the point with the largest excess error (the first, if
+    #tied) until none is above the tolerance. Each round, long segments are 
+    #checked one at a time (as slices) and all other segments at once
+    first, last = np.array([0]), np.array([n-1])
+    while len(first):
+        is_long = (last - first) > _LONG_SEGMENT
+        splits = [[], [], []]
+        for f, l in zip(first[is_long], last[is_long]):
+            seg_excess = excess(slice(f+1, l), f, l)
+            imax = np.argmax(seg_excess)
+            if seg_excess[imax] > 0:
+                for i, x in enumerate([f, f+1+imax, l]):
+                    splits[i].append(x)
+
+        first, last = first[~is_long], last[~is_long]
+        lengths = last - first - 1
+        starts = np.cumsum(lengths) - lengths
+        seg = np.repeat(np.arange(len(first)), lengths)
+        inner = np.arange(len(seg)) - starts[seg] + first[seg] + 1
+        all_excess = excess(inner, first[seg], last[seg])
+        if len(seg):
+            seg_max = np.maximum.reduceat(all_excess, starts)
+            split = np.flatnonzero((seg_max > 0)[seg] & (all_excess == seg_max[seg]))
+            split = split[np.diff(seg[split], prepend=-1) != 0]
+            splits[0] += list(first[seg[split]])
+            splits[1] += list(inner[split])
+            splits[2] += list(last[seg[split]])
+
+        split_first, split_at, split_last = [np.array(x, dtype=int) for x in splits]
+        keep[split_at] = True
+        first = np.concatenate([split_first, split_at])
+        last = np.concatenate([split_at, split_last])
+        first, last = first[last - first > 1], last[last - first > 1]
+
+    return np.flatnonzero(keep)
+
+def thin_constraints(in_df : pd.DataFrame, rtol : float = 0.01,
+                     atol : float = 0.0):
+    """Removes points from each column of a constraint dataframe (indexed by
+    time in seconds) which linear interpolation between the remaining points
+    reproduces to within `atol` + `rtol`*|value|. Removed points are set to NaN
+    (which are dropped when writing constraint files)."""
+    out_df = pd.DataFrame(np.nan, index=in_df.index, columns=in_df.columns)
+    times = in_df.index.to_numpy(dtype=float)
+
+    for col in in_df.columns:
+        values = in_df[col].to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(values))
+        keep = valid[thin_indices(times[valid], values[valid], rtol, atol)]
+        out_df.iloc[keep, out_df.columns.get_loc(col)] = values[keep]
+
+    return out_df
+
+def prepare_constraints(in_df : pd.DataFrame, t_start : int, t_end : int,
+                        step_size : int, method : str = "mean",
+                        rtol : float = None, atol : float = 0.0):
+    """Moves measurements onto the model time grid (see to_model_grid) and,
+    if `rtol` is given, removes points which linear interpolation reproduces
+    within the given tolerance (see thin_constraints). The output can be
+    passed directly to write_config or write_build_run as spec_constrain,
+    env_constrain or photo_constrain."""
+    out_df = to_model_grid(in_df, t_start, t_end, step_size, method=method)
+
+    if rtol is not None:
+        out_df = thin_constraints(out_df, rtol=rtol, atol=atol)
+
+    return out_df
@@ -0,0 +1,151 @@
+"""Functions to downsample dense time series for plotting while preserving
+their visual shape"""
+#imports
+import warnings
+import numpy as np
+
+def _bucket_values(y, n_buckets, fill):
+    """Splits the values of an array (or the last axis of a 2-D array) into
+    `n_buckets` contiguous buckets of (nearly) equal size, returning the
+    bucket start indices and an array of the values padded with `fill` to the
+    size of the largest bucket"""
+    n = y.shape[-1]
+    edges = np.linspace(0, n, n_buckets+1).astype(int)
+    max_size = np.diff(edges).max()
+
+    idx = edges[:-1,None] + np.arange(max_size)[None,:]
+    in_bucket = idx < edges[1:,None]
+
+    vals = y[..., np.minimum(idx, n-1)].astype(float)
+    vals = np.where(in_bucket & ~np.isnan(vals), vals, fill)
+
+    return edges, vals
+
+def minmax_indices(y, n_buckets : int):
+    """Returns the (sorted) indices of the minimum and maximum value in each of
+    `n_buckets` equally sized buckets of `y`, along with the first and last
+    points. Plotting only these points preserves the visual envelope of the
+    series."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2*n_buckets:
+        return np.arange(n)
+
+    edges, lo_vals = _bucket_values(y, n_buckets, np.inf)
+    hi_vals = np.where(np.isinf(lo_vals), -np.inf, lo_vals)
+
+    mins = edges[:-1] + lo_vals.argmin(axis=1)
+    maxs = edges[:-1] + hi_vals.argmax(axis=1)
+
+    return np.unique(np.concatenate([[0, n-1], mins, maxs]))
+
+def lttb_indices(x, y, n_out : int):
+    """Returns the indices of `n_out` points of a series selected using the
+    Largest-Triangle-Three-Buckets algorithm, which keeps the points that
+    contribute most to the visual shape of the series."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if (n_out >= n) or (n_out < 3):
+        return np.arange(n)
+
+    #the first and last points are always kept, the rest are split into
+    #n_out - 2 buckets with one point selected from each
+    edges = np.linspace(1, n-1, n_out-1).astype(int)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    n_buckets = len(starts)
+    idx = starts[:,None] + np.arange(sizes.max())[None,:]
+    in_bucket = idx < edges[1:,None]
+    idx = np.minimum(idx, n-1)
+    bx, by = x[idx], y[idx]
+
+    #average of the next bucket (or the last point) for every bucket
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean_y = np.nanmean(np.where(in_bucket, by, np.nan), axis=1)
+    mean_x = np.where(in_bucket, bx, 0).sum(axis=1)/sizes
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    def solve(rows, anchor_x, anchor_y):
+        """Selects the point of each bucket in `rows` making the largest 
+        triangle with its anchor and the average of the next bucket (NaN
+        areas are ignored, and the start of a bucket is selected if all are)"""
+        areas = np.abs((anchor_x - next_x[rows,None])*(by[rows] - anchor_y) -
+                       (anchor_x - bx[rows])*(next_y[rows,None] - anchor_y))
+        areas = np.where(in_bucket[rows] & ~np.isnan(areas), areas, -np.inf)
+        return starts[rows] + areas.argmax(axis=-1)
+
+    #each bucket's anchor is the point selected from the previous bucket. All
+    #buckets are first solved at once using the average of the previous 
+    #bucket as the anchor, and buckets whose anchor then changes are solved
+    #again at once (up to about two solves of every bucket, as changes can 
+    #ripple through every later bucket of a smooth series). Any still 
+    #changing are then solved in order, once each (the first bucket's anchor
+    #is always the first point, so the buckets before the first one whose 
+    #anchor has changed are final)
+    anchor_x = np.append(x[0], mean_x[:-1])
+    anchor_y = np.append(y[0], mean_y[:-1])
+    selected = np.full(n_buckets, -1)
+    rows = np.arange(n_buckets)
+    work = 0
+    while len(rows) and (work < 2*n_buckets):
+        work += len(rows)
+        new = solve(rows, anchor_x[rows,None], anchor_y[rows,None])
+        changed = rows[new != selected[rows]]
+        selected[rows] = new
+        rows = changed[changed < n_buckets-1] + 1
+        anchor_x[rows] = x[selected[rows-1]]
+        anchor_y[rows] = y[selected[rows-1]]
+
+    pending = np.zeros(n_buckets+1, dtype=bool)
+    pending[rows] = True
+    for i in (range(rows[0], n_buckets) if len(rows) else []):
+        if pending[i]:
+            new = solve(i, x[selected[i-1]], y[selected[i-1]])
+            pending[i+1] |= new != selected[i]
+            selected[i] = new
+
+    return np.concatenate([[0], selected, [n-1]])
+
+def downsample_series(series, n_points : int, method : str = "lttb"):
+    """Downsamples a pandas series with a numeric index to approximately
+    `n_points` points, using either "lttb" or "minmax" downsampling"""
+    if len(series) <= n_points:
+        return series
+
+    if method.casefold() == "lttb":
+        idx = lttb_indices(series.index.to_numpy(dtype=float), series.to_numpy(),
+                           n_points)
+    elif method.casefold() == "minmax":
+        idx = minmax_indices(series.to_numpy(), max(n_points//2, 1))
+    else:
+        raise Exception(f"Downsampling method must be 'lttb' or 'minmax', not {method}")
+
+    return series.iloc[idx]
+
+def stack_indices(ys, n_buckets : int):
+    """Returns the (sorted) indices of the points to keep when plotting a
+    stackplot of the layers in `ys` (shape: number of layers x number of
+    points). In each of `n_buckets` buckets the minimum and maximum of the
+    layer with the largest range in that bucket are kept, so that all layers
+    share the same points."""
+    ys = np.asarray(ys, dtype=float)
+    n = ys.shape[-1]
+    if n <= 2*n_buckets:
+        return np.arange(n)
+
+    edges, lo_vals = _bucket_values(ys, n_buckets, np.inf)
+    hi_vals = np.where(np.isinf(lo_vals), -np.inf, lo_vals)
+
+    #choose the layer with the largest range in each bucket
+    ranges = np.nan_to_num(hi_vals.max(axis=2) - lo_vals.min(axis=2),
+                           nan=0, neginf=0, posinf=0)
+    layer = ranges.argmax(axis=0)
+    buckets = np.arange(n_buckets)
+
+    mins = edges[:-1] + lo_vals[layer, buckets].argmin(axis=1)
+    maxs = edges[:-1] + hi_vals[layer, buckets].argmax(axis=1)
+
+    return np.unique(np.concatenate([[0, n-1], mins, maxs]))
@@ -0,0 +1,136 @@
+"""Functions to calculate totals of chemical families (e.g. NOx, NOy, ROx) from
+concentration and rate outputs.
+
+A family is defined as either a list of members or a dictionary of members
+and weights (e.g. {"NO2" : 1, "N2O5" : 2} to count nitrogen atoms). Members
+are species names, compiled regular expressions (matched against the
+available species, e.g. re.compile(".+NO3$") for organic nitrates), or "RO2",
+which is expanded to the species of the RO2 sum of a mechanism."""
+#imports
+import re
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .species_from_mechanism import get_ro2_species
+
+DEFAULT_FAMILIES = {"NOx" : ["NO", "NO2"],
+                    "NOy" : {"NO" : 1, "NO2" : 1, "NO3" : 1, "N2O5" : 2,
+                             "HONO" : 1, "HNO3" : 1, "HO2NO2" : 1,
+                             re.compile(r".+NO3$") : 1, #organic nitrates
+                             re.compile(r".+NO2$") : 1, #peroxy nitrates
+                             re.compile(r".*PAN$") : 1,
+                             re.compile(r".*PPN$") : 1},
+                    "Ox" : ["O3", "NO2", "O", "O1D"],
+                    "HOx" : ["OH", "HO2"],
+                    "ROx" : ["OH", "HO2", "RO2"],
+                    "RO2" : ["RO2"]}
+
+CompiledFamilies = namedtuple("CompiledFamilies", ["names", "species", "weights"])
+
+def _family_weights(members, species, ro2_species):
+    """Returns a dictionary of the weight of each available species in a
+    family definition"""
+    if not isinstance(members, dict):
+        members = {m : 1 for m in members}
+
+    species_set = set(species)
+    weights = {}
+    for member, weight in members.items():
+        if isinstance(member, re.Pattern):
+            matched = [s for s in species if member.fullmatch(s)]
+        elif member == "RO2":
+            matched = [s for s in ro2_species if s in species_set]
+        else:
+            matched = [member] if member in species_set else []
+
+        #each species is only counted once, with the first weight it matches
+        for s in matched:
+            weights.setdefault(s, weight)
+
+    return weights
+
+def compile_families(species, families : dict = DEFAULT_FAMILIES,
+                     mechanism_path : str = ""):
+    """Resolves family definitions against a list of available species (e.g.
+    the columns of a concentration dataframe, or the species of a mechanism)
+    once, returning a CompiledFamilies tuple of the family names, the species
+    used by any family, and a matrix of weights (species x families). The
+    RO2 sum is read from the mechanism at `mechanism_path`, if given."""
+    species = list(species)
+    ro2_species = get_ro2_species(mechanism_path) if mechanism_path else []
+
+    fam_weights = {name : _family_weights(members, species, ro2_species)
+                   for name, members in families.items()}
+
+    #only keep the species used by at least one family, in their original order
+    used = [s for s in species if any(s in w for w in fam_weights.values())]
+
+    weights = np.zeros((len(used), len(fam_weights)))
+    for j, w in enumerate(fam_weights.values()):
+        for i, s in enumerate(used):
+            weights[i,j] = w.get(s, 0)
+
+    return CompiledFamilies(list(fam_weights.keys()), used, weights)
+
+def family_members(compiled : CompiledFamilies, family : str):
+    """Returns a series of the weights of each member of a compiled family"""
+    weights = compiled.weights[:, compiled.names.index(family)]
+
+    return pd.Series(weights, index = compiled.species)[weights != 0]
+
+def family_totals(conc_df : pd.DataFrame, families = DEFAULT_FAMILIES,
+                  mechanism_path : str = ""):
+    """Calculates the total of each family at each time in a concentration
+    dataframe (as output by read_output.species_concentrations_df) in one
+    matrix product. `families` can be a dictionary of family definitions or a
+    CompiledFamilies tuple (from compile_families) which is reused as is."""
+    if not isinstance(families, CompiledFamilies):
+        families = compile_families(conc_df.columns, families, mechanism_path)
+
+    values = conc_df[families.species].to_numpy(dtype=float)
+
+    return pd.DataFrame(values @ families.weights, index = conc_df.index,
+                        columns = families.names)
+
+def family_rate_totals(rates : pd.DataFrame, families = DEFAULT_FAMILIES,
+                       mechanism_path : str = ""):
+    """Calculates the total (weighted) rate of each family at each time from a
+    loss or production rate dataframe, either as output by read_output.rate_df
+    or as the raw rate outputs of build_and_run.write_build_run (with
+    "time" and "speciesName" columns)."""
+    if "speciesName" in rates.columns:
+        times = rates["time"].to_numpy()
+        specs = rates["speciesName"]
+    else:
+        times = rates.index.get_level_values(0).to_numpy()
+        specs = rates.index.get_level_values(1)
+
+    if not isinstance(families, CompiledFamilies):
+        families = compile_families(pd.unique(specs), families, mechanism_path)
+
+    #weights of every row (rows of species not in any family have no weight)
+    spec_idx = pd.Index(families.species).get_indexer(specs)
+    row_weights = np.vstack([families.weights, np.zeros(len(families.names))])[spec_idx]
+
+    contributions = rates["rate"].to_numpy(dtype=float)[:,None] * row_weights
+
+    return pd.DataFrame(contributions, columns = families.names).groupby(times).sum()
+
+def scale_family(concs : pd.Series, members : pd.Series, target : float):
+    """Returns a copy of a series of species concentrations with the members
+    of a family (a series of member weights, e.g. from family_members) scaled
+    so that the family total matches `target`, preserving the ratios between
+    the members. If the family total is 0, `target` is split evenly between
+    the members."""
+    missing = [x for x in members.index if x not in concs.index]
+    concs = pd.concat([concs, pd.Series(0.0, index = missing)]) if missing else concs.copy()
+
+    old_vals = concs.reindex(members.index).fillna(0)
+    old_total = (old_vals * members).sum()
+
+    if old_total != 0:
+        concs.loc[members.index] = old_vals * (target/old_total)
+    else:
+        concs.loc[members.index] = target/members.sum()
+
+    return concs
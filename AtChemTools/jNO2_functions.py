@@ -1,4 +1,3 @@
-from pysolar.solar import get_altitude
 import math
 from datetime import datetime,time, timedelta, timezone
 import pandas as pd
@@ -16,6 +15,8 @@ def J_Calc(x,l,m,n):
 
 def JNO2_Calc(lat, long, dt):
     """Calculate JNO2 value for a given lat, long, and datetime"""
+    #pysolar is imported when needed, so that importing this module is fast
+    from pysolar.solar import get_altitude
     sza = math.radians(float(90)-get_altitude(lat, long, dt))    
     
     j_val = J_Calc(sza, 1.165e-02, 0.244, 0.267)
@@ -0,0 +1,161 @@
+"""Functions to reduce the size of a FACSIMILE mechanism, based on the
+contribution of each reaction to the production and loss of target species in
+one or more sets of AtChem2 rate output.
+
+Starting from the target species, reactions contributing at least a threshold
+fraction of the production or loss of any kept species (at any time, in any
+set of rate output) are kept, and the reactants of those reactions are then
+kept as well, until no further reactions are added. For the reduction to be
+meaningful the rate output should include every species in the mechanism
+(i.e. all species should be included in `rate_output`)."""
+#imports
+import re
+import numpy as np
+import pandas as pd
+from .species_from_mechanism import get_reactions, get_ro2_species
+
+def _rate_columns(rates : pd.DataFrame):
+    """Returns the time, species name, reaction number and rate columns of a
+    rate dataframe, either as output by read_output.rate_df or as the raw rate
+    output of build_and_run.write_build_run"""
+    if "speciesName" not in rates.columns:
+        rates = rates.reset_index()
+        rates.columns = ["time", "speciesName", "reactionNumber"] + list(rates.columns[3:])
+
+    return rates[["time", "speciesName", "reactionNumber", "rate"]]
+
+def reaction_contributions(rate_sets : list):
+    """Returns a series of the maximum fraction of the production or loss of
+    each species contributed by each reaction, over all times and all sets of
+    rate output. `rate_sets` is a list of (loss rates, production rates)
+    dataframe tuples. The series is indexed by species name and reaction
+    number."""
+    frames = []
+    for i, (loss_df, prod_df) in enumerate(rate_sets):
+        for kind, df in [("loss", loss_df), ("production", prod_df)]:
+            frames.append(_rate_columns(df).assign(set=i, kind=kind))
+    rates = pd.concat(frames, ignore_index=True)
+    rates["rate"] = rates["rate"].abs()
+
+    #fraction of the total production or loss of the species at each time
+    totals = rates.groupby(["set", "kind", "time", "speciesName"])["rate"].transform("sum")
+    rates["fraction"] = (rates["rate"]/totals.where(totals != 0)).fillna(0)
+
+    return rates.groupby(["speciesName", "reactionNumber"])["fraction"].max()
+
+def select_reactions(contributions : pd.Series, reactions : list, targets : list,
+                     threshold : float = 0.01):
+    """Selects the reactions to keep for a given set of target species, given
+    the reaction contributions (from reaction_contributions) and the
+    reactions of the mechanism (from species_from_mechanism.get_reactions).
+
+    Returns a dataframe of the kept reactions (indexed by reaction number,
+    sorted by their largest contribution to any kept species) and a series of
+    the kept species, mapped to the iteration in which they were added (0 for
+    the targets)."""
+    contributions = contributions[contributions >= threshold]
+    specs = contributions.index.get_level_values(0)
+    rxn_nums = contributions.index.get_level_values(1)
+
+    kept_species = {s : 0 for s in targets}
+    kept_rxns = set()
+    iteration = 0
+    while True:
+        iteration += 1
+        important = set(rxn_nums[specs.isin(list(kept_species))])
+        new_rxns = important - kept_rxns
+        if not new_rxns:
+            break
+        kept_rxns |= new_rxns
+
+        #keep the reactants of the newly kept reactions
+        for r in new_rxns:
+            for s in reactions[r-1][1]:
+                kept_species.setdefault(s, iteration)
+
+    in_kept = specs.isin(list(kept_species)) & rxn_nums.isin(list(kept_rxns))
+    max_contrib = contributions[in_kept].groupby(level=1).max().sort_values(ascending=False)
+
+    kept_df = pd.DataFrame({"contribution" : max_contrib,
+                            "reaction" : [f"{reactions[r-1][0]} : {' + '.join(reactions[r-1][1])} = {' + '.join(reactions[r-1][2])}"
+                                          for r in max_contrib.index]})
+    kept_df.index.name = "reactionNumber"
+
+    return kept_df, pd.Series(kept_species, name="iteration")
+
+def reduction_error(rate_sets : list, targets : list, kept_reactions):
+    """Estimates the error introduced for each target species by removing all
+    reactions other than `kept_reactions`, as the maximum fraction of the
+    production and loss of each target (at any time, in any set of rate output)
+    contributed by the removed reactions. Returns a dataframe indexed by
+    target species with columns "production" and "loss"."""
+    kept_reactions = list(kept_reactions)
+    errors = pd.DataFrame(0.0, index = pd.Index(targets, name="speciesName"),
+                          columns = ["production", "loss"])
+    for loss_df, prod_df in rate_sets:
+        for kind, df in [("loss", loss_df), ("production", prod_df)]:
+            rates = _rate_columns(df)
+            rates = rates[rates["speciesName"].isin(targets)]
+            removed = np.where(rates["reactionNumber"].isin(kept_reactions), 0,
+                               rates["rate"].abs())
+            grouped = pd.DataFrame({"removed" : removed, "total" : rates["rate"].abs().to_numpy()},
+                                   index = rates.index).groupby([rates["speciesName"], rates["time"]]).sum()
+            fraction = (grouped["removed"]/grouped["total"].where(grouped["total"] != 0)).fillna(0)
+            max_fraction = fraction.groupby(level=0).max().reindex(targets).fillna(0)
+            errors[kind] = np.maximum(errors[kind], max_fraction)
+
+    return errors
+
+def write_mechanism_subset(mechanism_path : str, out_path : str, kept_reactions):
+    """Writes a copy of a FACSIMILE mechanism containing only the reactions
+    with the given reaction numbers (counted in the order reactions are
+    defined). Everything before the reaction definitions is copied unchanged,
+    except that the RO2 sum only includes species remaining in the mechanism."""
+    kept_reactions = set(kept_reactions)
+    with open(mechanism_path) as file:
+        mech_txt = file.read()
+
+    head, sep, tail = mech_txt.partition("Reaction definitions")
+
+    rxn_pattern = re.compile("%.*:.*=.*;")
+    out_lines = []
+    rxn_num = 0
+    for line in tail.split("\n"):
+        if rxn_pattern.match(line):
+            rxn_num += 1
+            if rxn_num not in kept_reactions:
+                continue
+        out_lines.append(line)
+
+    #filter the RO2 sum to the species remaining in the mechanism
+    reactions = get_reactions(mechanism_path)
+    remaining = {s for i,(_, r, p) in enumerate(reactions) if (i+1) in kept_reactions
+                 for s in r + p}
+    ro2_species = [x for x in get_ro2_species(mechanism_path) if x in remaining]
+    head = re.sub(r"(^|;)(\s*RO2\s*=)[^;]*;",
+                  lambda m : f"{m[1]}{m[2]} {' + '.join(ro2_species)} ;".replace("=  ;", "= ;"),
+                  head, count=1)
+
+    with open(out_path, "w") as file:
+        file.write(head + sep + "\n".join(out_lines))
+
+def reduce_mechanism(mechanism_path : str, out_path : str, rate_sets : list,
+                     targets : list, threshold : float = 0.01):
+    """Reduces a FACSIMILE mechanism to the reactions contributing at least
+    `threshold` (as a fraction) of the production or loss of the target
+    species (or of the species they depend on), based on one or more sets of
+    (loss rates, production rates) output, and writes the reduced mechanism to
+    `out_path`.
+
+    Returns a dataframe of the kept reactions ranked by contribution, a series
+    of the kept species, and a dataframe of the estimated error introduced for
+    each target species (see reduction_error)."""
+    reactions = get_reactions(mechanism_path)
+    contributions = reaction_contributions(rate_sets)
+
+    kept_df, kept_species = select_reactions(contributions, reactions, targets,
+                                             threshold)
+    write_mechanism_subset(mechanism_path, out_path, kept_df.index)
+    errors = reduction_error(rate_sets, targets, kept_df.index)
+
+    return kept_df, kept_species, errors
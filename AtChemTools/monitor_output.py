@@ -0,0 +1,132 @@
+"""Functions to follow AtChem2 output files while a model is running"""
+#imports
+import io
+import os
+import time
+import pandas as pd
+
+def _parse_lines(text, header):
+    """Parses complete lines of an AtChem2 output file into a pandas dataframe,
+    using the same layout as the functions in read_output"""
+    if "speciesName" in header:
+        #rate output files (lossRates.output and productionRates.output)
+        return pd.read_csv(io.StringIO(text), sep=r'\s+', header=None,
+                           names=header, index_col=[0,2,3],
+                           keep_default_na=False)
+    else:
+        return pd.read_csv(io.StringIO(text), sep=r'\s+', header=None,
+                           names=header, index_col=0)
+
+def _replaced(file, file_path):
+    """Returns True if `file_path` is no longer the open `file` (i.e. it has 
+    been replaced by a new file, which may be larger than the old one)"""
+    try:
+        path_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return False
+    file_stat = os.fstat(file.fileno())
+    return (path_stat.st_ino, path_stat.st_dev) != (file_stat.st_ino, file_stat.st_dev)
+
+def tail_output(file_path, poll_interval=1.0, process=None, idle_timeout=None):
+    """Follows an AtChem2 output file as it is written, yielding a pandas
+    dataframe of the rows appended since the previous poll.
+
+    Only newly appended (complete) lines are parsed each time. Following stops
+    once `process` (e.g. the output of build_and_run.start_model) has exited
+    and all remaining output has been read, or once no new output has appeared
+    for `idle_timeout` seconds. If neither is given, the file is followed
+    until the generator is closed."""
+    last_activity = time.monotonic()
+
+    #wait for the model to create the output file
+    while not os.path.exists(file_path):
+        if (process is not None) and (process.poll() is not None):
+            return
+        if idle_timeout and (time.monotonic() - last_activity > idle_timeout):
+            return
+        time.sleep(poll_interval)
+
+    file = open(file_path)
+    try:
+        header = None
+        buffer = ""
+        while True:
+            #check whether the model is still running before reading, so that
+            #output written just before it exits is not missed
+            running = (process is None) or (process.poll() is None)
+
+            #restart from the beginning if the file has been replaced or 
+            #truncated (i.e. the model has started writing a new output file)
+            if _replaced(file, file_path):
+                file.close()
+                file = open(file_path)
+                header = None
+                buffer = ""
+            elif os.fstat(file.fileno()).st_size < file.tell():
+                file.seek(0)
+                header = None
+                buffer = ""
+
+            buffer += file.read()
+
+            if header is None and "\n" in buffer:
+                header_line, buffer = buffer.split("\n", 1)
+                header = header_line.split()
+
+            if header is not None and "\n" in buffer:
+                #only parse complete lines, keeping any partially written line
+                #for the next poll
+                complete, buffer = buffer.rsplit("\n", 1)
+                if complete.strip():
+                    last_activity = time.monotonic()
+                    yield _parse_lines(complete, header)
+                    continue
+
+            if not running:
+                return
+            if idle_timeout and (time.monotonic() - last_activity > idle_timeout):
+                return
+            time.sleep(poll_interval)
+    finally:
+        file.close()
+
+def model_progress(file_path, t_start, t_end, poll_interval=1.0, process=None,
+                   idle_timeout=None):
+    """Follows an AtChem2 output file as it is written, yielding a dictionary
+    describing the progress of the model each time new output is read.
+
+    Each dictionary contains the current model time, the percentage of the
+    model completed, the number of output steps read so far, the throughput in
+    steps per second, an estimate of the remaining (wall clock) run time in
+    seconds, and the newly read data."""
+    wall_start = time.monotonic()
+    nsteps = 0
+    model_time = t_start
+    last_time = None
+
+    for chunk in tail_output(file_path, poll_interval=poll_interval,
+                             process=process, idle_timeout=idle_timeout):
+        times = chunk.index.get_level_values(0).unique()
+        if times.empty:
+            continue
+
+        #rows of the last time read may continue into the next chunk (e.g.
+        #the rates of each reaction), so it is only counted once
+        nsteps += len(times) - int(times[0] == last_time)
+        model_time = last_time = times[-1]
+        elapsed = time.monotonic() - wall_start
+
+        fraction = (model_time - t_start)/(t_end - t_start)
+
+        #estimate the remaining time from the model time simulated per second
+        if elapsed > 0 and model_time > t_start:
+            remaining = (t_end - model_time)/((model_time - t_start)/elapsed)
+        else:
+            remaining = float("nan")
+
+        yield {"model_time" : model_time,
+               "percent_complete" : min(fraction, 1.0)*100,
+               "steps" : nsteps,
+               "steps_per_sec" : nsteps/elapsed if elapsed > 0 else float("nan"),
+               "remaining_secs" : remaining,
+               "data" : chunk}
@@ -1,16 +1,27 @@
-#imports
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
+#imports (matplotlib is imported when plotting, so that importing this module
+#is fast)
 import pandas as pd
 from datetime import timedelta
 from .reading_concentrations import conc_to_units
+from .downsample import downsample_series
+from .families import DEFAULT_FAMILIES, family_totals
 import math
 
 def plot_species(conc_df, species, nrows = 1, ncols = None, units = None, 
                  cconv = 2.45E19, title="", ax_size = 5, convert_xaxis = True,
-                 xaxis_units = "UTC", **kwargs):
+                 xaxis_units = "UTC", downsample = None, max_points = None, 
+                 families = DEFAULT_FAMILIES, mechanism_path = "", **kwargs):
     """Creates a multi-panel figure with a selection of model time series 
-    plotted on separate axes."""
+    plotted on separate axes.
+    
+    If `downsample` is "lttb" or "minmax", then each series is downsampled to 
+    `max_points` points (default: the width of each axis in pixels) before 
+    plotting, which preserves the shape of dense time series while making 
+    plotting much faster.
+    
+    Species that are not columns of `conc_df` but are defined in `families` 
+    (e.g. "NOx") are plotted as the family total (see families.py), using the 
+    RO2 sum of the mechanism at `mechanism_path` where needed."""
     #check that ncols*nrows is less than the number of species requested
     nspecs = len(species)    
     if ncols and nrows:
@@ -37,14 +48,28 @@ def plot_species(conc_df, species, nrows = 1, ncols = None, units = None,
                             assign a unit for each species or leave 'units' 
                             unassigned to plot in the original model units.""")
     
+    import matplotlib.pyplot as plt
+    from matplotlib.dates import DateFormatter
+    
     fig = plt.Figure(figsize = (ax_size*ncols, ax_size*nrows))
+    
+    #calculate the totals of any requested families at once
+    fams = {k : v for k,v in families.items() 
+            if (k in species) and (k not in conc_df.columns)}
+    if fams:
+        fam_df = family_totals(conc_df, fams, mechanism_path)
 
     for i,spec in enumerate(species):            
         #get model data
-        if spec != "NOx":
-            model_series = conc_df[spec]
+        if spec in fams:
+            model_series = fam_df[spec]
         else:
-            model_series = conc_df[["NO","NO2"]].sum(axis=1)
+            model_series = conc_df[spec]
+        
+        #downsample dense series
+        if downsample:
+            n_points = max_points if max_points else int(ax_size*fig.dpi)
+            model_series = downsample_series(model_series, n_points, downsample)
         
         #convert the units
         if units:
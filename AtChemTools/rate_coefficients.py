@@ -0,0 +1,190 @@
+"""Functions to evaluate the rate coefficients (and reaction rates) of a
+FACSIMILE format mechanism offline, from model environment, photolysis and
+concentration output, without requiring AtChem2 to write rate output.
+
+The generic rate coefficients and the rate expression of every reaction are
+translated into a single Python function operating on NumPy arrays, which
+calculates every rate coefficient for every timestep in one call."""
+#imports
+import re
+import ast
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .species_from_mechanism import (get_reactions, get_generic_rate_coefficients,
+                                     get_ro2_species)
+
+CompiledRates = namedtuple("CompiledRates", ["function", "reactions",
+                                             "coefficients", "variables"])
+
+#functions available to rate expressions
+_FUNCTIONS = {"EXP" : np.exp, "DEXP" : np.exp, "LOG10" : np.log10,
+              "DLOG10" : np.log10, "LOG" : np.log, "DLOG" : np.log,
+              "SQRT" : np.sqrt, "DSQRT" : np.sqrt, "ABS" : np.abs,
+              "MIN" : np.minimum, "MAX" : np.maximum}
+
+#names which can be provided as model inputs (N2 and O2 are calculated from M)
+_INPUTS = ["TEMP", "M", "N2", "O2", "H2O", "PRESS", "RH", "DEC", "BLHEIGHT",
+           "DILUTE", "JFAC", "ROOF", "ASA", "RO2"]
+
+def _translate(expr):
+    """Translates a FACSIMILE expression into an equivalent Python expression"""
+    #Fortran double precision exponents (e.g. 5.6D-34)
+    py_expr = re.sub(r"(?<![\w.])(\d+\.?\d*|\.\d+)[dD]([+-]?\d+)", r"\1e\2", expr)
+    #FACSIMILE exponentiation
+    py_expr = py_expr.replace("@", "**")
+    #photolysis rates (e.g. J<1> or J(1))
+    py_expr = re.sub(r"\bJ\s*[<(]\s*(\d+)\s*[>)]", r"J[\1]", py_expr)
+    #functions are case-insensitive
+    py_expr = re.sub(r"\b([A-Za-z]\w*)(?=\s*\()",
+                     lambda m : m[1].upper() if m[1].upper() in _FUNCTIONS else m[1],
+                     py_expr)
+
+    return py_expr.strip()
+
+def _names(py_expr):
+    """Returns the variable names used in a Python expression"""
+    return {n.id for n in ast.walk(ast.parse(py_expr, mode="eval"))
+            if isinstance(n, ast.Name)}
+
+def compile_rate_coefficients(mechanism_path : str):
+    """Translates the generic rate coefficients and reaction rate expressions
+    of a FACSIMILE mechanism into a single vectorized function, returning a
+    CompiledRates tuple of the function, the list of reactions (as output by
+    species_from_mechanism.get_reactions), the generic rate coefficients, and
+    the input variables required (e.g. TEMP, M, J)."""
+    coeffs = get_generic_rate_coefficients(mechanism_path)
+    reactions = get_reactions(mechanism_path)
+
+    known = set(_FUNCTIONS) | set(_INPUTS) | {"J"}
+    variables = set()
+    lines = []
+
+    #generic rate coefficients are evaluated in the order they are defined
+    for name, expr in coeffs.items():
+        py_expr = _translate(expr)
+        unknown = _names(py_expr) - known
+        if unknown:
+            raise Exception(f"Unknown names {sorted(unknown)} in the definition of {name} = {expr}")
+        variables |= (_names(py_expr) & (set(_INPUTS) | {"J"}))
+        lines.append(f"    {name} = {py_expr}")
+        known.add(name)
+
+    for i, (expr, _, _) in enumerate(reactions):
+        py_expr = _translate(expr)
+        unknown = _names(py_expr) - known
+        if unknown:
+            raise Exception(f"Unknown names {sorted(unknown)} in the rate expression of reaction {i+1}: {expr}")
+        variables |= (_names(py_expr) & (set(_INPUTS) | {"J"}))
+        lines.append(f"    k[{i}] = {py_expr}")
+
+    args = ", ".join(_INPUTS + ["J"])
+    source = "\n".join([f"def _rate_coefficients(k, {args}):"] + lines + ["    return k"])
+
+    namespace = dict(_FUNCTIONS)
+    exec(compile(source, mechanism_path, "exec"), namespace)
+
+    return CompiledRates(namespace["_rate_coefficients"], reactions, coeffs,
+                         sorted(variables))
+
+def rate_coefficients(mechanism, env_df : pd.DataFrame,
+                      photo_df : pd.DataFrame = pd.DataFrame(),
+                      conc_df : pd.DataFrame = pd.DataFrame(),
+                      mechanism_path : str = ""):
+    """Calculates every rate coefficient of a mechanism at every time in an
+    environment dataframe (e.g. environmentVariables.output, with columns
+    such as TEMP, PRESS, H2O and M), returning a dataframe with a column for
+    each reaction number.
+
+    `mechanism` is the path to a FACSIMILE mechanism or a CompiledRates tuple
+    (from compile_rate_coefficients). Photolysis rates are taken from the J1,
+    J2, ... columns of `photo_df`. If M is not provided it is calculated from
+    TEMP and PRESS. If rate expressions use RO2 (and it isn't a column of 
+    `env_df`), the RO2 sum is calculated from `conc_df` at every time, using 
+    the RO2 species of `mechanism_path` (or of `mechanism` if it is a path)."""
+    if not isinstance(mechanism, CompiledRates):
+        mechanism_path = mechanism_path if mechanism_path else mechanism
+        mechanism = compile_rate_coefficients(mechanism)
+
+    times = env_df.index
+    ntimes = len(times)
+
+    inputs = {}
+    for name in _INPUTS:
+        if name in env_df.columns:
+            inputs[name] = pd.to_numeric(env_df[name], errors="coerce").to_numpy(dtype=float)
+        else:
+            inputs[name] = None
+
+    if inputs["M"] is None and (inputs["TEMP"] is not None) and (inputs["PRESS"] is not None):
+        #number density of air (molecules cm-3) from pressure (mbar) and temperature (K)
+        inputs["M"] = 7.2429E18 * inputs["PRESS"] / inputs["TEMP"]
+    if inputs["M"] is not None:
+        inputs["N2"] = 0.7809 * inputs["M"]
+        inputs["O2"] = 0.2095 * inputs["M"]
+
+    if ("RO2" in mechanism.variables) and (inputs["RO2"] is None):
+        if not mechanism_path:
+            raise Exception("The mechanism uses RO2, so mechanism_path is required to find the RO2 species (or RO2 must be a column of env_df)")
+        ro2_species = get_ro2_species(mechanism_path)
+        if not ro2_species:
+            raise Exception(f"The mechanism uses RO2, but no RO2 species were found in {mechanism_path}")
+        ro2_species = [x for x in ro2_species if x in conc_df.columns]
+        if not ro2_species:
+            raise Exception("The mechanism uses RO2, but none of the RO2 species are columns of conc_df")
+        missing_times = times.difference(conc_df.index)
+        if len(missing_times):
+            raise Exception(f"conc_df has no concentrations at {len(missing_times)} of the times of env_df (e.g. {missing_times[0]}), so the RO2 sum can't be calculated")
+        inputs["RO2"] = conc_df[ro2_species].reindex(times).sum(axis=1).to_numpy(dtype=float)
+
+    J = {}
+    for col in photo_df.columns:
+        match = re.fullmatch(r"J(\d+)", str(col))
+        if match:
+            J[int(match[1])] = photo_df[col].reindex(times).to_numpy(dtype=float)
+
+    missing = [x for x in mechanism.variables if (x != "J") and (inputs[x] is None)]
+    if missing:
+        raise Exception(f"Inputs required by the mechanism are missing: {missing}")
+
+    k = np.empty((len(mechanism.reactions), ntimes))
+    try:
+        mechanism.function(k, J = J, **inputs)
+    except KeyError as e:
+        raise Exception(f"Photolysis rate J{e.args[0]} is required by the mechanism but was not provided")
+
+    return pd.DataFrame(k.T, index = times,
+                        columns = pd.Index(np.arange(1, len(mechanism.reactions)+1),
+                                           name = "reactionNumber"))
+
+def reaction_rates(k_df : pd.DataFrame, conc_df : pd.DataFrame, mechanism):
+    """Calculates the rate of every reaction (molecules cm-3 s-1) from a
+    dataframe of rate coefficients (from rate_coefficients) and a dataframe of
+    species concentrations containing every reactant (as output by
+    read_output.species_concentrations_df). `mechanism` is the path to the
+    mechanism or a CompiledRates tuple."""
+    if isinstance(mechanism, CompiledRates):
+        reactions = mechanism.reactions
+    else:
+        reactions = get_reactions(mechanism)
+
+    reactants = [r for _, r, _ in reactions]
+    missing = sorted({s for r in reactants for s in r} - set(conc_df.columns))
+    if missing:
+        raise Exception(f"Reactant concentrations missing from conc_df: {missing}")
+
+    #gather the reactant concentrations of every reaction at once, padding
+    #reactions with fewer reactants with a column of ones
+    spec_idx = {s : i for i,s in enumerate(conc_df.columns)}
+    ones_idx = len(conc_df.columns)
+    max_reacts = max([len(r) for r in reactants] + [1])
+    idx = np.full((len(reactants), max_reacts), ones_idx)
+    for i, r in enumerate(reactants):
+        idx[i,:len(r)] = [spec_idx[s] for s in r]
+
+    concs = conc_df.reindex(k_df.index).to_numpy(dtype=float)
+    concs = np.hstack([concs, np.ones((len(concs), 1))])
+
+    rates = k_df.to_numpy() * concs[:, idx].prod(axis=2)
+
+    return pd.DataFrame(rates, index = k_df.index, columns = k_df.columns)
@@ -1,35 +1,147 @@
-"""Functions to read the output files from AtChem2"""
+"""Functions to read the output files from AtChem2.
+
+Output files which have been compressed (see archive.archive_output) are found
+and decompressed as they are read, so the original (uncompressed) paths can
+still be used."""
 #imports
+import os
+import gzip
+import lzma
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import numpy as np
+
+#extensions of compressed output files and the functions to open them
+COMPRESSED_EXTENSIONS = {".gz" : gzip.open, ".xz" : lzma.open}
+
+def resolve_output_path(file_path):
+    """Returns the path of an output file, or of its compressed copy (with a 
+    .gz or .xz extension) if the file has been archived"""
+    if os.path.exists(file_path):
+        return file_path
+    for ext in COMPRESSED_EXTENSIONS:
+        if os.path.exists(file_path + ext):
+            return file_path + ext
+    return file_path
+
+def is_compressed(file_path):
+    """Tests whether a (resolved) output path is a compressed file"""
+    return os.path.splitext(file_path)[1] in COMPRESSED_EXTENSIONS
+
+def open_output(file_path, mode="rt"):
+    """Opens an output file for reading, decompressing it as it is read if 
+    it has been archived"""
+    file_path = resolve_output_path(file_path)
+    opener = COMPRESSED_EXTENSIONS.get(os.path.splitext(file_path)[1], open)
+    return opener(file_path, mode)
+
+def read_header(file_path):
+    """Returns the column names from the header line of an AtChem2 output 
+    file"""
+    with open_output(file_path) as file:
+        return file.readline().split()
 
 def species_concentrations_df(file_path, species="ALL", 
-                                  error_for_non_species=False):
-    """Reads speciesConcentrations.output files into a pandas dataframe"""
-    #Create dataframe from file at the given path
-    data = pd.read_csv(file_path, index_col=0, sep='\s+')
+                                  error_for_non_species=False, dtype=None):
+    """Reads speciesConcentrations.output files into a pandas dataframe. 
+    
+    Only the columns of the requested species are parsed, which is much 
+    faster than reading the whole file when selecting a few species from a 
+    large output. If `dtype` is given (e.g. np.float32), the concentrations 
+    are read as that type."""
+    #find the species present in the file from its header
+    file_path = resolve_output_path(file_path)
+    header = read_header(file_path)
+    available = set(header[1:])
     
     #select only the species specified in the "species" variable
     if type(species) == list:
         if (error_for_non_species and 
-            (not all(e in data.columns for e in species))):
-            raise Exception(f"""Provided species not present in model output: {[", ".join([x for x in species if x not in data.columns])]}""")
+            (not all(e in available for e in species))):
+            raise Exception(f"""Provided species not present in model output: {[", ".join([x for x in species if x not in available])]}""")
         
-        data = data[[x for x in species if x in data.columns]]
+        columns = [x for x in species if x in available]
     elif type(species) == str:
-        if species.casefold() != "ALL".casefold():
-            if (error_for_non_species and (species not in data.columns)):
-                raise Exception(f"""Provided species not present in model output: {species}""")
-            elif (species not in data.columns):
-                data = data[[]]
-            else:
-                data = data[[species]]
+        if species.casefold() == "ALL".casefold():
+            columns = header[1:]
+        elif (error_for_non_species and (species not in available)):
+            raise Exception(f"""Provided species not present in model output: {species}""")
+        elif (species not in available):
+            columns = []
+        else:
+            columns = [species]
     else:
         raise TypeError(f"""Invalid input of species. Species argument must be 
                         a list of species names, a string of the name of a 
                         species, or the string "ALL".
                         Provided input = {species}.""")
+    
+    #Create dataframe from only the required columns of the file
+    usecols = [header[0]] + list(dict.fromkeys(columns))
+    data = pd.read_csv(file_path, index_col=0, sep='\s+', usecols=usecols,
+                       dtype=None if dtype is None else {x : dtype for x in columns})
 
-    return data
+    return data[columns]
+
+def _reverse_lines(file_path, block_size=65536):
+    """Yields the non-empty lines of a file from last to first, reading 
+    blocks backwards from the end of the file"""
+    with open(file_path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        pos = file.tell()
+        remainder = b""
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            file.seek(pos)
+            lines = (file.read(size) + remainder).split(b"\n")
+            #the first line may be incomplete, so keep it for the next block
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line.decode()
+        if remainder.strip():
+            yield remainder.decode()
+
+def _streamed_last_line(file_path, time=None):
+    """Yields the last line of an output file (or the last line with a time 
+    at or before `time`), reading the file from the start"""
+    last = None
+    with open_output(file_path) as file:
+        file.readline()
+        for line in file:
+            if not line.strip():
+                continue
+            if (time is not None) and (float(line.split()[0]) > time):
+                break
+            last = line
+    if last is not None:
+        yield last
+
+def restart_concentrations(file_path, time=None):
+    """Reads the concentrations of all species at the last time in a 
+    speciesConcentrations.output file (or, if `time` is given, at the last 
+    time at or before `time`) into a pandas series, named by the model time.
+    
+    The file is read backwards from the end, so only the rows after the 
+    requested time are parsed, regardless of the length of the output. This is
+    used to restart a model from the end of a previous run. Compressed files 
+    can't be read backwards, so are decompressed from the start instead."""
+    file_path = resolve_output_path(file_path)
+    header = read_header(file_path)
+    
+    lines = _streamed_last_line(file_path, time) if is_compressed(file_path) else _reverse_lines(file_path)
+    for line in lines:
+        values = line.split()
+        if values == header:
+            break
+        row_time = float(values[0])
+        if (time is None) or (row_time <= time):
+            return pd.Series([float(x) for x in values[1:]], index=header[1:],
+                             name=row_time)
+    
+    raise Exception(f"No concentrations at or before time {time} in {file_path}")
 
 def return_net_0_species(rxn_str):
     """Returns species in a reaction which are present in both the reactants 
@@ -41,11 +153,60 @@ def return_net_0_species(rxn_str):
     
     return [x for x in intersection]
 
+class SortedRates:
+    """Rate output (as produced by rate_df) sorted by species, then time, then 
+    reaction number, with a table of the offsets of each species. Slices of a 
+    single species and/or time window are contiguous blocks of the sorted 
+    data, so are found by binary search and share the memory of the sorted 
+    data (with pandas copy-on-write, a slice is only copied if it is 
+    modified)."""
+    def __init__(self, data):
+        spec_codes, self.species = pd.factorize(data.index.get_level_values(1),
+                                                sort=True)
+        times = data.index.get_level_values(0).to_numpy()
+        rxn_nums = data.index.get_level_values(2).to_numpy()
+        
+        #sort once, by species then time then reaction number
+        order = np.lexsort((rxn_nums, times, spec_codes))
+        self.data = data.iloc[order]
+        self.times = times[order]
+        
+        #offset of the first row of each species (plus the end of the data)
+        self.offsets = np.searchsorted(spec_codes[order], 
+                                       np.arange(len(self.species)+1))
+
+    def species_bounds(self, species, start=None, end=None):
+        """Returns the (first, last+1) row numbers of the sorted data for a 
+        given species between the start and end times (inclusive)"""
+        i = self.species.get_loc(species)
+        lo, hi = self.offsets[i], self.offsets[i+1]
+        spec_times = self.times[lo:hi]
+        
+        first = lo if start is None else lo + np.searchsorted(spec_times, start, "left")
+        last = hi if end is None else lo + np.searchsorted(spec_times, end, "right")
+        
+        return first, last
+
+    def get_species(self, species, start=None, end=None):
+        """Returns the rates of a given species between the start and end times 
+        (inclusive), indexed by time and reaction number"""
+        first, last = self.species_bounds(species, start, end)
+        
+        return self.data.iloc[first:last].droplevel(1)
+
+    def time_window(self, start=None, end=None):
+        """Returns a dictionary of the rates of each species between the start 
+        and end times (inclusive), indexed by time and reaction number"""
+        return {s : self.get_species(s, start, end) for s in self.species}
+
 def rate_df(file_path, species="ALL", drop_0=True, drop_net_0=True, 
-                 drop_rev=False, error_for_non_species = True):
-    """Reads lossRates.output or productionRates.output files into a pandas dataframe"""
+                 drop_rev=False, error_for_non_species = True, presorted=False):
+    """Reads lossRates.output or productionRates.output files into a pandas dataframe.
+    
+    If `presorted` is true, then a SortedRates object is returned instead, 
+    allowing fast slicing of individual species and time windows."""
     #Create dataframe from file at the given path
-    data = pd.read_csv(file_path, index_col=[0,2,3], sep='\s+',
+    data = pd.read_csv(resolve_output_path(file_path), index_col=[0,2,3], sep='\s+',
                        keep_default_na=False)
     
     #get df of all reactions for dropping reaction later if needed
@@ -116,6 +277,118 @@ def rate_df(file_path, species="ALL", drop_0=True, drop_net_0=True,
         
         #remove the reversible reactions from the data
         data = data.drop(reversible_reactions, level=2)
+    
+    if presorted:
+        return SortedRates(data)
         
     return data
 
+def read_run_outputs(model_path, species="ALL", max_workers=5):
+    """Reads the speciesConcentrations, lossRates, productionRates, 
+    environmentVariables and photolysisRates output files of a model run 
+    concurrently, in a pool of threads (the pandas parser releases the GIL 
+    while parsing). `species` selects the concentrations to read (see 
+    species_concentrations_df). The rate outputs are returned as read from 
+    the files, as output by build_and_run.write_build_run. Compressed 
+    (archived) output files are read transparently."""
+    out_path = f"{model_path}/output"
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(species_concentrations_df, 
+                                   f"{out_path}/speciesConcentrations.output",
+                                   species=species, error_for_non_species=True),
+                   executor.submit(pd.read_csv, resolve_output_path(f"{out_path}/lossRates.output"),
+                                   sep='\s+', keep_default_na=False),
+                   executor.submit(pd.read_csv, resolve_output_path(f"{out_path}/productionRates.output"),
+                                   sep='\s+', keep_default_na=False),
+                   executor.submit(pd.read_csv, resolve_output_path(f"{out_path}/environmentVariables.output"),
+                                   index_col=0, sep='\s+'),
+                   executor.submit(pd.read_csv, resolve_output_path(f"{out_path}/photolysisRates.output"),
+                                   index_col=0, sep='\s+')]
+        
+        return tuple(f.result() for f in futures)
+
+def mechanism_species(file_path):
+    """Reads the species of a built model, in the order used by the model 
+    (e.g. for the rows and columns of the jacobian), from the 
+    mechanism.species file written to the configuration directory of a model 
+    when it is built. Returns a pandas index of species names."""
+    with open_output(file_path) as file:
+        #lines are the species number followed by the species name
+        return pd.Index([line.split()[-1] for line in file if line.strip()],
+                        name = "speciesName")
+
+#the number of values AtChem2 writes on each line of jacobian.output, with 
+#longer rows continued on the following lines
+JACOBIAN_LINE_WIDTH = 100
+
+def _is_numeric_line(tokens):
+    """Tests whether a (split) line is not empty and only contains numbers"""
+    try:
+        [float(x) for x in tokens]
+    except ValueError:
+        return False
+    return len(tokens) > 0
+
+def jacobian_rows(lines):
+    """Yields the rows of a jacobian.output file (from an iterable of its 
+    lines) as lists of strings of the time followed by a row of the jacobian. 
+    Lines which are not numeric (e.g. separators or headers) are skipped. The 
+    length of every row is taken from the first row, which is continued over 
+    the following lines while they are JACOBIAN_LINE_WIDTH values long. An 
+    incomplete final row is ignored."""
+    row_len = None
+    tokens = []
+    for line in lines:
+        line_tokens = line.split()
+        if not _is_numeric_line(line_tokens):
+            continue
+        tokens.extend(line_tokens)
+        if row_len is None:
+            if len(line_tokens) == JACOBIAN_LINE_WIDTH:
+                continue
+            row_len = len(tokens)
+        while len(tokens) >= row_len:
+            yield tokens[:row_len]
+            del tokens[:row_len]
+
+def jacobian_matrices(file_path, species):
+    """Reads a jacobian.output file one timestep at a time, yielding a tuple of
+    the model time and the jacobian at that time as a scipy.sparse CSR matrix
+    (species x species, in the order of `species`, e.g. from 
+    mechanism_species). Only one timestep is held in memory at once, and 
+    only the non-zero elements are kept.
+    
+    The number of species is taken from the first row of the file (see 
+    jacobian_rows), with a warning if it doesn't match `species`. Requires the
+    scipy package. An incomplete final timestep (e.g. from a model which is 
+    still running) is ignored."""
+    try:
+        from scipy.sparse import csr_matrix
+    except ImportError:
+        raise ImportError("The scipy package is required to read jacobian output.")
+    
+    n = None
+    data, indices, indptr = [], [], [0]
+    with open_output(file_path) as file:
+        for tokens in jacobian_rows(file):
+            row = np.array(tokens, dtype=float)
+            if n is None:
+                n = len(row) - 1
+                if n != len(species):
+                    warnings.warn(f"The jacobian has {n} species, but {len(species)} species were given.")
+            
+            if len(indptr) == 1:
+                time = float(row[0])
+            elif row[0] != time:
+                raise Exception(f"Jacobian rows at time {time} do not match the number of species ({n})")
+            
+            nonzero = np.flatnonzero(row[1:])
+            indices.append(nonzero)
+            data.append(row[1:][nonzero])
+            indptr.append(indptr[-1] + len(nonzero))
+            
+            if len(indptr) == n + 1:
+                yield time, csr_matrix((np.concatenate(data), 
+                                        np.concatenate(indices),
+                                        np.array(indptr)), shape=(n, n))
+                data, indices, indptr = [], [], [0]
@@ -0,0 +1,147 @@
+"""Functions to render many figures in parallel and assemble them into reports.
+
+A report is described as a list of pages, where each page is a tuple of
+(function, args, kwargs) or (function, args, kwargs, savefig_kwargs). The
+function is called with args and kwargs and must return a matplotlib Figure
+(e.g. plotting_functions.plot_species). Pages are rendered in a process pool
+using the non-interactive Agg backend, and each rendered page is cached under
+a hash of its function (name and code) and input data, so pages whose function
+and inputs are unchanged are not re-rendered."""
+#imports
+import os
+import shutil
+import hashlib
+import functools
+from types import CodeType
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+def _update_hash(h, obj):
+    """Adds an object to a hash, hashing the data of pandas and numpy objects"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        h.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for k,v in sorted(obj.items(), key=lambda x : repr(x[0])):
+            _update_hash(h, k)
+            _update_hash(h, v)
+    elif isinstance(obj, (list, tuple)):
+        h.update(type(obj).__name__.encode())
+        for x in obj:
+            _update_hash(h, x)
+    elif isinstance(obj, (set, frozenset)):
+        h.update(b"set")
+        for x in sorted(obj, key=repr):
+            _update_hash(h, x)
+    elif isinstance(obj, CodeType):
+        #the bytecode and constants (e.g. labels) of a function, so that
+        #editing a plotting function invalidates the pages it rendered
+        h.update(obj.co_code)
+        _update_hash(h, obj.co_consts)
+    elif isinstance(obj, functools.partial):
+        _update_hash(h, (obj.func, obj.args, obj.keywords))
+    elif callable(obj):
+        h.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+        if hasattr(obj, "__code__"):
+            _update_hash(h, obj.__code__)
+    else:
+        h.update(repr(obj).encode())
+
+def page_hash(page, fmt : str = "pdf", dpi : int = 100):
+    """Returns a hash of a page's function, input data and output format"""
+    h = hashlib.sha256()
+    _update_hash(h, (fmt, dpi) + tuple(page))
+
+    return h.hexdigest()
+
+def _use_agg():
+    """Sets the non-interactive Agg backend in pool workers"""
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render_page(page, out_file, dpi):
+    """Renders a single page to a file"""
+    func, args, kwargs = page[:3]
+    savefig_kwargs = page[3] if len(page) > 3 else {}
+
+    fig = func(*args, **kwargs)
+    #write to a temporary file first, so that interrupted renders are not cached
+    tmp_file = f"{out_file}.{os.getpid()}.tmp"
+    fig.savefig(tmp_file, dpi=dpi, format=out_file.rsplit(".", 1)[-1],
+                **savefig_kwargs)
+    os.replace(tmp_file, out_file)
+
+    return out_file
+
+def render_pages(pages : list, out_path : str, fmt : str = "pdf",
+                 processes : int = None, cache_dir : str = "", dpi : int = 100):
+    """Renders a list of pages in parallel, assembling them (in order) into a
+    single pdf at `out_path` if `fmt` is "pdf", or into a directory of numbered
+    png files at `out_path` if `fmt` is "png".
+
+    Rendered pages are cached in `cache_dir` (default: `out_path` + ".pages"),
+    and pages whose hash matches a cached page are not rendered again.
+    Assembling pdfs requires the pypdf package. Returns the list of rendered
+    page files."""
+    if fmt not in ["pdf", "png"]:
+        raise Exception(f"Output format must be 'pdf' or 'png', not {fmt}")
+    if not cache_dir:
+        cache_dir = f"{os.path.normpath(out_path)}.pages"
+    os.makedirs(cache_dir, exist_ok=True)
+
+    page_files = [f"{cache_dir}{os.sep}{page_hash(p, fmt, dpi)}.{fmt}" for p in pages]
+
+    #only render pages that are not already cached (each unique page once)
+    to_render = {}
+    for p,f in zip(pages, page_files):
+        if (not os.path.exists(f)) and (f not in to_render):
+            to_render[f] = p
+
+    if to_render:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_use_agg) as executor:
+            futures = [executor.submit(_render_page, p, f, dpi) for f,p in to_render.items()]
+            for future in futures:
+                future.result()
+
+    if fmt == "png":
+        os.makedirs(out_path, exist_ok=True)
+        for i,f in enumerate(page_files):
+            shutil.copyfile(f, f"{out_path}{os.sep}page_{i+1:04d}.png")
+    else:
+        try:
+            from pypdf import PdfWriter
+        except ImportError:
+            raise ImportError("The pypdf package is required to assemble pdf reports. Install pypdf or use fmt='png'.")
+        writer = PdfWriter()
+        for f in page_files:
+            writer.append(f)
+        with open(out_path, "wb") as file:
+            writer.write(file)
+
+    return page_files
+
+def species_pages(conc_dfs : dict, species : list, species_per_page : int = 6,
+                  ncols : int = 3, **kwargs):
+    """Returns a list of pages of species concentration plots (made using
+    plotting_functions.plot_species) for each of a dictionary of concentration
+    dataframes (e.g. one per model run), with the dictionary keys used as page
+    titles. Keyword arguments are passed to plot_species."""
+    from .plotting_functions import plot_species
+
+    units = kwargs.pop("units", None)
+    pages = []
+    for name, conc_df in conc_dfs.items():
+        for i in range(0, len(species), species_per_page):
+            page_kwargs = dict(kwargs, nrows = None, ncols = ncols, title = str(name))
+            if units:
+                page_kwargs["units"] = units[i:i+species_per_page]
+            pages.append((plot_species, (conc_df, species[i:i+species_per_page]),
+                          page_kwargs))
+
+    return pages
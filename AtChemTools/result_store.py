@@ -0,0 +1,175 @@
+"""Functions to collect the output of many model runs into a single store which
+can be queried across runs without re-reading the AtChem2 output files.
+
+Each run is stored as a chunk of columnar arrays (one contiguous row of values
+per species, so single species can be read across many runs without loading
+whole runs), and run metadata (e.g. the model parameters used for the run) is
+stored as a table alongside them."""
+#imports
+import os
+import json
+import shutil
+import tempfile
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .read_output import species_concentrations_df
+from .utilities import convert_time_to_seconds
+
+RunArrays = namedtuple("RunArrays", ["times", "species", "values"])
+
+def _run_dir(store_path, run_id):
+    """Returns the directory used to store the arrays for a given run"""
+    return f"{store_path}/runs/{run_id}"
+
+def add_run(store_path : str, run_id : str, conc_df : pd.DataFrame,
+            metadata : dict = {}, dtype = float):
+    """Adds the species concentrations of a single model run to the store at
+    `store_path` (creating the store if needed), along with a dictionary of run
+    metadata. Runs can be added incrementally as they finish."""
+    run_id = str(run_id)
+    run_path = _run_dir(store_path, run_id)
+    if os.path.exists(run_path):
+        raise Exception(f"Run {run_id} is already present in the store at {store_path}")
+
+    os.makedirs(f"{store_path}/runs", exist_ok=True)
+
+    #write the arrays to a temporary directory and then move them into place,
+    #so that partially written runs are never visible to queries
+    tmp_path = f"{store_path}/runs/.{run_id}.tmp"
+    os.makedirs(tmp_path)
+    np.save(f"{tmp_path}/times.npy", conc_df.index.to_numpy(dtype=float))
+    np.save(f"{tmp_path}/values.npy",
+            np.ascontiguousarray(conc_df.to_numpy(dtype=dtype).T))
+    with open(f"{tmp_path}/species.txt", "w") as file:
+        file.writelines([f"{x}\n" for x in conc_df.columns])
+    os.replace(tmp_path, run_path)
+
+    #append the metadata as a single line, so that concurrent ingestion does
+    #not interleave entries
+    line = json.dumps({"run_id" : run_id, **metadata}, default=str) + "\n"
+    with open(f"{store_path}/runs.jsonl", "a") as file:
+        file.write(line)
+
+def add_output_dir(store_path : str, run_id : str, output_path : str,
+                   metadata : dict = {}, species = "ALL", dtype = float):
+    """Adds the speciesConcentrations.output file in an AtChem2 output
+    directory to the store at `store_path`."""
+    conc_df = species_concentrations_df(f"{output_path}/speciesConcentrations.output",
+                                        species = species)
+    add_run(store_path, run_id, conc_df, metadata = metadata, dtype = dtype)
+
+def remove_run(store_path : str, run_id : str):
+    """Removes a run (and its metadata) from the store"""
+    run_id = str(run_id)
+    meta_path = f"{store_path}/runs.jsonl"
+
+    with open(meta_path) as file:
+        lines = [x for x in file if json.loads(x)["run_id"] != run_id]
+
+    #write the remaining metadata to a temporary file in the store and replace
+    #the metadata with it, so the metadata is never partially written
+    fd, tmp_path = tempfile.mkstemp(dir=store_path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.writelines(lines)
+        os.replace(tmp_path, meta_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    shutil.rmtree(_run_dir(store_path, run_id))
+
+def run_metadata(store_path : str):
+    """Returns a dataframe of the metadata for every run in the store, indexed
+    by run id"""
+    meta_path = f"{store_path}/runs.jsonl"
+    if not os.path.exists(meta_path) or os.path.getsize(meta_path) == 0:
+        return pd.DataFrame(index = pd.Index([], name = "run_id"))
+
+    meta = pd.read_json(meta_path, lines = True, dtype = {"run_id" : str})
+    return meta.set_index("run_id")
+
+def _run_species(store_path, run_id):
+    """Returns the species stored for a run, mapped to their row in the run's
+    value array"""
+    with open(f"{_run_dir(store_path, run_id)}/species.txt") as file:
+        return {x.strip() : i for i,x in enumerate(file)}
+
+def run_arrays(store_path : str, run_id : str):
+    """Returns a RunArrays tuple of the output times of a run in the store, a
+    dictionary mapping its species to their rows in the values array, and the
+    values array itself (species x times), which is memory-mapped so that only
+    the rows and times used are read"""
+    run_path = _run_dir(store_path, str(run_id))
+
+    return RunArrays(np.load(f"{run_path}/times.npy"),
+                     _run_species(store_path, str(run_id)),
+                     np.load(f"{run_path}/values.npy", mmap_mode = "r"))
+
+def read_run(store_path : str, run_id : str, species = "ALL"):
+    """Reads the species concentrations for a single run in the store into a
+    pandas dataframe with the same layout as
+    read_output.species_concentrations_df"""
+    times, spec_rows, values = run_arrays(store_path, run_id)
+    if type(species) == str:
+        species = list(spec_rows.keys()) if species.casefold() == "ALL".casefold() else [species]
+    species = [x for x in species if x in spec_rows]
+
+    return pd.DataFrame(values[[spec_rows[x] for x in species]].T,
+                        index = pd.Index(times, name = "t"), columns = species)
+
+def query_store(store_path : str, species, time = None, where : str = "",
+                tolerance : float = None):
+    """Queries one or more species across all runs in the store.
+
+    `where` is an optional pandas query string evaluated against the run
+    metadata table (e.g. "TEMP > 300") to select the runs used. If `time` is
+    given (in model seconds or as a HH:MM:SS string) then a dataframe of the
+    concentrations at the closest output time to `time` is returned, indexed by
+    run id with a column for each species. Otherwise a dataframe of the full
+    time series is returned, indexed by run id and time.
+
+    Runs with no output time within `tolerance` seconds of `time` (by default
+    half of the run's output step) have NaN concentrations.
+
+    Only the rows of the requested species are read from each run."""
+    if type(species) == str:
+        species = [species]
+
+    meta = run_metadata(store_path)
+    if where:
+        meta = meta.query(where)
+
+    if time is not None:
+        time = convert_time_to_seconds(time)
+
+    out = []
+    for run_id in meta.index:
+        times, spec_rows, values = run_arrays(store_path, run_id)
+        rows = [spec_rows.get(x) for x in species]
+
+        if time is not None:
+            #find the closest output time to the requested time
+            itime = np.abs(times - time).argmin()
+            run_tol = tolerance
+            if run_tol is None:
+                run_tol = np.median(np.diff(times))/2 if len(times) > 1 else 0
+            if abs(times[itime] - time) > run_tol:
+                rows = [None for x in rows]
+            run_vals = [values[r, itime] if r is not None else np.nan for r in rows]
+            out.append(pd.DataFrame([run_vals], columns = species,
+                                    index = pd.Index([run_id], name = "run_id")))
+        else:
+            run_vals = np.full((len(times), len(species)), np.nan)
+            for i,r in enumerate(rows):
+                if r is not None:
+                    run_vals[:,i] = values[r]
+            idx = pd.MultiIndex.from_arrays([np.repeat(run_id, len(times)), times],
+                                            names = ["run_id", "t"])
+            out.append(pd.DataFrame(run_vals, columns = species, index = idx))
+
+    if not out:
+        return pd.DataFrame(columns = species, dtype = float)
+
+    return pd.concat(out)
@@ -0,0 +1,266 @@
+"""Functions for rate of production analysis (ROPA) of AtChem2 loss and
+production rate output, producing stackplots of the main reactions
+contributing to the production and loss of given species.
+
+Can also be run as a script to produce ROPA reports for many model output
+directories in parallel, e.g.:
+    python -m AtChemTools.ropa model1/output model2/output -s NO2,O3 -n 10
+"""
+#imports (matplotlib is imported when plotting, so that importing this module
+#is fast)
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from .read_output import rate_df, SortedRates
+from .utilities import string_to_bool
+from .downsample import stack_indices
+
+def top_reactions(rates : pd.DataFrame, top_n : int):
+    """Selects the top n reactions (by median rate over the whole dataset)
+    contributing to the rates of every species in a rate dataframe, with the
+    rates of all other reactions summed into a single reaction named "Other"
+    (given a reaction number of np.inf so that it is always the final reaction).
+
+    `rates` should be indexed by time, species name and reaction number (as
+    output by read_output.rate_df). Returns a dataframe with the same index,
+    and columns of the rate, the reaction string, and the percentage
+    contribution of each reaction to the total rate of the species ("%rate")."""
+    times = rates.index.get_level_values(0)
+    specs = rates.index.get_level_values(1)
+    rxn_nums = rates.index.get_level_values(2)
+
+    #rank the median rate of each reaction within each species
+    medians = rates["rate"].groupby([specs, rxn_nums]).median()
+    ranks = medians.groupby(level=0).rank(ascending=False, method="first")
+
+    #flag the rows of the top n reactions of each species
+    is_top = ranks.reindex(pd.MultiIndex.from_arrays([specs, rxn_nums])).to_numpy() <= top_n
+
+    topn_df = rates.loc[is_top, ["rate", "reaction"]]
+
+    #add the rates of all of the other reactions at each timestep
+    other_rates = rates.loc[~is_top, "rate"].groupby([times[~is_top],
+                                                      specs[~is_top]]).sum()
+    other_df = pd.DataFrame({"rate" : other_rates.to_numpy(), "reaction" : "Other"},
+                            index = pd.MultiIndex.from_arrays(
+                                [other_rates.index.get_level_values(0),
+                                 other_rates.index.get_level_values(1),
+                                 np.full(len(other_rates), np.inf)],
+                                names = rates.index.names))
+
+    out_df = pd.concat([topn_df, other_df]).sort_index()
+
+    #calculate each rate as a percentage of the total rate of the species
+    totals = out_df["rate"].groupby(level=[0,1]).transform("sum")
+    out_df["%rate"] = out_df["rate"].divide(totals)*100
+
+    return out_df
+
+def rate_plot(df_dict : dict, fig, col_name : str, title_end : str,
+              rate_units : str, cmap = "tab20", max_points : int = None):
+    """Plots a stackplot of the rates of each reaction for each species in a
+    dictionary of rate dataframes (indexed by time and reaction number), with
+    one axis per species.
+    
+    If `max_points` is given, then series longer than this are decimated to 
+    approximately `max_points` times (shared by all reactions) before plotting."""
+    from matplotlib import colormaps
+    
+    cols = colormaps.get_cmap(cmap)
+    n_species = len(df_dict.keys())
+    for i,(s,df) in enumerate(df_dict.items()):
+        times = df.index.get_level_values(0).unique()
+        labels = df.loc[times[0],"reaction"]
+        values = df[col_name].unstack().values.transpose()
+        
+        #decimate dense time series
+        if max_points and (len(times) > max_points):
+            idx = stack_indices(values, max(max_points//2, 1))
+            times = times[idx]
+            values = values[:,idx]
+
+        #plot actual plot
+        ax=fig.add_subplot(n_species,1,i+1)
+        ax.stackplot(times, values,
+                     labels = labels,
+                     colors = cols([i for i in range(len(labels))]))
+
+        ax.set_ylabel(f"Rate ({rate_units})")
+        ax.set_xlabel("Time (s)")
+        ax.set_title(f"{s} {title_end}")
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+
+    fig.suptitle(f"{title_end} Reactions")
+
+    return fig
+
+def rate_figure(df_dict : dict, col_name : str, title_end : str, 
+                rate_units : str, cmap = "tab20", max_points : int = None):
+    """Returns a new figure containing a rate_plot of a dictionary of rate 
+    dataframes"""
+    import matplotlib.pyplot as plt
+    
+    fig = plt.Figure(figsize=(10,5*len(df_dict.keys())))
+    
+    return rate_plot(df_dict, fig, col_name, title_end, rate_units, cmap,
+                     max_points)
+
+def title_page(text : str):
+    """Returns a new figure with the given text in the centre of the page"""
+    import matplotlib.pyplot as plt
+    
+    fig = plt.Figure()
+    fig.text(0.5,0.5,text, size=10, ha="center", wrap=True)
+    
+    return fig
+
+def ropa_pages(output_path : str, species, top_n : int, start = "START",
+               end = "END", title_page_text : str = "", drop_rev : bool = False, 
+               drop_0 : bool = True, drop_net_0 : bool = True, 
+               max_points : int = None):
+    """Returns the pages of a ROPA report (see ropa_report) as a list of 
+    (function, args, kwargs, savefig_kwargs) tuples, which can be rendered by 
+    rendering.render_pages (e.g. to render the reports of many runs in 
+    parallel)"""
+    start_num = None if str(start).casefold() == "START".casefold() else float(start)
+    end_num = None if str(end).casefold() == "END".casefold() else float(end)
+
+    spec_dfs = {}
+    for direction, file_name in [("Loss", "lossRates.output"),
+                                 ("Production", "productionRates.output")]:
+        rates = rate_df(f"{output_path}{os.sep}{file_name}", species = species,
+                        drop_0 = drop_0, drop_net_0 = drop_net_0,
+                        drop_rev = drop_rev, error_for_non_species = False)
+
+        #trim the rates to the time window before ranking the reactions, so
+        #that the top reactions are those of the window
+        times = rates.index.get_level_values(0)
+        in_window = np.ones(len(rates), dtype=bool)
+        if start_num is not None:
+            in_window &= times >= start_num
+        if end_num is not None:
+            in_window &= times <= end_num
+        rates = rates.loc[in_window]
+
+        #calculate the top reactions for every species at once, then split the
+        #result into views for each species
+        spec_dfs[direction] = SortedRates(top_reactions(rates, top_n)).time_window()
+
+    #create title page for pdf output
+    plottxt=f"""Production rates of : {", ".join(spec_dfs["Production"].keys())}
+Loss rates of : {", ".join(spec_dfs["Loss"].keys())}
+
+Reversible Reactions Removed : {drop_rev}
+Zero-rate Reactions Removed: {drop_0}
+Net-zero Reactions Removed: {drop_net_0}
+
+{title_page_text}
+
+Plotted on {date.today()}"""
+    pages = [(title_page, (plottxt,), {}, {})]
+
+    for direction, df_dict in spec_dfs.items():
+        if len(df_dict.keys()) > 0:
+            pages.append((rate_figure, (df_dict, "rate", direction, 
+                                        r"molecule $cm^{-3}\ s^{-1}$"), 
+                          {"max_points" : max_points}, {"bbox_inches" : "tight"}))
+            pages.append((rate_figure, (df_dict, "%rate", f"% {direction}", "%"), 
+                          {"max_points" : max_points}, {"bbox_inches" : "tight"}))
+    
+    return pages
+
+def ropa_report(output_path : str, species, top_n : int, start = "START",
+                end = "END", out_file : str = "", title_page_text : str = "",
+                drop_rev : bool = False, drop_0 : bool = True,
+                drop_net_0 : bool = True, max_points : int = None):
+    """Produces a pdf of stackplots of the top n production and loss reactions
+    (and their percentage contributions) for the given species, using the
+    lossRates.output and productionRates.output files in an AtChem2 output
+    directory. `start` and `end` are model times, or "START" and "END" to use
+    the whole of the output. If `out_file` is not given, the pdf is written to
+    "ropa_report.pdf" in the output directory. If `max_points` is given, then 
+    the stackplots are decimated to approximately this many times. Returns the 
+    path to the pdf."""
+    if not out_file:
+        out_file = f"{output_path}{os.sep}ropa_report.pdf"
+
+    pages = ropa_pages(output_path, species, top_n, start = start, end = end, 
+                       title_page_text = title_page_text, drop_rev = drop_rev,
+                       drop_0 = drop_0, drop_net_0 = drop_net_0, 
+                       max_points = max_points)
+
+    from matplotlib.backends.backend_pdf import PdfPages
+    
+    pp = PdfPages(out_file)
+    for func, args, kwargs, savefig_kwargs in pages:
+        pp.savefig(func(*args, **kwargs), **savefig_kwargs)
+    pp.close()
+
+    return out_file
+
+def _parse_time(time):
+    """Parses a start or end time passed on the command line"""
+    if time.casefold() in ["START".casefold(), "END".casefold()]:
+        return time.upper()
+    try:
+        return float(time)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Times must be numeric, 'START' or 'END'")
+
+def main(argv = None):
+    """Produces ROPA reports for one or more AtChem2 output directories in
+    parallel, from command line arguments"""
+    parser = argparse.ArgumentParser(description = """Produce a pdf of
+                                     production and loss rate stackplots for
+                                     each AtChem2 output directory given.""")
+    parser.add_argument("output_paths", nargs="+",
+                        help="Model output directories containing lossRates.output and productionRates.output files")
+    parser.add_argument("-s", "--species", required=True,
+                        help="Species of interest (comma separated list e.g. NO2,O3,NO3)")
+    parser.add_argument("-n", "--top_n", type=int, default=10,
+                        help="Number of reactions to list, with the rest lumped into 'Other'")
+    parser.add_argument("--start", type=_parse_time, default="START",
+                        help="Start time (in model time or 'START')")
+    parser.add_argument("--end", type=_parse_time, default="END",
+                        help="End time (in model time or 'END')")
+    parser.add_argument("--title_page_text", default="",
+                        help="Text to add to the title page of each report")
+    parser.add_argument("--drop_rev", type=string_to_bool, default=False,
+                        help="Ignore reversible reactions (default: False)")
+    parser.add_argument("--drop_0", type=string_to_bool, default=True,
+                        help="Ignore reactions where the rate is 0 throughout the model (default: True)")
+    parser.add_argument("--drop_net_0", type=string_to_bool, default=True,
+                        help="Ignore reactions where the species is both a reactant and product (default: True)")
+    parser.add_argument("--max_points", type=int, default=None,
+                        help="Decimate stackplots to approximately this many times (default: no decimation)")
+    parser.add_argument("-o", "--out_dir", default="",
+                        help="Directory to write reports to (default: each output directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of reports to produce in parallel (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    species = args.species.strip("[]").split(",")
+
+    with ProcessPoolExecutor(max_workers = args.jobs) as executor:
+        futures = []
+        for path in args.output_paths:
+            if args.out_dir:
+                #name reports after the full path, as output directories are 
+                #often all named "output"
+                run_name = os.path.normpath(path).strip(os.sep).replace(os.sep, "_")
+                out_file = f"{args.out_dir}{os.sep}{run_name}_ropa_report.pdf"
+            else:
+                out_file = ""
+            futures.append(executor.submit(ropa_report, path, species,
+                                           args.top_n, args.start, args.end,
+                                           out_file, args.title_page_text,
+                                           args.drop_rev, args.drop_0,
+                                           args.drop_net_0, args.max_points))
+        for path, future in zip(args.output_paths, futures):
+            print(f"{path} : {future.result()}")
+
+if __name__ == "__main__":
+    main()
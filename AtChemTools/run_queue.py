@@ -0,0 +1,318 @@
+"""A simple work queue to spread model runs (e.g. the members of an ensemble)
+across several worker processes or machines, without an external service.
+
+The queue is a SQLite database, which can be placed on a filesystem shared by
+all of the workers. Jobs are the keyword arguments of one of the run functions
+of build_and_run (write_build_run by default). Workers claim pending jobs,
+send heartbeats while they run, and store the (pickled) results next to the
+database. Failed jobs are retried up to a maximum number of attempts, and jobs
+whose worker has stopped sending heartbeats can be returned to the queue.
+
+Workers can be started from the command line with:
+    python -m AtChemTools.run_queue worker <db_path> --atchem2_path <path>"""
+#imports
+import os
+import time
+import pickle
+import socket
+import sqlite3
+import argparse
+import threading
+import traceback
+import warnings
+from . import build_and_run
+
+#run functions that jobs can use
+_FUNCTIONS = {"write_build_run" : build_and_run.write_build_run,
+              "spin_up" : build_and_run.spin_up}
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    function TEXT NOT NULL,
+    kwargs BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    heartbeat REAL,
+    submitted REAL,
+    finished REAL,
+    error TEXT)"""
+
+def _connect(db_path : str):
+    """Opens a connection to the queue database in autocommit mode, waiting
+    for locks held by other workers"""
+    return sqlite3.connect(db_path, timeout=60, isolation_level=None)
+
+def _results_dir(db_path : str):
+    """Returns the directory used to store the results of a queue"""
+    return f"{os.path.splitext(db_path)[0]}_results"
+
+def create_queue(db_path : str):
+    """Creates a queue database at `db_path` (and a directory for results
+    alongside it), if it doesn't already exist"""
+    os.makedirs(_results_dir(db_path), exist_ok=True)
+    con = _connect(db_path)
+    try:
+        con.execute(_SCHEMA)
+    finally:
+        con.close()
+
+def submit(db_path : str, jobs, function : str = "write_build_run",
+           max_attempts : int = 3):
+    """Adds one or more jobs to the queue. `jobs` is a dictionary (or a list of
+    dictionaries) of keyword arguments for `function`, which is the name of a
+    run function of build_and_run ("write_build_run" or "spin_up"). The
+    `atchem2_path` argument can be left out if every worker provides its own.
+    Returns a list of the job ids."""
+    if function not in _FUNCTIONS:
+        raise Exception(f"Function must be one of {list(_FUNCTIONS)}, not {function}")
+    if isinstance(jobs, dict):
+        jobs = [jobs]
+
+    create_queue(db_path)
+    con = _connect(db_path)
+    ids = []
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        for kwargs in jobs:
+            cur = con.execute("INSERT INTO jobs (function, kwargs, max_attempts, submitted) VALUES (?, ?, ?, ?)",
+                              (function, pickle.dumps(kwargs), max_attempts, time.time()))
+            ids.append(cur.lastrowid)
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+    return ids
+
+def claim(db_path : str, worker : str):
+    """Claims the oldest pending job for `worker`, returning a tuple of the
+    job id, function name and keyword arguments (or None if there are no
+    pending jobs)"""
+    con = _connect(db_path)
+    try:
+        #lock the database for writing, so that no two workers can claim the
+        #same job
+        con.execute("BEGIN IMMEDIATE")
+        row = con.execute("SELECT id, function, kwargs FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+        if row is not None:
+            con.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                        (worker, time.time(), row[0]))
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+    if row is None:
+        return None
+
+    return row[0], row[1], pickle.loads(row[2])
+
+def heartbeat(db_path : str, job_id : int, worker : str):
+    """Records that `worker` is still running a job"""
+    con = _connect(db_path)
+    try:
+        con.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (time.time(), job_id, worker))
+    finally:
+        con.close()
+
+def complete(db_path : str, job_id : int, worker : str, result):
+    """Stores the result of a job run by `worker` and marks it as done.
+    Returns False (and discards the result) if the job is no longer running
+    on `worker`, e.g. because it was returned to the queue by requeue_stale
+    and claimed by another worker."""
+    #write the result to a temporary file, so that partially written results
+    #are never collected
+    result_path = f"{_results_dir(db_path)}/{job_id}.pkl"
+    tmp_path = f"{result_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(result, file)
+
+    con = _connect(db_path)
+    try:
+        #lock the database so that the job can't be requeued between checking
+        #that this worker still owns it and storing the result
+        con.execute("BEGIN IMMEDIATE")
+        owned = con.execute("SELECT 1 FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                            (job_id, worker)).fetchone() is not None
+        if owned:
+            os.replace(tmp_path, result_path)
+            con.execute("UPDATE jobs SET status = 'done', finished = ?, error = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                        (time.time(), job_id, worker))
+        con.execute("COMMIT")
+    finally:
+        con.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return owned
+
+def fail(db_path : str, job_id : int, worker : str, error : str):
+    """Records that a job run by `worker` failed, returning it to the queue if
+    it has any attempts remaining. Returns False (and leaves the job
+    unchanged) if the job is no longer running on `worker`."""
+    con = _connect(db_path)
+    try:
+        cur = con.execute("""UPDATE jobs SET error = ?, finished = ?,
+                             status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END
+                             WHERE id = ? AND worker = ? AND status = 'running'""",
+                          (error, time.time(), job_id, worker))
+        updated = cur.rowcount > 0
+    finally:
+        con.close()
+
+    return updated
+
+def requeue_stale(db_path : str, timeout : float):
+    """Returns running jobs which have not sent a heartbeat for `timeout`
+    seconds (e.g. because their worker was killed) to the queue, or marks them
+    as failed if they have no attempts remaining. Returns the number of jobs
+    affected."""
+    con = _connect(db_path)
+    try:
+        cur = con.execute("""UPDATE jobs SET error = 'worker stopped sending heartbeats',
+                             status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END
+                             WHERE status = 'running' AND heartbeat < ?""",
+                          (time.time() - timeout,))
+        n_stale = cur.rowcount
+    finally:
+        con.close()
+
+    return n_stale
+
+def queue_status(db_path : str):
+    """Returns a dictionary of the number of jobs with each status (pending,
+    running, done and failed)"""
+    con = _connect(db_path)
+    try:
+        counts = dict(con.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    finally:
+        con.close()
+
+    return {s : counts.get(s, 0) for s in ["pending", "running", "done", "failed"]}
+
+def collect(db_path : str, job_ids : list = [], wait : bool = True,
+            poll_interval : float = 5.0):
+    """Returns a dictionary of the results of finished jobs, by job id. If
+    `job_ids` is empty, all jobs in the queue are collected. If `wait` is
+    true, waits until every job has finished (or failed). A warning is raised
+    for any failed jobs, which are not included in the results."""
+    con = _connect(db_path)
+    try:
+        while True:
+            rows = con.execute("SELECT id, status, error FROM jobs").fetchall()
+            if job_ids:
+                rows = [x for x in rows if x[0] in job_ids]
+            finished = all([x[1] in ["done", "failed"] for x in rows])
+            if finished or (not wait):
+                break
+            time.sleep(poll_interval)
+    finally:
+        con.close()
+
+    failed = [(x[0], x[2]) for x in rows if x[1] == "failed"]
+    if failed:
+        warnings.warn(f"{len(failed)} jobs failed:\n" +
+                      "\n".join([f"job {i}: {e}" for i,e in failed]))
+
+    results = {}
+    for job_id, status, _ in rows:
+        if status == "done":
+            with open(f"{_results_dir(db_path)}/{job_id}.pkl", "rb") as file:
+                results[job_id] = pickle.load(file)
+
+    return results
+
+def _send_heartbeats(db_path : str, job_id : int, worker : str,
+                     interval : float, stop : threading.Event):
+    """Sends heartbeats for a job every `interval` seconds until `stop` is
+    set"""
+    while not stop.wait(interval):
+        heartbeat(db_path, job_id, worker)
+
+def run_worker(db_path : str, atchem2_path : str = None, worker : str = "",
+               heartbeat_interval : float = 30.0, stale_timeout : float = None,
+               poll_interval : float = 5.0, exit_when_empty : bool = True):
+    """Claims and runs jobs from the queue until it is empty (or forever, if
+    `exit_when_empty` is false). If `atchem2_path` is given, it is used for
+    every job run by this worker; as AtChem2 is built in place, each worker
+    running at the same time should use its own copy of AtChem2.
+
+    If `stale_timeout` is given, jobs of other workers which have not sent a
+    heartbeat for that many seconds are returned to the queue before each
+    claim. Returns the number of jobs run."""
+    if not worker:
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+    create_queue(db_path)
+
+    n_jobs = 0
+    while True:
+        if stale_timeout is not None:
+            requeue_stale(db_path, stale_timeout)
+
+        job = claim(db_path, worker)
+        if job is None:
+            if exit_when_empty:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        job_id, function, kwargs = job
+        if atchem2_path is not None:
+            kwargs["atchem2_path"] = atchem2_path
+
+        stop = threading.Event()
+        beats = threading.Thread(target=_send_heartbeats, daemon=True,
+                                 args=(db_path, job_id, worker,
+                                       heartbeat_interval, stop))
+        beats.start()
+        try:
+            result = _FUNCTIONS[function](**kwargs)
+        except Exception:
+            stop.set()
+            beats.join()
+            fail(db_path, job_id, worker, traceback.format_exc())
+        else:
+            stop.set()
+            beats.join()
+            complete(db_path, job_id, worker, result)
+        n_jobs += 1
+
+    return n_jobs
+
+def main(argv = None):
+    """Runs a queue worker, or prints the status of a queue, from command line
+    arguments"""
+    parser = argparse.ArgumentParser(description = """Run model jobs from a
+                                     run queue, or print the status of a
+                                     queue.""")
+    parser.add_argument("command", choices=["worker", "status"],
+                        help="'worker' to run jobs, or 'status' to print the number of jobs with each status")
+    parser.add_argument("db_path", help="Path to the queue database")
+    parser.add_argument("--atchem2_path", default=None,
+                        help="AtChem2 directory used by this worker (default: the atchem2_path of each job)")
+    parser.add_argument("--worker", default="",
+                        help="Name of the worker (default: hostname:pid)")
+    parser.add_argument("--heartbeat_interval", type=float, default=30.0,
+                        help="Seconds between heartbeats (default: 30)")
+    parser.add_argument("--stale_timeout", type=float, default=None,
+                        help="Requeue jobs without a heartbeat for this many seconds (default: never)")
+    parser.add_argument("--poll_interval", type=float, default=5.0,
+                        help="Seconds to wait between checks of an empty queue (default: 5)")
+    parser.add_argument("--keep_running", action="store_true",
+                        help="Keep waiting for new jobs when the queue is empty")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(queue_status(args.db_path))
+    else:
+        n_jobs = run_worker(args.db_path, atchem2_path = args.atchem2_path,
+                            worker = args.worker,
+                            heartbeat_interval = args.heartbeat_interval,
+                            stale_timeout = args.stale_timeout,
+                            poll_interval = args.poll_interval,
+                            exit_when_empty = not args.keep_running)
+        print(f"{n_jobs} jobs run")
+
+if __name__ == "__main__":
+    main()
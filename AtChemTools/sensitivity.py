@@ -0,0 +1,141 @@
+"""Functions for sensitivity analysis of model concentrations to the rate
+coefficients of a FACSIMILE mechanism.
+
+Mechanism variants are produced by multiplying the rate expressions of one
+reaction (one-at-a-time) or a group of reactions by a factor. The variants are
+run in parallel (see build_and_run.write_build_run_batch), with identical
+variants only run once, and the normalised sensitivity coefficients
+d ln[C] / d ln k of each target species are calculated at each output time."""
+#imports
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+from collections import namedtuple
+import numpy as np
+from .species_from_mechanism import get_reactions
+from .build_and_run import write_build_run_batch
+
+Sensitivities = namedtuple("Sensitivities", ["coefficients", "variants", "times",
+                                             "species", "base"])
+
+def _as_list(reactions):
+    """Returns a reaction number or list of reaction numbers as a list"""
+    return [reactions] if isinstance(reactions, (int, np.integer)) else list(reactions)
+
+def one_at_a_time(reactions, factor : float = 1.1):
+    """Returns a list of variants (for rate_sensitivities) which each scale a
+    single reaction in `reactions` (a list of reaction numbers) by `factor`"""
+    return [(r, factor) for r in reactions]
+
+def scaled_mechanism_text(mechanism_path : str, factors : dict):
+    """Returns the text of a FACSIMILE mechanism with the rate expressions of
+    the reactions in `factors` (a dictionary of reaction numbers, counted from
+    1 in the order reactions are defined, and multiplication factors)
+    multiplied by their factors. Everything else in the mechanism is
+    unchanged."""
+    n_reactions = len(get_reactions(mechanism_path))
+    unknown = [r for r in factors if not (1 <= r <= n_reactions)]
+    if unknown:
+        raise Exception(f"Reaction numbers not in the mechanism (1 to {n_reactions}): {unknown}")
+
+    with open(mechanism_path) as file:
+        mech_txt = file.read()
+
+    head, sep, tail = mech_txt.partition("Reaction definitions")
+
+    rxn_pattern = re.compile("%(.*):(.*=.*;)")
+    out_lines = []
+    rxn_num = 0
+    for line in tail.split("\n"):
+        match = rxn_pattern.match(line)
+        if match:
+            rxn_num += 1
+            if rxn_num in factors:
+                #use a double precision constant so the factor isn't rounded
+                factor = f"{factors[rxn_num]:.15E}".replace("E", "D")
+                line = f"% ({match[1].strip()})*{factor} :{match[2]}{line[match.end():]}"
+        out_lines.append(line)
+
+    return head + sep + "\n".join(out_lines)
+
+def rate_sensitivities(atchem2_paths : list, mech_path : str, variants : list,
+                       targets : list, run_kwargs : dict, central : bool = False,
+                       variant_dir : str = ""):
+    """Calculates the normalised sensitivity coefficients (d ln[C] / d ln k) of
+    the concentrations of `targets` to scaling the rate coefficients of the
+    reactions in `variants`.
+
+    `variants` is a list of (reactions, factor) tuples, where reactions is a
+    reaction number or a list of reaction numbers which are scaled together
+    (e.g. from one_at_a_time). `run_kwargs` are the keyword arguments passed
+    to write_build_run for every run (except `atchem2_path`, `mech_path`,
+    `spec_output` and `rate_output`). Runs are made in parallel, one at a time
+    in each AtChem2 directory in `atchem2_paths`, and variants with the same
+    mechanism are only run once.
+
+    If `central` is true, each variant is also run with its rate coefficients
+    divided by its factor, and central differences are used. Mechanism
+    variants are written to `variant_dir` (a temporary directory by default).
+
+    Returns a Sensitivities tuple of the coefficients (an array of shape
+    variants x times x species), the variants, the output times, the target
+    species and the concentrations of the unscaled run."""
+    variants = [(_as_list(r), f) for r, f in variants]
+    for reactions, factor in variants:
+        if (factor <= 0) or (factor == 1):
+            raise Exception(f"Factors must be positive and not equal to 1, not {factor} (reactions {reactions})")
+
+    remove_dir = not variant_dir
+    if remove_dir:
+        variant_dir = tempfile.mkdtemp()
+    os.makedirs(variant_dir, exist_ok=True)
+
+    #the scaled mechanisms needed (the unscaled run is always needed)
+    runs = [{}]
+    for reactions, factor in variants:
+        runs.append({r : factor for r in reactions})
+        if central:
+            runs.append({r : 1/factor for r in reactions})
+
+    #write each unique mechanism once, named by the hash of its content
+    run_paths = []
+    for factors in runs:
+        mech_txt = scaled_mechanism_text(mech_path, factors)
+        digest = hashlib.sha256(mech_txt.encode()).hexdigest()[:16]
+        path = f"{variant_dir}{os.sep}{digest}.fac"
+        if not os.path.isfile(path):
+            with open(path, "w") as file:
+                file.write(mech_txt)
+        run_paths.append(path)
+
+    unique_paths = list(dict.fromkeys(run_paths))
+    jobs = [{**run_kwargs, "mech_path" : path, "spec_output" : targets,
+             "rate_output" : []} for path in unique_paths]
+    try:
+        outputs = write_build_run_batch(atchem2_paths, jobs)
+    finally:
+        if remove_dir:
+            shutil.rmtree(variant_dir)
+
+    base = outputs[0][0][targets]
+    concs = {path : out[0][targets].reindex(base.index).to_numpy(dtype=float)
+             for path, out in zip(unique_paths, outputs)}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_concs = [np.log(np.where(concs[p] > 0, concs[p], np.nan)) for p in run_paths]
+        log_base = log_concs[0]
+
+        coefficients = np.empty((len(variants), len(base.index), len(targets)))
+        i = 1
+        for j, (_, factor) in enumerate(variants):
+            if central:
+                coefficients[j] = (log_concs[i] - log_concs[i+1])/(2*np.log(factor))
+                i += 2
+            else:
+                coefficients[j] = (log_concs[i] - log_base)/np.log(factor)
+                i += 1
+
+    return Sensitivities(coefficients, variants, base.index.to_numpy(),
+                         list(targets), base)
@@ -36,6 +36,79 @@ def get_species_from_lines(mechanism_path):
     
     return comps
 
+def get_reactions(mechanism_path):
+    """Returns a list of (rate expression, reactants, products) tuples for each 
+    reaction in a FACSIMILE format mechanism, in the order they are defined. 
+    Reactants and products are lists of species names, with species repeated 
+    for integer stoichiometric coefficients of reactants (e.g. "2 NO2")."""
+    lines = get_reaction_lines(mechanism_path)
+    
+    rxn_pattern = re.compile("%(.*):(.*)=(.*);")
+    
+    #pattern to match a species with or without a stoichiometric coefficient
+    spec_pattern = re.compile(r"^ *(\d*\.?\d*) *([a-zA-Z_].*) *$")
+    
+    reactions = []
+    for l in lines:
+        match = rxn_pattern.match(l)
+        
+        reacts = []
+        for x in match[2].split("+"):
+            if x.strip():
+                spec_match = spec_pattern.match(x)
+                coeff = float(spec_match[1]) if spec_match[1] else 1
+                if coeff != int(coeff):
+                    raise Exception(f"Non-integer reactant coefficient in reaction: {l}")
+                reacts += [spec_match[2].strip()]*int(coeff)
+        prods = [spec_pattern.match(x)[2].strip() for x in match[3].split("+") 
+                 if x.strip()]
+        
+        reactions.append((match[1].strip(), reacts, prods))
+    
+    return reactions
+
+def get_generic_rate_coefficients(mechanism_path):
+    """Returns a dictionary of the generic (and complex) rate coefficients 
+    defined before the reactions of a FACSIMILE format mechanism (e.g. 
+    KRO2NO), mapping names to their (unevaluated) expressions in the order 
+    they are defined. The RO2 sum is not included."""
+    with open(mechanism_path) as file:
+        mech_txt = file.read()
+    
+    #statements are terminated by ";" and may span several lines
+    statements = mech_txt.split("Reaction definitions")[0].split(";")
+    
+    def_pattern = re.compile(r"^\s*([A-Za-z_]\w*)\s*=(.*)$", re.DOTALL)
+    
+    coeffs = {}
+    for statement in statements:
+        statement = statement.strip()
+        if (not statement) or statement.startswith("*"): #skip comments
+            continue
+        match = def_pattern.match(statement)
+        if match and (match[1] != "RO2"):
+            coeffs[match[1]] = " ".join(match[2].split())
+    
+    return coeffs
+
+def get_ro2_species(mechanism_path):
+    """Returns the species included in the RO2 sum of a FACSIMILE format 
+    mechanism (an empty list if the mechanism has no RO2 sum)"""
+    with open(mechanism_path) as file:
+        mech_txt = file.read()
+    
+    #statements are terminated by ";" and may span several lines
+    statements = mech_txt.split("Reaction definitions")[0].split(";")
+    
+    ro2_pattern = re.compile(r"^\s*RO2\s*=(.*)$", re.DOTALL)
+    
+    for statement in statements:
+        match = ro2_pattern.match(statement)
+        if match:
+            return [x.strip() for x in match[1].split("+") if x.strip()]
+    
+    return []
+
 def return_inorganic_species(mechanism_path, 
                              speclist=["N2O5", "H2O2", "NO", "H2", "NA", "HONO", 
                                        "OH", "SO2", "O", "HNO3", "SO3", "O1D", 
@@ -1,5 +1,7 @@
 import re
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 def is_number(s):
     """Tests whether the provided argument is a number"""
@@ -11,8 +13,26 @@ def is_number(s):
 
 def convert_time_to_seconds(time):
     """Converts a time string provided in the format HH:MM:SS to seconds since 
-    midnight"""
-    if is_number(time):
+    midnight. Also accepts lists, arrays, series or indexes of times (each 
+    numeric or HH:MM:SS), which are converted at once to an array of seconds
+    (of integers if every time is a whole number of seconds, otherwise of 
+    floats)."""
+    if isinstance(time, (list, tuple, np.ndarray, pd.Series, pd.Index)):
+        times = pd.Series(np.asarray(time, dtype=object))
+        numeric = pd.to_numeric(times, errors="coerce")
+        
+        strings = times[numeric.isna()].astype(str)
+        valid = strings.str.fullmatch(r"\d\d:\d\d:\d\d")
+        if not valid.all():
+            raise Exception(f"""Time must be numeric or in the form HH:MM:SS, provided
+                        times included {strings[~valid].iloc[0]}.""")
+        numeric[strings.index] = pd.to_timedelta(strings).dt.total_seconds()
+        
+        seconds = numeric.to_numpy(dtype=float)
+        if np.all(seconds == np.round(seconds)):
+            return seconds.astype(int)
+        return seconds
+    elif is_number(time):
         out_time = int(time)
     elif re.match("^\d\d:\d\d:\d\d$",time):
         start_dt = datetime.strptime(time,"%H:%M:%S")
@@ -25,10 +45,13 @@ def convert_time_to_seconds(time):
 
 def round_to_tstep(time, start_time, time_step):
     """Rounds a given time (in seconds) to the nearest whole time step for a 
-    given start time and step length"""
+    given start time and step length. Also accepts arrays of times."""
     t_diff = time - start_time
     
-    rounded_diff = time_step * round(t_diff/time_step)
+    if np.ndim(t_diff) > 0:
+        rounded_diff = time_step * np.round(np.asarray(t_diff)/time_step)
+    else:
+        rounded_diff = time_step * round(t_diff/time_step)
     
     return start_time+rounded_diff
 
@@ -1,16 +1,9 @@
 """Script to plot stacked plot of production and loss rates of species from
 AtChem2 output files"""
 #imports
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib import colormaps
-from AtChemTools.read_output import rate_df
+from AtChemTools.ropa import ropa_report
 from AtChemTools.utilities import string_to_bool
 import sys
-import os
-import numpy as np
-from datetime import date
-import pandas as pd
 
 #read in arguments from command line
 args=sys.argv
@@ -64,146 +57,10 @@ if len(args) > 6: #if there are more than 5 arguments then process the kwargs
             kwarg_dict[kw] = arg
             
 ###############################################################################
-#read in loss and production rate files
-l_rates = rate_df(f"{out_path}{os.sep}lossRates.output", species = species,
-                  drop_0 = kwarg_dict["drop_0"], drop_net_0 = kwarg_dict["drop_net_0"], 
-                  drop_rev = kwarg_dict["drop_rev"], 
-                  error_for_non_species = False)
-p_rates = rate_df(f"{out_path}{os.sep}productionRates.output", species = species,
-                  drop_0 = kwarg_dict["drop_0"], drop_net_0 = kwarg_dict["drop_net_0"], 
-                  drop_rev = kwarg_dict["drop_rev"], 
-                  error_for_non_species = False)
-
-
-#trim data down based on start and end times provided
-#get the index corresponding to the start and end times provided
-p_time_list = p_rates.groupby(level=0).first().index
-l_time_list = l_rates.groupby(level=0).first().index
-if not p_time_list.empty: #sometimes the time lists will be empty (i.e. if the df is empty)
-    if start == "START":
-        p_start_num = p_time_list[0]
-    else:
-        p_start_num = start
-    
-    if end == "END":
-        p_end_num = p_time_list[-1]
-    else:
-        p_end_num = end
-    
-    p_rates = p_rates.sort_index(level=0).loc[p_start_num:p_end_num,:,:,:]
-    
-if not l_time_list.empty: #sometimes the time lists will be empty (i.e. if the df is empty)
-    if start == "START":
-        l_start_num = l_time_list[0]
-    else:
-        l_start_num = start
-    
-    if end == "END":
-        l_end_num = l_time_list[-1]
-    else:
-        l_end_num = end
-
-    l_rates = l_rates.sort_index(level=0).loc[l_start_num:l_end_num,:,:,:]
-
-
-#split the data into separate dataframes for each species for further processing
-spec_l_dfs = {}
-for s in l_rates.index.get_level_values(1).unique():
-    spec_l_dfs[s] = l_rates.loc[:,s,:,:]
-spec_p_dfs = {}
-for s in p_rates.index.get_level_values(1).unique():
-    spec_p_dfs[s] = p_rates.loc[:,s,:,:]
-
-#sort dataframe to get the top n reactions for each species, lumping the rest 
-#together into "other"
-def top_specs(df_dict):
-    for s in df_dict.keys():
-        #get df of the average rate of each reaction over the whole model
-        avg_series = df_dict[s].groupby(level=1)["rate"].median().sort_values(ascending=False)
-        #extract top n reactions for this species and then all of the other reactions
-        topn_nos = avg_series.iloc[:top_n].index
-        other_nos = avg_series.iloc[top_n:].index
-        
-        #get the dataframe subsets for the top n compounds and a separate subset of
-        #the other compounds
-        topn_df = df_dict[s].loc[:,topn_nos,:].sort_index(level=0)
-        other_df = df_dict[s].loc[:,other_nos,:].sort_index(level=0)
-        
-        #add the rates of all of the other subsets at each timestep
-        other_df = other_df.groupby(level=0).sum()
-        #give the other rates df a dummy reaction number and reaction name to 
-        #allow for appending (np.inf used so that "other" will be set as the final reaction)
-        other_df = other_df.assign(reactionNumber = np.inf, 
-                                   reaction = "Other").set_index('reactionNumber', 
-                                                                 append=True)
-        
-        df_dict[s] = pd.concat([topn_df,other_df]).sort_index(level=0)
-
-top_specs(spec_l_dfs)
-top_specs(spec_p_dfs)
-
-#calculate the production and loss rates as a percentage of the total loss
-#for the percentage plots and add the percentage data to the relavent dataframe
-for s, df in spec_l_dfs.items():
-    df["%rate"] = df["rate"].divide(df.groupby(level=0).sum()["rate"])*100
-for s, df in spec_p_dfs.items():
-    df["%rate"] = df["rate"].divide(df.groupby(level=0).sum()["rate"])*100
-
-###############################################################################       
-#Plotting
-pp=PdfPages("temp_rates_plot.pdf")
-cols=colormaps.get_cmap("tab20")
-
-
-#create title page for pdf output
-confirstPage = plt.Figure()
-plottxt=f"""Production rates of : {", ".join(spec_p_dfs.keys())}
-Loss rates of : {", ".join(spec_l_dfs.keys())}
-
-Reversible Reactions Removed : {kwarg_dict['drop_rev']}
-Zero-rate Reactions Removed: {kwarg_dict['drop_0']}
-Net-zero Reactions Removed: {kwarg_dict['drop_net_0']}
-
-{kwarg_dict['title_page_text']}
-
-Plotted on {date.today()}"""
-confirstPage.text(0.5,0.5,plottxt, size=10, ha="center", wrap=True)
-pp.savefig(confirstPage)
-
-#function for plotting rates
-def rate_plot(df_dict, fig, col_name, title_end, rate_units):
-    n_species = len(df_dict.keys())
-    for i,(s,df) in enumerate(df_dict.items()):
-        times = df.index.get_level_values(0).unique()
-        labels = df.loc[times[0],"reaction"]
-     
-        #plot actual plot
-        ax=fig.add_subplot(n_species,1,i+1)
-        ax.stackplot(times, df[col_name].unstack().values.transpose(),
-                     labels = labels,
-                     colors = cols([i for i in range(len(labels))]))
-
-        
-        ax.set_ylabel(f"Rate ({rate_units})")
-        ax.set_xlabel("Time (s)")
-        ax.set_title(f"{s} {title_end}")
-        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-    
-    fig.suptitle(f"{title_end} Reactions")
-    pp.savefig(fig,bbox_inches="tight")
-
-if len(spec_l_dfs.keys()) > 0:
-    lfig=plt.Figure(figsize=(10,5*len(spec_l_dfs.keys())))
-    perc_lfig=plt.Figure(figsize=(10,5*len(spec_l_dfs.keys())))
-    
-    rate_plot(spec_l_dfs, lfig, "rate", "Loss", "molecule $cm^{-3}\ s^{-1}$")
-    rate_plot(spec_l_dfs, perc_lfig, "%rate", "% Loss", "%")
-
-if len(spec_p_dfs.keys()) > 0:
-    pfig=plt.Figure(figsize=(10,5*len(spec_p_dfs.keys())))
-    perc_pfig=plt.Figure(figsize=(10,5*len(spec_p_dfs.keys())))
-    
-    rate_plot(spec_p_dfs, pfig, "rate", "Production", "molecule $cm^{-3}\ s^{-1}$")
-    rate_plot(spec_p_dfs, perc_pfig, "%rate", "% Production", "%")
-
-pp.close()
+#produce the report (see AtChemTools.ropa for the functions used, and for a
+#command line interface which can process many output directories in parallel)
+ropa_report(out_path, species, top_n, start = start, end = end, 
+            out_file = "temp_rates_plot.pdf", 
+            title_page_text = kwarg_dict["title_page_text"],
+            drop_rev = kwarg_dict["drop_rev"], drop_0 = kwarg_dict["drop_0"], 
+            drop_net_0 = kwarg_dict["drop_net_0"])
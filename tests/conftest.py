@@ -0,0 +1,26 @@
+import os
+import shutil
+import pytest
+
+FAKE_ATCHEM2 = os.path.join(os.path.dirname(__file__), "fake_atchem2")
+
+def make_atchem2(path):
+    """Creates a copy of the stand-in AtChem2 directory at `path`"""
+    shutil.copytree(FAKE_ATCHEM2, path)
+    for sub in ["configuration", "output", "constraints/environment",
+                "constraints/photolysis", "constraints/species"]:
+        os.makedirs(f"{path}/model/{sub}", exist_ok=True)
+    os.chmod(f"{path}/atchem2", 0o755)
+    os.chmod(f"{path}/build/build_atchem2.sh", 0o755)
+    return str(path)
+
+@pytest.fixture
+def atchem2_path(tmp_path):
+    """A copy of the stand-in AtChem2 directory"""
+    return make_atchem2(tmp_path / "atchem2")
+
+@pytest.fixture
+def atchem2_paths(tmp_path):
+    """Two separate copies of the stand-in AtChem2 directory, for parallel
+    runs"""
+    return [make_atchem2(tmp_path / f"atchem2_{i}") for i in range(2)]
@@ -0,0 +1,4 @@
+#!/bin/bash
+#stand-in for the AtChem2 build script, recording the mechanism built
+echo "$1" > "$(dirname $0)/../last_build.txt"
+echo "$1" >> "$(dirname $0)/../builds.log"
@@ -0,0 +1,26 @@
+"""Helpers to write small synthetic AtChem2 output files for the tests"""
+import numpy as np
+import pandas as pd
+
+def write_concentrations(file_path, df):
+    """Writes a dataframe (indexed by model time) in the format of
+    speciesConcentrations.output (and the other time-indexed outputs)"""
+    with open(file_path, "w") as file:
+        file.write("t " + " ".join(df.columns) + "\n")
+        for t, row in zip(df.index, df.to_numpy(dtype=float)):
+            file.write(f"{t:.6e} " + " ".join(f"{x:.6e}" for x in row) + "\n")
+
+def write_rates(file_path, rows):
+    """Writes (time, species, reaction number, rate, reaction) rows in the
+    format of lossRates.output and productionRates.output"""
+    with open(file_path, "w") as file:
+        file.write("time speciesNumber speciesName reactionNumber rate reaction\n")
+        for t, species, rxn_num, rate, reaction in rows:
+            file.write(f"{t:.0f} 1 {species} {rxn_num} {rate:.6e} {reaction}\n")
+
+def concentrations(times, species, seed=0):
+    """Returns a dataframe of random (positive) concentrations"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.lognormal(25, 1, (len(times), len(species))),
+                        index = pd.Index(np.asarray(times, dtype=float), name="t"),
+                        columns = species)
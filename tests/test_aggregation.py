@@ -0,0 +1,105 @@
+import os
+import gzip
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import aggregation
+from AtChemTools.read_output import read_header
+from synthetic import concentrations, write_concentrations, write_rates
+
+SPECIES = ["O3", "NO", "NO2"]
+#two and a half days of output, every 30 minutes
+TIMES = np.arange(0, 2.5*86400, 1800)
+
+def _expected(df, statistic, by):
+    days = (df.index // 86400).astype(int)
+    hours = ((df.index % 86400) // 3600 * 3600).astype(int)
+    key = hours if by == "time_of_day" else days
+    out = df.groupby(key.to_numpy()).agg(statistic)
+    out.index.name = by
+    return out
+
+@pytest.mark.parametrize("statistic", ["count", "sum", "mean", "std", "min", "max"])
+def test_diurnal_profile(statistic):
+    conc = concentrations(TIMES, SPECIES)
+    conc.iloc[3, 1] = np.nan
+    expected = _expected(conc, statistic, "time_of_day")
+    profile = aggregation.diurnal_profile(conc, statistic)
+    assert list(profile.index) == list(range(0, 86400, 3600))
+    assert np.allclose(profile.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+def test_daily_stats():
+    conc = concentrations(TIMES, SPECIES)
+    stats = aggregation.daily_stats(conc, ["mean", "max"])
+    assert list(stats.index) == [0, 1, 2]
+    assert np.allclose(stats[("NO", "mean")], _expected(conc, "mean", "day")["NO"])
+    assert np.allclose(stats[("O3", "max")], _expected(conc, "max", "day")["O3"])
+
+def test_binned_array():
+    conc = concentrations(TIMES, SPECIES)
+    binned, days = aggregation.binned_array(conc, "count", bin_size=21600)
+    assert list(days) == [0, 1, 2]
+    assert binned.shape == (3, 4, 3)
+    #the last day is half a day of output
+    assert list(binned[2, :, 0]) == [12, 12, 0, 0]
+    with pytest.raises(Exception, match="bin size"):
+        aggregation.time_bins([0], 7000)
+
+def test_accumulator_in_chunks():
+    conc = concentrations(TIMES, SPECIES)
+    acc = aggregation.DiurnalAccumulator()
+    #chunks out of order, with a column which only appears later
+    acc.add(conc.iloc[60:, :2])
+    acc.add(conc.iloc[:60, :2])
+    acc.add(conc.iloc[:, 2:])
+    pd.testing.assert_frame_equal(acc.diurnal_profile("mean"),
+                                  aggregation.diurnal_profile(conc, "mean"))
+
+def test_accumulate_concentrations_file(tmp_path):
+    conc = concentrations(TIMES, SPECIES)
+    file_path = f"{tmp_path}/speciesConcentrations.output"
+    write_concentrations(file_path, conc)
+    assert read_header(file_path) == ["t"] + SPECIES
+
+    acc = aggregation.accumulate_file(file_path, species=["NO"], chunksize=7)
+    assert list(acc.columns) == ["NO"]
+    assert np.allclose(acc.diurnal_profile("mean")["NO"],
+                       _expected(conc, "mean", "time_of_day")["NO"], rtol=1e-6)
+
+    #compressed output is read from the original path
+    with open(file_path, "rb") as file, gzip.open(file_path + ".gz", "wb") as out_file:
+        shutil.copyfileobj(file, out_file)
+    os.remove(file_path)
+    assert read_header(file_path) == ["t"] + SPECIES
+    acc_gz = aggregation.accumulate_file(file_path, species=["NO"], chunksize=7)
+    pd.testing.assert_frame_equal(acc_gz.diurnal_profile("mean"),
+                                  acc.diurnal_profile("mean"))
+
+@pytest.mark.parametrize("chunksize", [2, 5, 6, 1000])
+def test_accumulate_rates_file(tmp_path, chunksize):
+    #six rows at each time (two reactions for each of three species), so
+    #small chunks hold only rows of a single time
+    rng = np.random.default_rng(0)
+    rows = []
+    for t in TIMES:
+        for species in SPECIES:
+            for rxn in [1, 2]:
+                rows.append((t, species, rxn, rng.uniform(1, 10), f"{species}+OH=X"))
+    file_path = f"{tmp_path}/lossRates.output"
+    write_rates(file_path, rows)
+
+    df = pd.DataFrame(rows, columns=["time", "speciesName", "rxn", "rate", "reaction"])
+    totals = df.pivot_table(index="time", columns="speciesName", values="rate",
+                            aggfunc="sum")[SPECIES]
+    expected = _expected(totals, "sum", "day")
+
+    acc = aggregation.accumulate_file(file_path, chunksize=chunksize)
+    assert acc.counts.sum() == len(TIMES)*3
+    daily = acc.daily_stats("sum")
+    for species in SPECIES:
+        assert np.allclose(daily[(species, "sum")], expected[species], rtol=1e-6)
+
+    acc = aggregation.accumulate_file(file_path, species="NO2", chunksize=chunksize)
+    assert list(acc.columns) == ["NO2"]
+    assert acc.counts.sum() == len(TIMES)
@@ -0,0 +1,93 @@
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import archive, read_output
+from AtChemTools.build_and_run import write_build_run, run_model
+from synthetic import concentrations, write_concentrations, write_rates
+
+SPECIES = ["O3", "NO", "NO2"]
+
+def _model_dir(path):
+    """Writes a small model directory, with a constraint file linked from a
+    constraint store"""
+    for sub in ["configuration", "output", "constraints/species", "store"]:
+        os.makedirs(f"{path}/{sub}")
+    with open(f"{path}/configuration/outputSpecies.config", "w") as file:
+        file.write("\n".join(SPECIES) + "\n")
+    with open(f"{path}/store/O3", "w") as file:
+        file.write("0 1e12\n")
+    os.symlink(f"{path}/store/O3", f"{path}/constraints/species/O3")
+
+    conc = concentrations(range(0, 3601, 300), SPECIES)
+    write_concentrations(f"{path}/output/speciesConcentrations.output", conc)
+    write_rates(f"{path}/output/lossRates.output",
+                [(t, "O3", 1, 1e5, "O3+NO=NO2") for t in range(0, 3601, 300)])
+    return conc
+
+@pytest.mark.parametrize("method", ["gzip", "xz"])
+def test_archive_output_only(tmp_path, method):
+    model_path = f"{tmp_path}/model"
+    conc = _model_dir(model_path)
+    with open(f"{model_path}/output/speciesConcentrations.output", "rb") as file:
+        original = file.read()
+
+    manifest = archive.archive_output(model_path, method=method)
+    ext = ".gz" if method == "gzip" else ".xz"
+    assert sorted(x["path"] for x in manifest["files"]) == ["output/lossRates.output",
+                                                           "output/speciesConcentrations.output"]
+    assert sorted(os.listdir(f"{model_path}/output")) == [f"lossRates.output{ext}",
+                                                          f"speciesConcentrations.output{ext}"]
+    #the configuration and constraints are unchanged
+    assert os.listdir(f"{model_path}/configuration") == ["outputSpecies.config"]
+    assert os.path.islink(f"{model_path}/constraints/species/O3")
+    assert os.listdir(f"{model_path}/store") == ["O3"]
+    assert manifest["size"] == sum(x["size"] for x in manifest["files"])
+    assert manifest["archived_size"] < manifest["size"]
+    assert archive.read_manifest(model_path) == manifest
+
+    #the archived output is read from the original paths
+    read = read_output.species_concentrations_df(f"{model_path}/output/speciesConcentrations.output")
+    assert np.allclose(read.to_numpy(), conc.to_numpy(), rtol=1e-6)
+    rates = read_output.rate_df(f"{model_path}/output/lossRates.output")
+    assert len(rates) == 13
+    assert np.allclose(read_output.restart_concentrations(f"{model_path}/output/speciesConcentrations.output"),
+                       conc.iloc[-1], rtol=1e-6)
+
+    with pytest.raises(Exception, match="already been archived"):
+        archive.archive_output(model_path)
+
+    archive.extract_archive(model_path)
+    assert not os.path.exists(f"{model_path}/{archive.MANIFEST_NAME}")
+    with open(f"{model_path}/output/speciesConcentrations.output", "rb") as file:
+        assert file.read() == original
+
+def test_extract_checks_checksums(tmp_path):
+    model_path = f"{tmp_path}/model"
+    _model_dir(model_path)
+    archive.archive_output(model_path)
+    manifest = archive.read_manifest(model_path)
+    manifest["files"][0]["sha256"] = "0"*64
+    with open(f"{model_path}/{archive.MANIFEST_NAME}", "w") as file:
+        json.dump(manifest, file)
+    with pytest.raises(Exception, match="Checksum"):
+        archive.extract_archive(model_path)
+
+def test_unknown_method(tmp_path):
+    with pytest.raises(Exception, match="method"):
+        archive.archive_output(str(tmp_path), method="zip")
+
+def test_kept_run_can_be_rerun(tmp_path, atchem2_path):
+    write_build_run(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6, 2020, 0, 1200,
+                    51, 0, 300, initial_concs=pd.Series({"O3" : 1e12}),
+                    spec_output=["O3"], keep_rundirs=True, archive="gzip")
+    [model_path] = glob.glob(f"{atchem2_path}/model_*")
+    assert os.path.isfile(f"{model_path}/configuration/model.parameters")
+    assert glob.glob(f"{model_path}/output/*.gz")
+
+    #the archived outputs are replaced by re-running the model
+    run_model(atchem2_path, model_path)
+    conc = read_output.species_concentrations_df(f"{model_path}/output/speciesConcentrations.output")
+    assert conc["O3"].iloc[0] == pytest.approx(1e12, rel=1e-5)
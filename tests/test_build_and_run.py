@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools.build_and_run import write_build_run, spin_up, _output_steps
+
+def _run(atchem2_path, **kwargs):
+    return write_build_run(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6, 2020,
+                           0, 3600, 51, 0, 300,
+                           initial_concs = pd.Series({"O3" : 1e12, "NO" : 1e11}),
+                           spec_output = ["O3", "NO"], rate_output = ["O3"],
+                           **kwargs)
+
+def _jacobian_times(jacobian_path):
+    #there is a row of the jacobian for each species at each time
+    with open(f"{jacobian_path}/jacobian.output") as file:
+        times = [float(line.split()[0]) for line in file if line.strip()]
+    return list(dict.fromkeys(times))
+
+@pytest.mark.parametrize("name", ["rates_output_step", "reaction_rates_output_step"])
+@pytest.mark.parametrize("value", [0, -300])
+def test_output_steps_must_be_positive(name, value):
+    with pytest.raises(Exception, match=name):
+        _output_steps(300, **{name : value})
+
+def test_output_steps_must_be_multiples():
+    with pytest.raises(Exception, match="multiple"):
+        _output_steps(300, rates_output_step=450)
+    with pytest.raises(Exception, match="jacobian_output_step"):
+        _output_steps(300, jacobian_output_step=-300)
+    assert _output_steps(300, jacobian_output_step=0) == (300, 300, 0)
+
+def test_injection_outputs_on_grid(tmp_path, atchem2_path):
+    injections = pd.DataFrame({"O3" : [5e12]}, index=[1500])
+    output = _run(atchem2_path, injection_df=injections, jacobian_path=str(tmp_path),
+                  rates_output_step=600, jacobian_output_step=600)
+
+    assert _jacobian_times(tmp_path) == list(range(0, 3601, 600))
+    assert set(output[2]["time"]) == set(range(0, 3601, 600))
+
+def test_nox_outputs_keep_cadence(tmp_path, atchem2_path):
+    nox = pd.Series([1e11, 2e11], index=[0, 3600])
+    _run(atchem2_path, nox_series=nox, jacobian_path=str(tmp_path),
+         jacobian_output_step=900)
+    assert _jacobian_times(tmp_path) == list(range(0, 3601, 900))
+
+def test_nox_uses_default_family(tmp_path, atchem2_path):
+    nox = pd.Series([1e11, 2e11], index=[0, 3600])
+    output = _run(atchem2_path, nox_series=nox, 
+                  families={"Ox" : ["O3", "NO2"]})
+    assert len(output[0]) == 13
+
+def test_nox_family_not_in_mechanism(tmp_path, atchem2_path):
+    nox = pd.Series([1e11, 2e11], index=[0, 3600])
+    with pytest.raises(Exception, match="NOx"):
+        _run(atchem2_path, nox_series=nox, families={"NOx" : ["XNO"]})
+
+def test_spin_up_converges(atchem2_path):
+    final, output, days = spin_up(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6,
+                                  2020, 0, 51, 0, 3600, ["O3", "NO"],
+                                  initial_concs = pd.Series({"O3" : 1e13}))
+    assert 1 < days < 10
+    assert list(output.index) == list(range(0, 86401, 3600))
+    #the final day starts from the end of the previous day
+    assert output["O3"].iloc[0] == pytest.approx(output["O3"].iloc[-1], rel=0.01)
+    pd.testing.assert_series_equal(final, output.iloc[-1])
+
+@pytest.mark.parametrize("max_days", [0, -1])
+def test_spin_up_needs_a_day(atchem2_path, max_days):
+    with pytest.raises(Exception, match="max_days"):
+        spin_up(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6, 2020, 0, 51, 0,
+                3600, ["O3", "NO"], max_days=max_days)
+    #nothing is copied or built
+    assert [x for x in os.listdir(atchem2_path) if x.startswith("model_")] == []
+    assert not os.path.exists(f"{atchem2_path}/last_build.txt")
+
+def test_spin_up_one_day(atchem2_path):
+    #one day can't be compared with a previous day
+    with pytest.warns(UserWarning, match="converge"):
+        final, output, days = spin_up(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6,
+                                      2020, 0, 51, 0, 3600, ["O3", "NO"], max_days=1,
+                                      initial_concs = pd.Series({"O3" : 1e13}))
+    assert days == 1
+    pd.testing.assert_series_equal(final, output.iloc[-1])
@@ -0,0 +1,77 @@
+import warnings
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import calibration
+
+def _fake_o3(t, init):
+    """O3 in the stand-in model (see fake_atchem2/atchem2), starting at `init`"""
+    decay = math.exp(-t/20000.)
+    steady = 1e10*(1.5 + math.sin(2*math.pi*t/86400))*1.2
+    return init*decay + steady*(1 - decay)
+
+def test_apply_params():
+    kwargs = {"env_vals" : pd.Series({"TEMP" : "298", "DILUTE" : "NOTUSED"}),
+              "env_constrain" : pd.DataFrame({"JFAC" : [1.0, 0.5]}, index=[0, 600]),
+              "t_start" : 0}
+    out = calibration.apply_params(kwargs, {"env_vals:DILUTE" : 1e-5,
+                                            "env_constrain:JFAC" : 0.8,
+                                            "spec_constant:CH4" : 4.5e13})
+    assert out["env_vals"]["DILUTE"] == 1e-5
+    assert list(out["env_constrain"]["JFAC"]) == [0.8, 0.4]
+    assert out["spec_constant"]["CH4"] == 4.5e13
+    #the original arguments are unchanged
+    assert kwargs["env_vals"]["DILUTE"] == "NOTUSED"
+    assert list(kwargs["env_constrain"]["JFAC"]) == [1.0, 0.5]
+
+    with pytest.raises(Exception, match="<argument>:<key>"):
+        calibration.apply_params(kwargs, {"DILUTE" : 1})
+    with pytest.raises(Exception, match="Column"):
+        calibration.apply_params(kwargs, {"env_constrain:TEMP" : 1})
+    with pytest.raises(TypeError):
+        calibration.apply_params(kwargs, {"t_start:x" : 1})
+
+def test_calibration_objective():
+    times = pd.Index([0.0, 300.0, 600.0])
+    meas = pd.DataFrame({"O3" : [1.0, 2.0, np.nan], "NO" : [1.0, 1.0, 1.0]},
+                        index=times)
+    model = pd.DataFrame({"O3" : [1.0, 4.0, 9.0], "NO" : [1.0, 1.0, 1.0],
+                          "NO2" : [5.0, 5.0, 5.0]}, index=times)
+    assert calibration.calibration_objective(model, meas) == pytest.approx(2/2.5)
+    assert calibration.calibration_objective(model, meas, {"O3" : 0.5}) == pytest.approx(1/2.5)
+    #species which aren't modelled can't be matched
+    assert calibration.calibration_objective(model[["NO"]], meas) == np.inf
+
+def test_calibration_objective_no_warnings():
+    times = pd.Index([0.0, 300.0])
+    meas = pd.DataFrame({"O3" : [np.nan, np.nan], "NO" : [1.0, 1.0]}, index=times)
+    model = pd.DataFrame({"NO" : [2.0, 2.0]}, index=times)
+    #empty means (of species without measurements or model output) are silent
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert calibration.calibration_objective(model, meas) == np.inf
+        assert calibration.calibration_objective(model, meas[["NO"]]) == pytest.approx(1.0)
+
+def test_calibrate_recovers_parameter(atchem2_paths):
+    true_o3 = 3.2e12
+    times = np.arange(0, 7201, 600)
+    meas = pd.DataFrame({"O3" : [_fake_o3(t, true_o3) for t in times]}, index=times)
+    run_kwargs = {"mech_path" : f"{atchem2_paths[0]}/mech.fac", "day" : 1,
+                  "month" : 6, "year" : 2020, "t_start" : 0, "t_end" : 7200,
+                  "lat" : 51, "lon" : 0, "step_size" : 600,
+                  "initial_concs" : pd.Series({"O3" : 1e12, "NO" : 1e11})}
+
+    result = calibration.calibrate(atchem2_paths, run_kwargs,
+                                   {"initial_concs:O3" : (1e12, 5e12)}, meas,
+                                   initial={"initial_concs:O3" : 1.5e12},
+                                   tol=0.001)
+    assert result.params["initial_concs:O3"] == pytest.approx(true_o3, rel=0.01)
+    assert result.objective == result.history["objective"].min()
+    #points are only evaluated once
+    assert not result.history["initial_concs:O3"].duplicated().any()
+
+def test_calibrate_bounds(atchem2_paths):
+    with pytest.raises(Exception, match="upper bound"):
+        calibration.calibrate(atchem2_paths, {}, {"initial_concs:O3" : (2, 1)},
+                              pd.DataFrame())
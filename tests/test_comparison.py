@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import comparison, result_store
+from synthetic import concentrations
+
+SPECIES = ["O3", "NO", "NO2"]
+
+def _measurements():
+    #irregular times, including one before and one long after the output
+    times = [-1000, 10, 290, 620, 1190, 1810, 9000]
+    meas = pd.DataFrame({"O3" : [1.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0],
+                         "NO" : [1.0, 2.0, np.nan, 4.0, 5.0, 6.0, 7.0]},
+                        index = times)
+    return meas
+
+def test_asof_indices():
+    times = np.arange(0, 1801, 300.0)
+    meas = [-1000, 10, 290, 620, 1190, 1810, 9000]
+    idx, valid = comparison.asof_indices(times, meas)
+    assert list(valid) == [False, True, True, True, True, True, False]
+    assert list(idx[valid]) == [0, 1, 2, 4, 6]
+
+    idx, valid = comparison.asof_indices(times, meas, "backward", tolerance=np.inf)
+    assert list(valid) == [False, True, True, True, True, True, True]
+    assert list(idx[valid]) == [0, 0, 2, 3, 6, 6]
+
+    idx, valid = comparison.asof_indices(times, meas, "forward", tolerance=np.inf)
+    assert list(valid) == [True, True, True, True, True, False, False]
+    assert list(idx[valid]) == [0, 1, 1, 3, 4]
+
+    with pytest.raises(Exception, match="Direction"):
+        comparison.asof_indices(times, meas, "closest")
+
+def test_comparison_stats():
+    model = np.array([[[1.0], [2.0], [3.0], [np.nan]]])
+    obs = np.array([[2.0], [2.0], [5.0], [1.0]])
+    stats = comparison.comparison_stats(model, obs)
+    assert stats["n"][0,0] == 3
+    assert stats["bias"][0,0] == pytest.approx(-1.0)
+    assert stats["rmse"][0,0] == pytest.approx(np.sqrt(5/3))
+    assert stats["nmb"][0,0] == pytest.approx(-3/9)
+    assert stats["nme"][0,0] == pytest.approx(3/9)
+    assert stats["r"][0,0] == pytest.approx(np.corrcoef([1, 2, 3], [2, 2, 5])[0,1])
+
+def test_store_matches_dataframes(tmp_path):
+    store = f"{tmp_path}/store"
+    runs = {}
+    for i in range(3):
+        runs[f"run{i}"] = concentrations(range(0, 1801, 300), SPECIES, seed=i)
+        result_store.add_run(store, f"run{i}", runs[f"run{i}"])
+    meas = _measurements()
+
+    from_store = comparison.compare(store, meas, chunk_size=2)
+    from_dfs = comparison.compare(runs, meas)
+    pd.testing.assert_frame_equal(from_store, from_dfs)
+    assert list(from_store.loc["run0", "n"]) == [5, 4]
+
+    ids, model_arr, obs = comparison.align_to_measurements(store, meas)
+    assert ids == ["run0", "run1", "run2"]
+    assert model_arr.shape == (3, 7, 2)
+    assert model_arr[1, 3, 0] == runs["run1"].loc[600, "O3"]
+    assert np.isnan(model_arr[:, [0, -1]]).all()
+
+def test_units_and_missing_species():
+    conc = concentrations(range(0, 1801, 300), SPECIES)
+    meas = pd.DataFrame({"O3" : [30.0, 40.0], "OH" : [1.0, 2.0]},
+                        index = ["00:05:00", "00:10:00"])
+    ids, model_arr, obs = comparison.align_to_measurements(conc, meas, units="ppb")
+    assert ids == [0]
+    assert np.allclose(model_arr[0, :, 0], conc.loc[[300, 600], "O3"]/2.45e19*1e9)
+    assert np.isnan(model_arr[0, :, 1]).all()
+
+def test_no_runs(tmp_path):
+    stats = comparison.compare({}, _measurements())
+    assert list(stats.columns) == comparison.STATISTICS
+    assert len(stats) == 0
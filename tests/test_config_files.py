@@ -0,0 +1,124 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools.build_and_run import (series_to_config_file, dataframe_to_config_files,
+                                       _write_if_changed, _link_from_store,
+                                       write_build_run)
+
+def _old_series_lines(in_series, round_nums):
+    #the per-line writer that the bulk formatting replaced
+    if round_nums:
+        return "".join([f"{x} {y}\n" for x,y in in_series.items()])
+    else:
+        return "".join([f"{x} {y:.5e}\n" for x,y in in_series.items()])
+
+def _series():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.lognormal(20, 5, 500), [0., 1e16, 1e-5, 0.1, 5.]])
+    return pd.Series(values, index=[f"SPEC{i}" for i in range(len(values))])
+
+def _read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+@pytest.mark.parametrize("round_nums", [True, False])
+@pytest.mark.parametrize("series", [
+    _series(),
+    _series().astype(np.float32),
+    pd.Series([1, 20, 300], index=[0, 3600, 7200]),
+    pd.Series([1e11, 2e11, 3.5e11], index=[0., 1800.5, 3600.]),
+    pd.Series(dtype=float)])
+def test_series_matches_old_writer(tmp_path, series, round_nums):
+    path = f"{tmp_path}/config"
+    series_to_config_file(series, path, round_nums=round_nums)
+    assert _read(path) == _old_series_lines(series, round_nums).encode()
+
+def test_string_values_match_old_writer(tmp_path):
+    #e.g. the environment values
+    series = pd.Series(["298.15", "NOTUSED", 3.91e17, "OPEN"],
+                       index=["TEMP", "PRESS", "M", "DILUTE"])
+    series_to_config_file(series, f"{tmp_path}/config")
+    assert _read(f"{tmp_path}/config") == _old_series_lines(series, True).encode()
+
+@pytest.mark.parametrize("round_nums", [True, False])
+def test_dataframe_matches_old_writer(tmp_path, round_nums):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.lognormal(25, 2, (200, 3)), columns=["O3", "NO", "NO2"],
+                      index=np.arange(0, 200*300, 300))
+    df.iloc[::7, 1] = np.nan
+    dataframe_to_config_files(df, str(tmp_path), round_nums=round_nums)
+    for col in df.columns:
+        expected = _old_series_lines(df[col].dropna(), round_nums)
+        assert _read(f"{tmp_path}/{col}") == expected.encode()
+
+def test_unchanged_files_are_skipped(tmp_path):
+    path = f"{tmp_path}/config"
+    series = _series()
+    series_to_config_file(series, path)
+    os.utime(path, ns=(0, 0))
+
+    series_to_config_file(series, path)
+    assert os.stat(path).st_mtime_ns == 0
+    assert not _write_if_changed(path, _old_series_lines(series, True))
+    assert os.stat(path).st_mtime_ns == 0
+
+    #the same size but different content is rewritten
+    changed = series.copy()
+    changed.iloc[-1] = 6.
+    assert os.path.getsize(path) == len(_old_series_lines(changed, True))
+    series_to_config_file(changed, path)
+    assert os.stat(path).st_mtime_ns != 0
+    assert _read(path) == _old_series_lines(changed, True).encode()
+
+def test_link_from_store(tmp_path):
+    store = f"{tmp_path}/store"
+    assert _link_from_store(f"{tmp_path}/a", "0 1.0\n", store)
+    assert not _link_from_store(f"{tmp_path}/b", "0 1.0\n", store)
+    assert _link_from_store(f"{tmp_path}/c", "0 2.0\n", store)
+
+    stored = sorted(glob.glob(f"{store}/*/*"))
+    assert len(stored) == 2
+    assert not glob.glob(f"{store}/*/*.tmp")
+    assert os.readlink(f"{tmp_path}/a") == os.readlink(f"{tmp_path}/b")
+    assert os.readlink(f"{tmp_path}/a") != os.readlink(f"{tmp_path}/c")
+    assert _read(f"{tmp_path}/b") == b"0 1.0\n"
+
+    #relinking to different content replaces the link, not the stored file
+    assert not _link_from_store(f"{tmp_path}/b", "0 2.0\n", store)
+    assert os.readlink(f"{tmp_path}/b") == os.readlink(f"{tmp_path}/c")
+    assert _read(f"{tmp_path}/a") == b"0 1.0\n"
+
+def test_constraints_shared_between_runs(tmp_path, atchem2_path):
+    store = f"{tmp_path}/store"
+    spec_constrain = pd.DataFrame({"O3" : [1e12, 2e12], "NO" : [1e11, 1e11]},
+                                  index=[0, 3600])
+    env_constrain = pd.DataFrame({"TEMP" : [290., 300.]}, index=[0, 3600])
+    env_vals = pd.Series({"TEMP" : "CONSTRAINED"})
+    def run():
+        write_build_run(atchem2_path, f"{atchem2_path}/mech.fac", 1, 6, 2020,
+                        0, 3600, 51, 0, 300, spec_constrain=spec_constrain,
+                        env_constrain=env_constrain, env_vals=env_vals,
+                        spec_output=["O3", "NO"], keep_rundirs=True,
+                        constraint_store=store)
+
+    #written once to the store
+    run()
+    stored = sorted(glob.glob(f"{store}/*/*"))
+    assert len(stored) == 3
+    os.utime(stored[0], ns=(0, 0))
+
+    #and reused by the next run
+    run()
+    assert sorted(glob.glob(f"{store}/*/*")) == stored
+    assert os.stat(stored[0]).st_mtime_ns == 0
+
+    #linked into each run
+    run_dirs = sorted(glob.glob(f"{atchem2_path}/model_*"))
+    assert len(run_dirs) == 2
+    for sub in ["species/O3", "species/NO", "environment/TEMP"]:
+        links = [f"{x}/constraints/{sub}" for x in run_dirs]
+        assert all(os.path.islink(x) for x in links)
+        assert os.readlink(links[0]) == os.readlink(links[1])
+        assert os.readlink(links[0]) in stored
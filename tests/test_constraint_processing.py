@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import constraint_processing
+from AtChemTools.constraint_processing import (to_model_grid, thin_indices,
+                                               thin_constraints, prepare_constraints)
+
+def _recursive_thin(times, values, rtol, atol):
+    #the one segment at a time implementation that thin_indices replaced
+    n = len(values)
+    allowed = atol + rtol*np.abs(values)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n-1]] = True
+    segments = [(0, n-1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first+1, last)
+        interp = values[first] + ((values[last] - values[first]) *
+                                  (times[inner] - times[first]) /
+                                  (times[last] - times[first]))
+        excess = np.abs(values[inner] - interp) - allowed[inner]
+        imax = np.argmax(excess)
+        if excess[imax] > 0:
+            split = first + 1 + imax
+            keep[split] = True
+            segments += [(first, split), (split, last)]
+    return np.flatnonzero(keep)
+
+def _series(kind, n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(n)*60.
+    diurnal = 1e11*(2 + np.sin(2*np.pi*times/86400))
+    if kind == "noisy":
+        return times, diurnal + rng.normal(0, 5e9, n)
+    elif kind == "smooth":
+        return times, diurnal
+    elif kind == "steps":
+        return times, 1e11*(1 + (times//36000) % 2)
+    elif kind == "flat":
+        return times, np.full(n, 3e10)
+    elif kind == "signed":
+        return times, rng.normal(0, 1, n).cumsum()
+
+@pytest.mark.parametrize("kind", ["noisy", "smooth", "steps", "flat", "signed"])
+@pytest.mark.parametrize("rtol,atol", [(0.01, 0.), (0.05, 0.), (0., 1.), (0.001, 0.5)])
+def test_thin_within_tolerance(kind, rtol, atol):
+    times, values = _series(kind)
+    keep = thin_indices(times, values, rtol=rtol, atol=atol)
+
+    assert keep[0] == 0 and keep[-1] == len(values) - 1
+    assert np.all(np.diff(keep) > 0)
+    interp = np.interp(times, times[keep], values[keep])
+    assert np.all(np.abs(values - interp) <= atol + rtol*np.abs(values) + 1e-6)
+    np.testing.assert_array_equal(keep, _recursive_thin(times, values, rtol, atol))
+
+@pytest.mark.parametrize("long_segment", [2, 16, 10**9])
+def test_thin_long_and_short_segments(monkeypatch, long_segment):
+    #the same points are kept however the segments are split between being
+    #checked one at a time and all at once
+    monkeypatch.setattr(constraint_processing, "_LONG_SEGMENT", long_segment)
+    times, values = _series("noisy", seed=3)
+    np.testing.assert_array_equal(thin_indices(times, values, rtol=0.02),
+                                  _recursive_thin(times, values, 0.02, 0.))
+
+def test_thin_short_series():
+    assert list(thin_indices([], [])) == []
+    assert list(thin_indices([0], [5.])) == [0]
+    assert list(thin_indices([0, 60], [5., 1.])) == [0, 1]
+    assert list(thin_indices([0, 60, 120], [1., 2., 3.])) == [0, 2]
+    assert list(thin_indices([0, 60, 120], [1., 5., 3.])) == [0, 1, 2]
+
+def test_thin_constraints_columns():
+    times, values = _series("smooth", n=1000)
+    df = pd.DataFrame({"O3" : values, "TEMP" : np.full(len(values), 290.)},
+                      index=times.astype(int))
+    df.iloc[500:520, 0] = np.nan
+    thinned = thin_constraints(df, rtol=0.01)
+
+    assert thinned.shape == df.shape
+    assert list(thinned.index) == list(df.index)
+    #only the ends of constant values are needed
+    assert list(thinned["TEMP"].dropna().index) == [df.index[0], df.index[-1]]
+    #the ends of each column (ignoring NaNs) are kept, with unchanged values
+    o3 = thinned["O3"].dropna()
+    assert (o3.index[0], o3.index[-1]) == (df.index[0], df.index[-1])
+    pd.testing.assert_series_equal(o3, df["O3"].loc[o3.index])
+    assert thinned["O3"].iloc[500:520].isna().all()
+    valid = df["O3"].dropna()
+    interp = np.interp(valid.index, o3.index, o3)
+    assert np.all(np.abs(valid - interp) <= 0.01*valid + 1e-6)
+
+def test_grid_mean():
+    df = pd.DataFrame({"O3" : [1., 3., 5., 7., 100., 200.]},
+                      index=[-400, 10, 290, 610, 4000, 3590])
+    out = to_model_grid(df, 0, 3600, 300)
+    #times are averaged onto the nearest step, and times outside the model
+    #run are dropped
+    assert list(out.index) == [0, 300, 600, 3600]
+    assert list(out["O3"]) == [3., 5., 7., 200.]
+    assert out.index.dtype.kind == "i"
+
+def test_grid_interpolate():
+    df = pd.DataFrame({"O3" : [10., 20., np.nan, 40.], "NO" : [1., np.nan, 3., np.nan]},
+                      index=["00:05:00", "00:15:00", "00:25:00", "00:35:00"])
+    out = to_model_grid(df, 0, 3600, 600, method="interpolate")
+    assert list(out.index) == list(range(0, 3601, 600))
+    #only interpolated within the range of the measurements of each column
+    np.testing.assert_allclose(out["O3"], [np.nan, 15., 25., 35., np.nan, np.nan, np.nan])
+    np.testing.assert_allclose(out["NO"], [np.nan, 1.5, 2.5, np.nan, np.nan, np.nan, np.nan])
+
+def test_grid_out_of_range():
+    #measurements entirely outside the model run
+    df = pd.DataFrame({"O3" : [1., 2.]}, index=[7200, 9000])
+    assert to_model_grid(df, 0, 3600, 300).empty
+    assert to_model_grid(df, 0, 3600, 300, method="interpolate")["O3"].isna().all()
+    with pytest.raises(Exception, match="Method"):
+        to_model_grid(df, 0, 3600, 300, method="nearest")
+
+def test_prepare_constraints():
+    times, values = _series("smooth", n=1000)
+    df = pd.DataFrame({"O3" : values}, index=times + 7)
+    gridded = prepare_constraints(df, 0, 36000, 60)
+    pd.testing.assert_frame_equal(gridded, to_model_grid(df, 0, 36000, 60))
+    assert len(gridded) == 601
+
+    thinned = prepare_constraints(df, 0, 36000, 60, rtol=0.01)
+    pd.testing.assert_frame_equal(thinned, thin_constraints(gridded, rtol=0.01))
+    assert 2 <= thinned["O3"].count() < len(gridded)/10
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import downsample
+
+def _lttb_loop(x, y, n_out):
+    """Reference implementation of LTTB, selecting one bucket at a time"""
+    n = len(y)
+    if (n_out >= n) or (n_out < 3):
+        return np.arange(n)
+    edges = np.linspace(1, n-1, n_out-1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n-1
+    a = 0
+    for i in range(n_out-2):
+        start, end = edges[i], edges[i+1]
+        if i < n_out-3:
+            next_x = x[edges[i+1]:edges[i+2]].mean()
+            next_vals = y[edges[i+1]:edges[i+2]]
+            next_y = np.nan if np.isnan(next_vals).all() else np.nanmean(next_vals)
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs((x[a] - next_x)*(y[start:end] - y[a]) -
+                       (x[a] - x[start:end])*(next_y - y[a]))
+        a = start + np.nanargmax(areas) if not np.isnan(areas).all() else start
+        out[i+1] = a
+    return out
+
+def _series(n, seed):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, 86400, n))
+    y = np.sin(x/5000) + rng.normal(0, 0.3, n) + (rng.uniform(size=n) > 0.99)*5
+    return x, y
+
+@pytest.mark.parametrize("n, n_out", [(10, 3), (100, 7), (1000, 50), (5000, 999),
+                                      (5000, 4999), (20000, 500)])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_lttb_matches_loop(n, n_out, seed):
+    x, y = _series(n, seed)
+    assert np.array_equal(downsample.lttb_indices(x, y, n_out), _lttb_loop(x, y, n_out))
+
+@pytest.mark.parametrize("n_out", [10, 300, 2000])
+def test_lttb_matches_loop_smooth(n_out):
+    #selections change with every anchor change for a smooth series
+    x = np.arange(0, 86400*3, 60.0)
+    y = 1e12*(1.5 + np.sin(2*np.pi*x/86400))
+    assert np.array_equal(downsample.lttb_indices(x, y, n_out), _lttb_loop(x, y, n_out))
+
+def test_lttb_with_nans():
+    x, y = _series(2000, 3)
+    y[100:160] = np.nan
+    y[::37] = np.nan
+    idx = downsample.lttb_indices(x, y, 100)
+    assert np.array_equal(idx, _lttb_loop(x, y, 100))
+    assert len(idx) == 100
+
+def test_lttb_short_series():
+    x, y = _series(10, 0)
+    assert np.array_equal(downsample.lttb_indices(x, y, 20), np.arange(10))
+    assert np.array_equal(downsample.lttb_indices(x, y, 2), np.arange(10))
+
+def test_minmax_keeps_extremes():
+    x, y = _series(10000, 0)
+    idx = downsample.minmax_indices(y, 100)
+    assert idx[0] == 0 and idx[-1] == len(y)-1
+    assert y.argmax() in idx and y.argmin() in idx
+    assert len(idx) <= 202
+
+def test_downsample_series():
+    x, y = _series(10000, 0)
+    series = pd.Series(y, index=x)
+    assert len(downsample.downsample_series(series, 500)) == 500
+    assert len(downsample.downsample_series(series, 500, "minmax")) <= 502
+    assert downsample.downsample_series(series[:100], 500) is not None
+    with pytest.raises(Exception, match="lttb"):
+        downsample.downsample_series(series, 500, "mean")
+
+def test_stack_indices():
+    rng = np.random.default_rng(0)
+    ys = rng.uniform(size=(3, 5000))
+    ys[2] *= 10
+    idx = downsample.stack_indices(ys, 50)
+    #the layer with the largest range sets the points of every bucket
+    assert ys[2].argmax() in idx and ys[2].argmin() in idx
+    assert np.array_equal(downsample.stack_indices(ys[:, :80], 50), np.arange(80))
@@ -0,0 +1,63 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import families
+from synthetic import concentrations
+
+MECH = os.path.join(os.path.dirname(__file__), "fake_atchem2", "mech.fac")
+SPECIES = ["O3", "NO", "NO2", "N2O5", "CH3NO3", "PAN", "CH3O2", "C2H5O2", "OH"]
+
+def test_compile_families():
+    compiled = families.compile_families(SPECIES, mechanism_path=MECH)
+    assert "O3" in compiled.species #in the Ox family
+    nox = families.family_members(compiled, "NOx")
+    assert dict(nox) == {"NO" : 1, "NO2" : 1}
+    noy = families.family_members(compiled, "NOy")
+    assert dict(noy) == {"NO" : 1, "NO2" : 1, "N2O5" : 2, "CH3NO3" : 1, "PAN" : 1}
+    #the RO2 sum of the mechanism, restricted to the available species
+    assert list(families.family_members(compiled, "RO2").index) == ["CH3O2", "C2H5O2"]
+
+def test_species_counted_once():
+    compiled = families.compile_families(["CH3NO3"], {"N" : {re.compile(".+NO3$") : 1,
+                                                            "CH3NO3" : 3}})
+    assert dict(families.family_members(compiled, "N")) == {"CH3NO3" : 1}
+
+def test_family_totals():
+    conc = concentrations(range(0, 1201, 300), SPECIES)
+    totals = families.family_totals(conc, mechanism_path=MECH)
+    assert np.allclose(totals["NOx"], conc["NO"] + conc["NO2"])
+    assert np.allclose(totals["NOy"], conc[["NO", "NO2", "CH3NO3", "PAN"]].sum(axis=1)
+                       + 2*conc["N2O5"])
+    assert np.allclose(totals["ROx"], conc[["OH", "CH3O2", "C2H5O2"]].sum(axis=1))
+
+    #a compiled definition is reused as is
+    compiled = families.compile_families(conc.columns, {"HOx" : ["OH", "HO2"]})
+    pd.testing.assert_frame_equal(families.family_totals(conc, compiled),
+                                  conc[["OH"]].rename(columns={"OH" : "HOx"}))
+
+def test_family_rate_totals():
+    rates = pd.DataFrame({"time" : [0, 0, 0, 300, 300],
+                          "speciesName" : ["NO", "NO2", "O3", "NO", "N2O5"],
+                          "rate" : [1.0, 2.0, 4.0, 8.0, 16.0]})
+    totals = families.family_rate_totals(rates, {"NOx" : ["NO", "NO2"],
+                                                 "NOy" : {"NO" : 1, "N2O5" : 2}})
+    assert list(totals.index) == [0, 300]
+    assert list(totals["NOx"]) == [3.0, 8.0]
+    assert list(totals["NOy"]) == [1.0, 40.0]
+
+    #the same from a rate dataframe indexed by time and species
+    indexed = rates.set_index(["time", "speciesName"])
+    pd.testing.assert_frame_equal(families.family_rate_totals(indexed, {"NOx" : ["NO", "NO2"]}),
+                                  totals[["NOx"]])
+
+def test_scale_family():
+    members = pd.Series({"NO" : 1, "NO2" : 1})
+    concs = families.scale_family(pd.Series({"NO" : 1.0, "NO2" : 3.0, "O3" : 5.0}),
+                                  members, 8.0)
+    assert dict(concs) == {"NO" : 2.0, "NO2" : 6.0, "O3" : 5.0}
+
+    #a family with no members present is split evenly
+    concs = families.scale_family(pd.Series({"O3" : 5.0}), members, 8.0)
+    assert dict(concs) == {"O3" : 5.0, "NO" : 4.0, "NO2" : 4.0}
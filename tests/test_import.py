@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import glob
+import subprocess
+import pytest
+import AtChemTools
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _fresh_import(statement):
+    """Runs an import in a fresh interpreter, returning the modules imported"""
+    code = ("import sys, json\n"
+            f"{statement}\n"
+            "print(json.dumps(sorted(sys.modules)))")
+    env = {**os.environ, "PYTHONPATH" : REPO_ROOT}
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+def _imported(modules, packages):
+    return {m.split(".")[0] for m in modules} & set(packages)
+
+def test_package_import_is_lazy():
+    modules = _fresh_import("import AtChemTools")
+    assert not _imported(modules, ["pandas", "numpy", "matplotlib", "scipy", "pysolar"])
+    assert not [m for m in modules if m.startswith("AtChemTools.")]
+
+def test_worker_imports_are_light():
+    modules = _fresh_import("import AtChemTools.build_and_run, "
+                            "AtChemTools.run_queue, "
+                            "AtChemTools.jNO2_functions, "
+                            "AtChemTools.plotting_functions")
+    assert not _imported(modules, ["matplotlib", "scipy", "pysolar"])
+
+def test_api_access_loads_submodule():
+    modules = _fresh_import("import AtChemTools\n"
+                            "AtChemTools.write_build_run")
+    assert "AtChemTools.build_and_run" in modules
+    assert "AtChemTools.ropa" not in modules
+    assert not _imported(modules, ["matplotlib", "scipy", "pysolar"])
+
+def test_submodules_listed():
+    package_dir = os.path.dirname(AtChemTools.__file__)
+    files = {os.path.splitext(os.path.basename(x))[0]
+             for x in glob.glob(f"{package_dir}/*.py")} - {"__init__"}
+    assert set(AtChemTools._SUBMODULES) == files
+
+@pytest.mark.parametrize("name", sorted(AtChemTools._API))
+def test_api_names(name):
+    submodule = getattr(AtChemTools, AtChemTools._API[name])
+    value = getattr(AtChemTools, name)
+    assert value is getattr(submodule, name)
+    #the name is cached in the package once it has been looked up
+    assert vars(AtChemTools)[name] is value
+    assert name in dir(AtChemTools)
+
+def test_submodule_access():
+    for name in AtChemTools._SUBMODULES:
+        assert getattr(AtChemTools, name) is sys.modules[f"AtChemTools.{name}"]
+    assert set(AtChemTools.__all__) == set(AtChemTools._SUBMODULES) | set(AtChemTools._API)
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError, match="no attribute 'not_a_function'"):
+        AtChemTools.not_a_function
+    assert not hasattr(AtChemTools, "_not_a_submodule")
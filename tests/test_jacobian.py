@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from AtChemTools import read_output
+from AtChemTools.read_output import jacobian_matrices, jacobian_rows
+from AtChemTools.build_and_run import _copy_jacobian
+
+SPECIES = ["O3", "NO", "NO2"]
+
+def _jacobian(t):
+    return np.array([[-t, 0., 1.], [0., 2., 0.], [3e-5, 0., -4.5e2]])
+
+def _write(path, times, separator="", header="", width=None):
+    """Writes a jacobian.output file, with a header line and a separator line
+    after each timestep if given, and each row wrapped after `width` values"""
+    with open(path, "w") as file:
+        if header:
+            file.write(header + "\n")
+        for t in times:
+            for row in _jacobian(t):
+                values = [f"{t:.8e}"] + [f"{x:.8e}" for x in row]
+                step = width or len(values)
+                for i in range(0, len(values), step):
+                    file.write(" ".join(values[i:i+step]) + "\n")
+            if separator:
+                file.write(separator + "\n")
+
+def _check(path, times):
+    matrices = list(jacobian_matrices(path, SPECIES))
+    assert [t for t, _ in matrices] == times
+    for t, matrix in matrices:
+        assert matrix.shape == (3, 3)
+        np.testing.assert_allclose(matrix.toarray(), _jacobian(t))
+        assert matrix.nnz == np.count_nonzero(_jacobian(t))
+
+@pytest.mark.parametrize("separator,header", [("", ""), (" ----------", ""),
+                                              ("", "time jacobian"),
+                                              ("", "   "),
+                                              ("=== step ===", "# jacobian output")])
+def test_separators_and_headers(tmp_path, separator, header):
+    path = f"{tmp_path}/jacobian.output"
+    _write(path, [0., 600., 1200.], separator=separator, header=header)
+    _check(path, [0., 600., 1200.])
+
+def test_wrapped_rows(tmp_path, monkeypatch):
+    #rows of 4 values wrapped after 3
+    monkeypatch.setattr(read_output, "JACOBIAN_LINE_WIDTH", 3)
+    path = f"{tmp_path}/jacobian.output"
+    _write(path, [0., 600.], separator="-----", width=3)
+    rows = list(jacobian_rows(open(path)))
+    assert len(rows) == 6
+    assert all(len(x) == 4 for x in rows)
+    _check(path, [0., 600.])
+
+def test_species_count_from_file(tmp_path):
+    path = f"{tmp_path}/jacobian.output"
+    _write(path, [0.], separator="--")
+    with pytest.warns(UserWarning, match="3 species"):
+        matrices = list(jacobian_matrices(path, SPECIES + ["NO3"]))
+    assert matrices[0][1].shape == (3, 3)
+
+def test_incomplete_timestep(tmp_path):
+    path = f"{tmp_path}/jacobian.output"
+    _write(path, [0., 600.])
+    with open(path) as file:
+        lines = file.readlines()
+    with open(path, "w") as file:
+        #the last timestep is missing a row, and the last row is incomplete
+        file.writelines(lines[:-2] + [lines[-2][:30]])
+    _check(path, [0.])
+
+def test_copy_jacobian(tmp_path):
+    src = f"{tmp_path}/src.output"
+    dst = f"{tmp_path}/jacobian.output"
+    _write(src, [0., 600., 1200.], separator=" ----------", header="time jacobian")
+    _copy_jacobian(src, dst, keep=lambda t: t >= 600)
+    _copy_jacobian(src, dst, keep=lambda t: t > 1000)
+    with open(dst) as file:
+        lines = file.readlines()
+    #only the rows kept, each on one line without the separators
+    assert len(lines) == 9
+    assert all(len(x.split()) == 4 for x in lines)
+    _check(dst, [600., 1200., 1200.])
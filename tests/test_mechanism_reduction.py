@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import mechanism_reduction as mr
+from AtChemTools.read_output import rate_df
+from AtChemTools.species_from_mechanism import get_reactions, get_ro2_species
+from synthetic import write_rates
+
+MECH = os.path.join(os.path.dirname(__file__), "fake_atchem2", "mech.fac")
+
+def _rows(prod_rxn8=0.5):
+    """Loss and production rate rows at two times. NO2 is produced by
+    reactions 4, 5 and 7 (and by reaction 8, at less than 1%)"""
+    loss, prod = [], []
+    for t in [0, 600]:
+        prod += [(t, "NO2", 4, 50.0, "CH3O2+NO=CH3O+NO2"),
+                 (t, "NO2", 5, 45.0, "C2H5O2+NO=CH3CHO+HO2+NO2"),
+                 (t, "NO2", 7, 4.5, "CH3NO3+OH=HCHO+NO2"),
+                 (t, "NO2", 8, prod_rxn8 if t == 600 else 0.5, "PAN=CH3CO3+NO2"),
+                 (t, "O3", 1, 10.0, "O=O3")]
+        loss += [(t, "NO", 4, 50.0, "CH3O2+NO=CH3O+NO2"),
+                 (t, "NO", 5, 45.0, "C2H5O2+NO=CH3CHO+HO2+NO2"),
+                 (t, "CH3O2", 4, 50.0, "CH3O2+NO=CH3O+NO2"),
+                 (t, "OH", 7, 4.5, "CH3NO3+OH=HCHO+NO2"),
+                 (t, "O3", 3, 10.0, "O3=O1D")]
+    return loss, prod
+
+def _raw(rows):
+    return pd.DataFrame(rows, columns=["time", "speciesName", "reactionNumber",
+                                       "rate", "reaction"])
+
+def _rate_set(tmp_path, name, prod_rxn8=0.5):
+    loss, prod = _rows(prod_rxn8)
+    write_rates(f"{tmp_path}/{name}_loss.output", loss)
+    write_rates(f"{tmp_path}/{name}_prod.output", prod)
+    return (rate_df(f"{tmp_path}/{name}_loss.output", drop_net_0=False),
+            rate_df(f"{tmp_path}/{name}_prod.output", drop_net_0=False))
+
+def test_reaction_contributions(tmp_path):
+    loss, prod = _rows()
+    from_raw = mr.reaction_contributions([(_raw(loss), _raw(prod))])
+    assert from_raw[("NO2", 4)] == pytest.approx(0.5)
+    assert from_raw[("NO2", 8)] == pytest.approx(0.005)
+    assert from_raw[("NO", 5)] == pytest.approx(45/95)
+    #the same from dataframes read with rate_df
+    from_files = mr.reaction_contributions([_rate_set(tmp_path, "a")])
+    pd.testing.assert_series_equal(from_files.sort_index(), from_raw.sort_index())
+
+def test_select_reactions():
+    loss, prod = _rows()
+    contributions = mr.reaction_contributions([(_raw(loss), _raw(prod))])
+    kept, species = mr.select_reactions(contributions, get_reactions(MECH), ["NO2"])
+    assert sorted(kept.index) == [4, 5, 7]
+    #ranked by the largest contribution to any kept species (reaction 4 is
+    #all of the loss of CH3O2 and reaction 7 all of the loss of OH)
+    assert list(kept["contribution"]) == [1.0, 1.0, 45/95]
+    assert kept.loc[7, "reaction"] == "2.0D-11 : CH3NO3 + OH = HCHO + NO2"
+    assert dict(species) == {"NO2" : 0, "CH3O2" : 1, "NO" : 1, "C2H5O2" : 1,
+                             "CH3NO3" : 1, "OH" : 1}
+
+def test_reduce_mechanism(tmp_path):
+    #reaction 8 contributes 23% of the production of NO2 at one time in the
+    #second set of output
+    rate_sets = [_rate_set(tmp_path, "a"), _rate_set(tmp_path, "b", prod_rxn8=30.0)]
+    out_path = f"{tmp_path}/reduced.fac"
+    kept, species, errors = mr.reduce_mechanism(MECH, out_path, rate_sets, ["NO2"])
+
+    assert sorted(kept.index) == [4, 5, 7, 8]
+    assert species["PAN"] == 1
+    assert errors.loc["NO2", "production"] == 0
+    assert errors.loc["NO2", "loss"] == 0
+
+    reduced = get_reactions(out_path)
+    assert [r[1] for r in reduced] == [["CH3O2", "NO"], ["C2H5O2", "NO"],
+                                       ["CH3NO3", "OH"], ["PAN"]]
+    #the RO2 sum only includes the species remaining in the mechanism
+    assert get_ro2_species(out_path) == ["CH3O2", "C2H5O2"]
+
+def test_reduction_error():
+    loss, prod = _rows()
+    errors = mr.reduction_error([(_raw(loss), _raw(prod))], ["NO2", "O3"], [4, 5])
+    assert errors.loc["NO2", "production"] == pytest.approx(5/100)
+    assert errors.loc["NO2", "loss"] == 0
+    assert errors.loc["O3", "production"] == 1
+    assert errors.loc["O3", "loss"] == 1
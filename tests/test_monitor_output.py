@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+import pandas as pd
+from AtChemTools.monitor_output import tail_output, model_progress
+
+CONC_HEADER = "t O3 NO\n"
+RATES_HEADER = "time speciesNumber speciesName reactionNumber rate reaction\n"
+
+def _append(path, text):
+    with open(path, "a") as file:
+        file.write(text)
+
+def _conc_line(t):
+    return f"{t:.6e} {1e12 + t*1e6:.6e} {1e11 + t*1e5:.6e}\n"
+
+def _rate_lines(t, rxns=(1, 2, 3)):
+    return "".join(f"{t:.0f} 1 O3 {r} {r*1e5:.6e} O3+X{r}=Y\n" for r in rxns)
+
+def test_tail_appended_lines(tmp_path):
+    path = f"{tmp_path}/speciesConcentrations.output"
+    _append(path, CONC_HEADER + _conc_line(0))
+    tail = tail_output(path, poll_interval=0.01, idle_timeout=1)
+
+    chunk = next(tail)
+    assert list(chunk.columns) == ["O3", "NO"]
+    assert list(chunk.index) == [0]
+
+    #a partially written line is only read once it is complete
+    _append(path, _conc_line(300) + _conc_line(600)[:10])
+    assert list(next(tail).index) == [300]
+    _append(path, _conc_line(600)[10:] + _conc_line(900))
+    chunk = next(tail)
+    assert list(chunk.index) == [600, 900]
+    assert chunk.loc[900, "NO"] == 1e11 + 900*1e5
+    tail.close()
+
+def test_tail_restarts_on_new_file(tmp_path):
+    path = f"{tmp_path}/speciesConcentrations.output"
+    _append(path, CONC_HEADER + _conc_line(0) + _conc_line(300))
+    tail = tail_output(path, poll_interval=0.01, idle_timeout=1)
+    assert list(next(tail).index) == [0, 300]
+
+    #truncated and rewritten with less output
+    with open(path, "w") as file:
+        file.write(CONC_HEADER + _conc_line(0))
+    assert list(next(tail).index) == [0]
+
+    #replaced by a larger file
+    with open(f"{path}.new", "w") as file:
+        file.write(CONC_HEADER + "".join(_conc_line(t) for t in range(0, 1501, 300)))
+    os.replace(f"{path}.new", path)
+    assert list(next(tail).index) == list(range(0, 1501, 300))
+    tail.close()
+
+def test_tail_while_writing(tmp_path):
+    path = f"{tmp_path}/speciesConcentrations.output"
+    times = list(range(0, 30001, 300))
+
+    def write():
+        with open(path, "w") as file:
+            file.write(CONC_HEADER)
+            for t in times:
+                line = _conc_line(t)
+                #flush part way through some lines
+                file.write(line[:7])
+                file.flush()
+                file.write(line[7:])
+                if t % 1500 == 0:
+                    file.flush()
+                    time.sleep(0.002)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    chunks = list(tail_output(path, poll_interval=0.001, idle_timeout=0.5))
+    writer.join()
+
+    df = pd.concat(chunks)
+    assert list(df.index) == times
+    assert (df["O3"] == [1e12 + t*1e6 for t in times]).all()
+
+def test_progress_counts_times_split_between_chunks(tmp_path):
+    path = f"{tmp_path}/lossRates.output"
+    _append(path, RATES_HEADER + _rate_lines(0) + _rate_lines(300, (1, 2)))
+    progress = model_progress(path, 0, 1200, poll_interval=0.01, idle_timeout=1)
+
+    update = next(progress)
+    assert (update["model_time"], update["steps"]) == (300, 2)
+
+    #the rest of the rates at 300 s
+    _append(path, _rate_lines(300, (3,)) + _rate_lines(600))
+    update = next(progress)
+    assert (update["model_time"], update["steps"]) == (600, 3)
+    assert update["percent_complete"] == 50
+
+    _append(path, _rate_lines(600, (3,)))
+    update = next(progress)
+    assert (update["model_time"], update["steps"]) == (600, 3)
+
+    _append(path, _rate_lines(900) + _rate_lines(1200))
+    update = next(progress)
+    assert (update["model_time"], update["steps"]) == (1200, 5)
+    assert update["percent_complete"] == 100
+    progress.close()
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import rate_coefficients as rc
+from synthetic import concentrations
+
+MECH = os.path.join(os.path.dirname(__file__), "fake_atchem2", "mech.fac")
+SPECIES = ["O", "O3", "NO", "CH3O2", "C2H5O2", "HOCH2CH2O2", "CH3NO3", "OH",
+           "PAN", "N2O5"]
+
+def _inputs():
+    times = pd.Index([0.0, 600.0, 1200.0], name="t")
+    env = pd.DataFrame({"TEMP" : [280.0, 298.0, 310.0],
+                        "PRESS" : [1013.0, 1000.0, 990.0],
+                        "H2O" : ["3e17", "NOTUSED", "3e17"]}, index=times)
+    photo = pd.DataFrame({"J1" : [1e-5, 2e-5, 3e-5], "J2" : [0.0, 0.0, 0.0]},
+                         index=times)
+    conc = concentrations(times, SPECIES)
+    return env, photo, conc
+
+def test_translate():
+    assert rc._translate("5.6D-34*N2*(TEMP/300)@-2.6") == "5.6e-34*N2*(TEMP/300)**-2.6"
+    assert rc._translate("J<4>*exp(-1/TEMP)") == "J[4]*EXP(-1/TEMP)"
+    assert rc._translate("1.0d+3*J(12)") == "1.0e+3*J[12]"
+
+def test_compile():
+    compiled = rc.compile_rate_coefficients(MECH)
+    assert len(compiled.reactions) == 9
+    assert list(compiled.coefficients) == ["KRO2NO"]
+    assert compiled.variables == ["J", "N2", "O2", "RO2", "TEMP"]
+
+def test_rate_coefficients():
+    env, photo, conc = _inputs()
+    k = rc.rate_coefficients(MECH, env, photo, conc)
+    assert list(k.columns) == list(range(1, 10))
+    temp, press = env["TEMP"].to_numpy(), env["PRESS"].to_numpy()
+    m = 7.2429E18*press/temp
+    kro2no = 2.7e-12*np.exp(360/temp)
+
+    assert np.allclose(k[1], 5.6e-34*(0.7809*m)*(temp/300)**-2.6*(0.2095*m))
+    assert np.allclose(k[2], 8.0e-12*np.exp(-2060/temp))
+    assert np.allclose(k[3], photo["J1"])
+    assert np.allclose(k[4], kro2no*0.999)
+    assert np.allclose(k[5], kro2no)
+    assert np.allclose(k[6], 1e-12*conc[["CH3O2", "C2H5O2", "HOCH2CH2O2"]].sum(axis=1))
+    assert np.allclose(k[9], 2e-11)
+
+    #a compiled mechanism gives the same result
+    compiled = rc.compile_rate_coefficients(MECH)
+    pd.testing.assert_frame_equal(rc.rate_coefficients(compiled, env, photo, conc,
+                                                       mechanism_path=MECH), k)
+
+def test_missing_inputs():
+    env, photo, conc = _inputs()
+    with pytest.raises(Exception, match="J1"):
+        rc.rate_coefficients(MECH, env, photo[["J2"]], conc)
+    with pytest.raises(Exception, match="TEMP"):
+        rc.rate_coefficients(MECH, env[["H2O"]], photo, conc)
+
+def test_unknown_names(tmp_path):
+    mech = f"{tmp_path}/bad.fac"
+    with open(mech, "w") as file:
+        file.write("* Reaction definitions. ;\n% KUNKNOWN*2 : O3 = O ;\n")
+    with pytest.raises(Exception, match="KUNKNOWN"):
+        rc.compile_rate_coefficients(mech)
+
+def test_reaction_rates():
+    env, photo, conc = _inputs()
+    k = rc.rate_coefficients(MECH, env, photo, conc)
+    rates = rc.reaction_rates(k, conc, MECH)
+    assert np.allclose(rates[2], k[2]*conc["O"]*conc["O3"])
+    assert np.allclose(rates[3], k[3]*conc["O3"])
+    assert np.allclose(rates[8], k[8]*conc["PAN"])
+    with pytest.raises(Exception, match="PAN"):
+        rc.reaction_rates(k, conc.drop(columns="PAN"), MECH)
+
+def test_ro2_rate_requires_ro2_species(tmp_path):
+    env, photo, conc = _inputs()
+    compiled = rc.compile_rate_coefficients(MECH)
+    ro2 = conc[["CH3O2", "C2H5O2", "HOCH2CH2O2"]].sum(axis=1)
+
+    #the RO2 species are read from mechanism_path for a compiled mechanism
+    k = rc.rate_coefficients(compiled, env, photo, conc, mechanism_path=MECH)
+    assert np.allclose(k[6], 1e-12*ro2)
+    with pytest.raises(Exception, match="mechanism_path"):
+        rc.rate_coefficients(compiled, env, photo, conc)
+
+    #or RO2 can be given as an input
+    k = rc.rate_coefficients(compiled, env.assign(RO2=2*ro2), photo, conc)
+    assert np.allclose(k[6], 2e-12*ro2)
+
+    with pytest.raises(Exception, match="none of the RO2 species"):
+        rc.rate_coefficients(MECH, env, photo, conc[["NO", "O3"]])
+    with pytest.raises(Exception, match="no concentrations"):
+        rc.rate_coefficients(MECH, env, photo, conc.iloc[:2])
+
+    mech = f"{tmp_path}/no_ro2.fac"
+    with open(mech, "w") as file:
+        file.write("* Reaction definitions. ;\n% 1.0D-12*RO2 : NO = NO2 ;\n")
+    with pytest.raises(Exception, match="no RO2 species"):
+        rc.rate_coefficients(mech, env, photo, conc)
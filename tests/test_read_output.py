@@ -0,0 +1,195 @@
+import os
+import gzip
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import read_output
+from AtChemTools.read_output import (rate_df, SortedRates, restart_concentrations,
+                                     _reverse_lines, read_run_outputs,
+                                     species_concentrations_df)
+from synthetic import write_rates, write_concentrations, concentrations
+
+def _rate_rows(seed=0):
+    #species, times and reaction numbers written out of order, with species
+    #having different reactions and times
+    rng = np.random.default_rng(seed)
+    rows = []
+    for t in rng.permutation(np.arange(0, 7200, 300)):
+        for species, rxns in [("OH", [7, 2, 9]), ("NO", [4, 1]), ("O3", [3, 1, 5, 2])]:
+            if (species == "NO") and (t > 3600):
+                continue
+            for r in rxns:
+                rows.append((t, species, r, rng.lognormal(0, 2), f"{species}+X{r}=Y"))
+    return rows
+
+def _unsorted_slice(data, species, start=None, end=None):
+    #slicing the unsorted rate dataframe, as before presorting
+    spec_df = data.xs(species, level=1)
+    times = spec_df.index.get_level_values(0)
+    mask = np.ones(len(spec_df), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    return spec_df[mask].sort_index()
+
+@pytest.fixture
+def rates(tmp_path):
+    write_rates(f"{tmp_path}/lossRates.output", _rate_rows())
+    return (rate_df(f"{tmp_path}/lossRates.output", drop_net_0=False),
+            rate_df(f"{tmp_path}/lossRates.output", drop_net_0=False, presorted=True))
+
+def test_sorted_rates_order(rates):
+    data, sorted_rates = rates
+    assert isinstance(sorted_rates, SortedRates)
+    assert list(sorted_rates.species) == ["NO", "O3", "OH"]
+    assert list(sorted_rates.offsets) == [0, 26, 122, 194]
+
+    #sorted by species, then time, then reaction number
+    index = sorted_rates.data.index
+    keys = list(zip(index.get_level_values(1), index.get_level_values(0),
+                    index.get_level_values(2)))
+    assert keys == sorted(keys)
+    assert len(sorted_rates.data) == len(data)
+    pd.testing.assert_frame_equal(sorted_rates.data.sort_index(), data.sort_index())
+
+@pytest.mark.parametrize("start,end", [(None, None), (600, 1800), (650, 1750),
+                                       (None, 900), (3000, None), (3700, 5000),
+                                       (-100, 0), (7000, 9000), (1800, 1800),
+                                       (2000, 1000)])
+def test_sorted_rates_match_unsorted(rates, start, end):
+    data, sorted_rates = rates
+    for species in ["NO", "O3", "OH"]:
+        expected = _unsorted_slice(data, species, start, end)
+        pd.testing.assert_frame_equal(sorted_rates.get_species(species, start, end),
+                                      expected)
+    window = sorted_rates.time_window(start, end)
+    assert list(window) == ["NO", "O3", "OH"]
+    for species, spec_df in window.items():
+        pd.testing.assert_frame_equal(spec_df, _unsorted_slice(data, species, start, end))
+
+def test_sorted_rates_bounds(rates):
+    _, sorted_rates = rates
+    assert sorted_rates.species_bounds("NO") == (0, 26)
+    #NO has 2 reactions at each time up to 3600
+    assert sorted_rates.species_bounds("NO", 300, 600) == (2, 6)
+    assert sorted_rates.species_bounds("NO", 3601) == (26, 26)
+    with pytest.raises(KeyError):
+        sorted_rates.species_bounds("NO2")
+
+def test_sorted_rates_slices_share_memory(rates):
+    _, sorted_rates = rates
+    spec_df = sorted_rates.get_species("O3", 600, 1800)
+    parent = sorted_rates.data["rate"].to_numpy()
+    assert np.shares_memory(spec_df["rate"].to_numpy(), parent)
+
+    #modifying a slice copies it rather than changing the sorted data
+    before = parent.copy()
+    spec_df.iloc[0, spec_df.columns.get_loc("rate")] = -1.
+    np.testing.assert_array_equal(sorted_rates.data["rate"].to_numpy(), before)
+    assert spec_df["rate"].iloc[0] == -1.
+
+def _gzip(path):
+    with open(path, "rb") as file, gzip.open(f"{path}.gz", "wb") as out_file:
+        out_file.write(file.read())
+    os.remove(path)
+
+def _write_concs(tmp_path, trailing=""):
+    df = concentrations(np.arange(0, 3601, 300), ["O3", "NO", "NO2"], seed=1)
+    path = f"{tmp_path}/speciesConcentrations.output"
+    write_concentrations(path, df)
+    with open(path, "a") as file:
+        file.write(trailing)
+    #the values as written to the file
+    return path, df.map(lambda x: float(f"{x:.6e}"))
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("time,expected", [(None, 3600), (3600, 3600), (0, 0),
+                                           (1200, 1200), (650, 600), (1199.9, 900),
+                                           (3599, 3300), (1e6, 3600)])
+def test_restart_time(tmp_path, compress, time, expected):
+    path, df = _write_concs(tmp_path)
+    if compress:
+        _gzip(path)
+
+    restart = restart_concentrations(path, time=time)
+    assert restart.name == expected
+    pd.testing.assert_series_equal(restart, df.loc[float(expected)], check_names=False)
+
+@pytest.mark.parametrize("trailing", ["", "\n\n", "   \n"])
+def test_restart_before_first_time(tmp_path, trailing):
+    path, df = _write_concs(tmp_path, trailing)
+    assert restart_concentrations(path).name == 3600
+    with pytest.raises(Exception, match="before time -1"):
+        restart_concentrations(path, time=-1)
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 65536])
+def test_reverse_lines(tmp_path, block_size):
+    path, _ = _write_concs(tmp_path, "\n")
+    with open(path) as file:
+        lines = [x.rstrip("\n") for x in file if x.strip()]
+    assert list(_reverse_lines(path, block_size)) == lines[::-1]
+
+def test_restart_reads_from_end(tmp_path, monkeypatch):
+    #only the rows after the requested time are parsed
+    path, df = _write_concs(tmp_path)
+    parsed = []
+    def reverse_lines(file_path):
+        for line in _reverse_lines(file_path, block_size=16):
+            parsed.append(line)
+            yield line
+    monkeypatch.setattr(read_output, "_reverse_lines", reverse_lines)
+    assert restart_concentrations(path, time=3000).name == 3000
+    assert len(parsed) == 3
+
+def _write_run(model_path):
+    out_path = f"{model_path}/output"
+    os.makedirs(out_path)
+    times = np.arange(0, 3601, 300)
+    write_concentrations(f"{out_path}/speciesConcentrations.output",
+                         concentrations(times, ["O3", "NO", "NO2"], seed=2))
+    write_concentrations(f"{out_path}/environmentVariables.output",
+                         concentrations(times, ["TEMP", "PRESS", "M"], seed=3))
+    write_concentrations(f"{out_path}/photolysisRates.output",
+                         concentrations(times, ["J1", "J2"], seed=4))
+    write_rates(f"{out_path}/lossRates.output", _rate_rows(5))
+    write_rates(f"{out_path}/productionRates.output", _rate_rows(6))
+    return out_path
+
+@pytest.mark.parametrize("max_workers", [1, 5])
+@pytest.mark.parametrize("species", ["ALL", ["NO2", "O3"]])
+def test_read_run_outputs_match_serial(tmp_path, max_workers, species):
+    out_path = _write_run(tmp_path)
+    #archived files are read the same
+    _gzip(f"{out_path}/productionRates.output")
+    outputs = read_run_outputs(str(tmp_path), species=species, max_workers=max_workers)
+
+    serial = (species_concentrations_df(f"{out_path}/speciesConcentrations.output",
+                                        species=species),
+              pd.read_csv(f"{out_path}/lossRates.output", sep=r"\s+",
+                          keep_default_na=False),
+              pd.read_csv(f"{out_path}/productionRates.output.gz", sep=r"\s+",
+                          keep_default_na=False),
+              pd.read_csv(f"{out_path}/environmentVariables.output", index_col=0,
+                          sep=r"\s+"),
+              pd.read_csv(f"{out_path}/photolysisRates.output", index_col=0,
+                          sep=r"\s+"))
+    assert len(outputs) == 5
+    for output, expected in zip(outputs, serial):
+        pd.testing.assert_frame_equal(output, expected)
+    assert list(outputs[0].columns) == (["O3", "NO", "NO2"] if species == "ALL" else species)
+    assert list(outputs[4].columns) == ["J1", "J2"]
+
+@pytest.mark.parametrize("name", ["speciesConcentrations", "lossRates",
+                                  "productionRates", "environmentVariables",
+                                  "photolysisRates"])
+def test_read_run_outputs_missing_file(tmp_path, name):
+    out_path = _write_run(tmp_path)
+    os.remove(f"{out_path}/{name}.output")
+    with pytest.raises(FileNotFoundError):
+        read_run_outputs(str(tmp_path))
+
+def test_read_run_outputs_missing_species(tmp_path):
+    _write_run(tmp_path)
+    with pytest.raises(Exception, match="OH"):
+        read_run_outputs(str(tmp_path), species=["O3", "OH"])
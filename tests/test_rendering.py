@@ -0,0 +1,57 @@
+import os
+import sys
+import functools
+import subprocess
+import numpy as np
+import pandas as pd
+from AtChemTools.rendering import page_hash
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _define(body):
+    """Defines a plotting function called `plot` from its body"""
+    namespace = {}
+    exec(f"def plot(df, label):\n    {body}\n", namespace)
+    return namespace["plot"]
+
+def _page(func, df):
+    return (func, (df,), {"label" : "O3"})
+
+def test_hash_depends_on_data():
+    func = _define("return df.plot(title=label)")
+    df = pd.DataFrame({"O3" : np.arange(5.0)})
+    assert page_hash(_page(func, df)) == page_hash(_page(func, df.copy()))
+    assert page_hash(_page(func, df)) != page_hash(_page(func, df*2))
+    assert page_hash(_page(func, df)) != page_hash(_page(func, df), fmt="png")
+
+def test_hash_depends_on_function_code():
+    df = pd.DataFrame({"O3" : np.arange(5.0)})
+    #functions with the same name but different code or constants
+    funcs = [_define("return df.plot(title=label)"),
+             _define("return df.plot(title=label, logy=True)"),
+             _define("return df.plot(title='O3 ' + label)"),
+             _define("return df.plot(title=label)")]
+    hashes = [page_hash(_page(f, df)) for f in funcs]
+    assert len(set(hashes[:3])) == 3
+    assert hashes[0] == hashes[3]
+
+def test_hash_of_partial():
+    func = _define("return df.plot(title=label)")
+    df = pd.DataFrame({"O3" : np.arange(5.0)})
+    assert (page_hash((functools.partial(func, df), (), {"label" : "O3"})) !=
+            page_hash((functools.partial(func, df*2), (), {"label" : "O3"})))
+
+def test_hash_is_stable_between_processes():
+    #a function with a nested function and a set constant, whose order
+    #depends on the hash seed of the process
+    code = ("from AtChemTools.rendering import page_hash\n"
+            "def plot(df, label):\n"
+            "    scale = lambda x: x*2\n"
+            "    return label in {'O3', 'NO', 'NO2', 'OH', 'HO2'}\n"
+            "print(page_hash((plot, ([1.0, 2.0],), {'label' : 'O3'})))")
+    env = {**os.environ, "PYTHONPATH" : REPO_ROOT}
+    env.pop("PYTHONHASHSEED", None)
+    hashes = [subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                             capture_output=True, text=True).stdout
+              for i in range(2)]
+    assert hashes[0] == hashes[1]
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools import result_store
+from synthetic import concentrations, write_concentrations
+
+SPECIES = ["O3", "NO", "NO2"]
+
+def _store(tmp_path):
+    store = f"{tmp_path}/store"
+    runs = {}
+    for i, temp in enumerate([290, 300, 310]):
+        runs[f"run{i}"] = concentrations(range(0, 3601, 300), SPECIES, seed=i)
+        result_store.add_run(store, f"run{i}", runs[f"run{i}"], {"TEMP" : temp})
+    return store, runs
+
+def test_read_run_round_trip(tmp_path):
+    store, runs = _store(tmp_path)
+    pd.testing.assert_frame_equal(result_store.read_run(store, "run1"), runs["run1"])
+    assert list(result_store.read_run(store, "run1", ["NO2", "X"]).columns) == ["NO2"]
+
+def test_add_output_dir(tmp_path):
+    conc = concentrations(range(0, 1201, 300), SPECIES)
+    write_concentrations(f"{tmp_path}/speciesConcentrations.output", conc)
+    result_store.add_output_dir(f"{tmp_path}/store", "a", str(tmp_path),
+                                species=["NO"])
+    stored = result_store.read_run(f"{tmp_path}/store", "a")
+    assert list(stored.columns) == ["NO"]
+    assert np.allclose(stored["NO"], conc["NO"], rtol=1e-6)
+
+def test_duplicate_and_removed_runs(tmp_path):
+    store, runs = _store(tmp_path)
+    with pytest.raises(Exception, match="already present"):
+        result_store.add_run(store, "run0", runs["run0"])
+    result_store.remove_run(store, "run0")
+    assert list(result_store.run_metadata(store).index) == ["run1", "run2"]
+
+def test_remove_run_replaces_metadata(tmp_path, monkeypatch):
+    store, runs = _store(tmp_path)
+    with open(f"{store}/runs.jsonl") as file:
+        before = file.read()
+
+    #the metadata is unchanged (and the run kept) if it can't be replaced
+    def fail(src, dst):
+        raise OSError("replace failed")
+    with monkeypatch.context() as m:
+        m.setattr(result_store.os, "replace", fail)
+        with pytest.raises(OSError, match="replace failed"):
+            result_store.remove_run(store, "run1")
+    with open(f"{store}/runs.jsonl") as file:
+        assert file.read() == before
+    assert [x for x in os.listdir(store) if x.endswith(".tmp")] == []
+    pd.testing.assert_frame_equal(result_store.read_run(store, "run1"), runs["run1"])
+
+    result_store.remove_run(store, "run1")
+    assert list(result_store.run_metadata(store).index) == ["run0", "run2"]
+    assert [x for x in os.listdir(store) if x.endswith(".tmp")] == []
+    result_store.add_run(store, "run1", runs["run1"])
+    assert list(result_store.run_metadata(store).index) == ["run0", "run2", "run1"]
+
+def test_query_time_series_with_where(tmp_path):
+    store, runs = _store(tmp_path)
+    out = result_store.query_store(store, ["O3", "X"], where="TEMP >= 300")
+    assert list(out.index.get_level_values(0).unique()) == ["run1", "run2"]
+    assert np.allclose(out.loc["run2", "O3"], runs["run2"]["O3"])
+    assert out["X"].isna().all()
+
+def test_query_closest_time(tmp_path):
+    store, runs = _store(tmp_path)
+    out = result_store.query_store(store, "NO", time="00:10:00")
+    assert np.allclose(out["NO"], [runs[x].loc[600, "NO"] for x in out.index])
+    #within half of the output step
+    out = result_store.query_store(store, "NO", time=740)
+    assert np.allclose(out["NO"], [runs[x].loc[600, "NO"] for x in out.index])
+
+def test_query_time_outside_tolerance(tmp_path):
+    store, runs = _store(tmp_path)
+    assert result_store.query_store(store, "NO", time=7200)["NO"].isna().all()
+    assert result_store.query_store(store, "NO", time=650, tolerance=10)["NO"].isna().all()
+    out = result_store.query_store(store, "NO", time=7200, tolerance=np.inf)
+    assert np.allclose(out["NO"], [runs[x].loc[3600, "NO"] for x in out.index])
+
+def test_run_arrays(tmp_path):
+    store, runs = _store(tmp_path)
+    times, spec_rows, values = result_store.run_arrays(store, "run2")
+    assert list(times) == list(runs["run2"].index)
+    assert spec_rows == {"O3" : 0, "NO" : 1, "NO2" : 2}
+    assert isinstance(values, np.memmap)
+    assert np.allclose(values[spec_rows["NO2"]], runs["run2"]["NO2"])
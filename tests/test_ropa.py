@@ -0,0 +1,45 @@
+import numpy as np
+from AtChemTools.ropa import ropa_pages, top_reactions
+from AtChemTools.read_output import rate_df
+from synthetic import write_rates
+
+def _write_outputs(out_dir):
+    #reaction 1 is largest over the whole run, but reaction 2 is largest
+    #before t = 1000
+    rows = []
+    for t in range(0, 4000, 100):
+        rows.append((t, "O3", 1, 1.0 if t < 1000 else 10.0, "O3+NO=NO2"))
+        rows.append((t, "O3", 2, 5.0, "O3+OH=HO2"))
+        rows.append((t, "O3", 3, 0.5, "O3=O1D"))
+    for name in ["lossRates.output", "productionRates.output"]:
+        write_rates(f"{out_dir}/{name}", rows)
+
+def _plotted_reactions(pages):
+    """Returns the reactions and rates on the loss rate page of a report"""
+    df_dict = pages[1][1][0]
+    return df_dict["O3"]
+
+def test_top_reactions_whole_run(tmp_path):
+    _write_outputs(tmp_path)
+    rates = rate_df(f"{tmp_path}/lossRates.output", drop_net_0=False)
+    top = top_reactions(rates, 1)
+    assert set(top.index.get_level_values(2)) == {1, np.inf}
+
+def test_ropa_pages_ranks_within_time_window(tmp_path):
+    _write_outputs(tmp_path)
+    pages = ropa_pages(str(tmp_path), "O3", 1, start=0, end=900,
+                       drop_net_0=False)
+    o3 = _plotted_reactions(pages)
+
+    assert o3.index.get_level_values(0).max() == 900
+    assert set(o3.index.get_level_values(1)) == {2, np.inf}
+    #the other reactions in the window are reactions 1 and 3
+    other = o3.xs(np.inf, level=1)["rate"]
+    assert np.allclose(other, 1.5)
+    assert np.allclose(o3["%rate"].groupby(level=0).sum(), 100)
+
+def test_ropa_pages_whole_run(tmp_path):
+    _write_outputs(tmp_path)
+    o3 = _plotted_reactions(ropa_pages(str(tmp_path), "O3", 1, drop_net_0=False))
+    assert set(o3.index.get_level_values(1)) == {1, np.inf}
+    assert o3.index.get_level_values(0).max() == 3900
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import subprocess
+import pandas as pd
+import pytest
+from AtChemTools import run_queue
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _job(atchem2_path, o3):
+    return {"mech_path" : f"{atchem2_path}/mech.fac", "day" : 1, "month" : 6,
+            "year" : 2020, "t_start" : 0, "t_end" : 1200, "lat" : 51,
+            "lon" : 0, "step_size" : 300, "spec_output" : ["O3", "NO"],
+            "rate_output" : [], "initial_concs" : pd.Series({"O3" : o3, "NO" : 1e11})}
+
+def _start_worker(db_path, atchem2_path, *args):
+    env = {**os.environ, "PYTHONPATH" : REPO_ROOT}
+    return subprocess.Popen([sys.executable, "-m", "AtChemTools.run_queue", "worker",
+                             db_path, "--atchem2_path", atchem2_path,
+                             "--heartbeat_interval", "0.2", *args],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def _jobs_table(db_path):
+    con = run_queue._connect(db_path)
+    try:
+        return pd.read_sql("SELECT id, status, attempts, worker, error FROM jobs",
+                           con, index_col="id")
+    finally:
+        con.close()
+
+def test_two_workers_run_every_job_once(tmp_path, atchem2_paths):
+    db_path = f"{tmp_path}/queue.db"
+    o3s = [1e12*(i+1) for i in range(6)]
+    ids = run_queue.submit(db_path, [_job(atchem2_paths[0], x) for x in o3s])
+
+    workers = [_start_worker(db_path, path) for path in atchem2_paths]
+    for proc in workers:
+        assert proc.wait(timeout=120) == 0, proc.stderr.read().decode()
+
+    assert run_queue.queue_status(db_path) == {"pending" : 0, "running" : 0,
+                                               "done" : 6, "failed" : 0}
+    assert (_jobs_table(db_path)["attempts"] == 1).all()
+
+    results = run_queue.collect(db_path, wait=False)
+    assert sorted(results) == ids
+    for job_id, o3 in zip(ids, o3s):
+        conc = results[job_id][0]
+        assert list(conc.columns) == ["O3", "NO"]
+        assert conc["O3"].iloc[0] == pytest.approx(o3, rel=1e-5)
+
+def test_stale_job_is_requeued_and_late_worker_ignored(tmp_path, atchem2_path):
+    db_path = f"{tmp_path}/queue.db"
+    [job_id] = run_queue.submit(db_path, _job(atchem2_path, 2e12))
+
+    #a worker claims the job and then stops sending heartbeats
+    assert run_queue.claim(db_path, "dead")[0] == job_id
+    con = run_queue._connect(db_path)
+    con.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - 600, job_id))
+    con.close()
+
+    proc = _start_worker(db_path, atchem2_path, "--stale_timeout", "60",
+                         "--worker", "live")
+    assert proc.wait(timeout=120) == 0, proc.stderr.read().decode()
+
+    jobs = _jobs_table(db_path)
+    assert jobs.loc[job_id, "status"] == "done"
+    assert jobs.loc[job_id, "worker"] == "live"
+    assert jobs.loc[job_id, "attempts"] == 2
+
+    #the stale worker can neither overwrite the result nor requeue the job
+    assert not run_queue.complete(db_path, job_id, "dead", "stale result")
+    assert not run_queue.fail(db_path, job_id, "dead", "stale error")
+    assert _jobs_table(db_path).loc[job_id, "status"] == "done"
+    result = run_queue.collect(db_path, wait=False)[job_id]
+    assert result[0]["O3"].iloc[0] == pytest.approx(2e12, rel=1e-5)
+
+def test_failed_jobs_are_retried(tmp_path, atchem2_path):
+    db_path = f"{tmp_path}/queue.db"
+    [job_id] = run_queue.submit(db_path, {"not_an_argument" : 1}, max_attempts=2)
+
+    assert run_queue.run_worker(db_path, atchem2_path=atchem2_path, worker="w") == 2
+    jobs = _jobs_table(db_path)
+    assert jobs.loc[job_id, "status"] == "failed"
+    assert "not_an_argument" in jobs.loc[job_id, "error"]
+
+    with pytest.warns(UserWarning, match="1 jobs failed"):
+        assert run_queue.collect(db_path, wait=False) == {}
+
+def test_complete_and_fail_require_owner(tmp_path):
+    db_path = f"{tmp_path}/queue.db"
+    [job_id] = run_queue.submit(db_path, {})
+    run_queue.claim(db_path, "a")
+
+    assert not run_queue.fail(db_path, job_id, "b", "error")
+    assert not run_queue.complete(db_path, job_id, "b", 1)
+    assert run_queue.queue_status(db_path)["running"] == 1
+    assert not os.listdir(run_queue._results_dir(db_path))
+
+    assert run_queue.complete(db_path, job_id, "a", 1)
+    assert run_queue.collect(db_path, wait=False) == {job_id : 1}
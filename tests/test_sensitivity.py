@@ -0,0 +1,85 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools.sensitivity import (scaled_mechanism_text, one_at_a_time,
+                                     rate_sensitivities)
+from conftest import FAKE_ATCHEM2
+
+MECH = os.path.join(FAKE_ATCHEM2, "mech.fac")
+TARGETS = ["NO", "NO2", "O3"]
+
+def _run_kwargs():
+    #every target starts above zero, so the log concentrations are defined at
+    #every output time
+    return {"day" : 1, "month" : 6, "year" : 2020, "t_start" : 0, "t_end" : 3600,
+            "lat" : 51, "lon" : 0, "step_size" : 600,
+            "initial_concs" : pd.Series({"O3" : 1e12, "NO" : 1e11, "NO2" : 1e10})}
+
+def _builds(atchem2_paths):
+    built = []
+    for path in atchem2_paths:
+        if os.path.isfile(f"{path}/builds.log"):
+            with open(f"{path}/builds.log") as file:
+                built += [x.strip() for x in file if x.strip()]
+    return built
+
+def test_scaled_mechanism_text():
+    lines = scaled_mechanism_text(MECH, {4 : 2, 9 : 0.5}).split("\n")
+    assert "% (KRO2NO*0.999)*2.000000000000000D+00 : CH3O2 + NO = CH3O + NO2 ;" in lines
+    assert "% (1.0D-11*2)*5.000000000000000D-01 : N2O5 = NO2 + NO3 ;" in lines
+    #everything else is unchanged
+    with open(MECH) as file:
+        original = file.read().split("\n")
+    changed = [x for x, y in zip(original, lines) if x != y]
+    assert changed == ["% KRO2NO*0.999 : CH3O2 + NO = CH3O + NO2 ;",
+                       "% 1.0D-11*2 : N2O5 = NO2 + NO3 ;"]
+    assert scaled_mechanism_text(MECH, {}).split("\n") == original
+
+def test_scaled_mechanism_unknown_reaction():
+    with pytest.raises(Exception, match="10"):
+        scaled_mechanism_text(MECH, {10 : 2})
+
+@pytest.mark.parametrize("factor", [0, -1, 1])
+def test_invalid_factor(atchem2_paths, factor):
+    with pytest.raises(Exception, match="Factors"):
+        rate_sensitivities(atchem2_paths, MECH, [(4, factor)], TARGETS, _run_kwargs())
+
+def test_identical_variants_run_once(tmp_path, atchem2_paths):
+    variant_dir = str(tmp_path / "variants")
+    result = rate_sensitivities(atchem2_paths, MECH, [(4, 2.0), (4, 2.0), ([4], 2.0)],
+                                TARGETS, _run_kwargs(), variant_dir=variant_dir)
+
+    #the unscaled mechanism and one scaled mechanism
+    assert len(glob.glob(f"{variant_dir}/*.fac")) == 2
+    built = _builds(atchem2_paths)
+    assert len(built) == 2
+    #the mechanisms are copied into the model directories before building
+    assert ({os.path.basename(x) for x in built} ==
+            {os.path.basename(x) for x in glob.glob(f"{variant_dir}/*.fac")})
+    np.testing.assert_array_equal(result.coefficients[0], result.coefficients[1])
+    np.testing.assert_array_equal(result.coefficients[0], result.coefficients[2])
+
+@pytest.mark.parametrize("central", [False, True])
+def test_coefficients(atchem2_paths, central):
+    #the stand-in model multiplies the concentrations of the products of a
+    #scaled reaction by its factor and of its reactants by factor**-0.5, so
+    #d ln[C] / d ln k is 1 for products and -0.5 for reactants (to within the
+    #rounding of the output files)
+    variants = one_at_a_time([4, 9], 2.0) + [([4, 5], 1.5)]
+    result = rate_sensitivities(atchem2_paths, MECH, variants, TARGETS,
+                                _run_kwargs(), central=central)
+
+    assert result.coefficients.shape == (3, 7, 3)
+    assert list(result.times) == list(range(0, 3601, 600))
+    assert result.species == TARGETS
+    assert list(result.base.columns) == TARGETS
+    assert result.variants == [([4], 2.0), ([9], 2.0), ([4, 5], 1.5)]
+    assert len(_builds(atchem2_paths)) == (7 if central else 4)
+
+    #NO is a reactant of 4 and 5, NO2 is a product of 4, 5 and 9, O3 is in neither
+    expected = np.array([[-0.5, 1, 0], [0, 1, 0], [-1, 2, 0]])
+    for j in range(3):
+        np.testing.assert_allclose(result.coefficients[j],
+                                   np.tile(expected[j], (7, 1)), atol=1e-5)
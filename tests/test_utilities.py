@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+from AtChemTools.utilities import convert_time_to_seconds, round_to_tstep
+
+def test_convert_single_times():
+    assert convert_time_to_seconds("01:02:03") == 3723
+    assert convert_time_to_seconds(600) == 600
+    with pytest.raises(Exception, match="HH:MM:SS"):
+        convert_time_to_seconds("1:02")
+
+def test_convert_integral_arrays():
+    out = convert_time_to_seconds(pd.Index(["00:10:00", 900, "01:00:00", 7200.0]))
+    assert out.dtype.kind == "i"
+    assert list(out) == [600, 900, 3600, 7200]
+
+def test_convert_keeps_fractional_seconds():
+    out = convert_time_to_seconds(np.array([0.5, 1.25, 600]))
+    assert out.dtype.kind == "f"
+    assert list(out) == [0.5, 1.25, 600.0]
+    out = convert_time_to_seconds(["00:10:00", 600.5])
+    assert list(out) == [600.0, 600.5]
+
+def test_convert_invalid_array():
+    with pytest.raises(Exception, match="10:00"):
+        convert_time_to_seconds([0, "10:00"])
+
+def test_round_to_tstep():
+    assert round_to_tstep(650, 0, 300) == 600
+    assert list(round_to_tstep(np.array([140.0, 170.0, 610.5]), 10, 300)) == [10, 310, 610]